@@ -6,6 +6,8 @@ Career Agents - Individual agent definitions for AI Refinery
 # Standard library imports
 import os
 import sys
+import asyncio
+import contextvars
 
 # Add db directory to path
 backend_dir = os.path.dirname(os.path.dirname(__file__))
@@ -14,18 +16,164 @@ sys.path.append(os.path.join(backend_dir, 'db'))
 # Third-party and local imports
 from chunking import search_resume_content
 from llm_auth import auth_manager
-from openai_call import openai_call
+from openai_call import openai_complete
+from tracing import get_logger, span
+from metrics import record_usage, current_agent
+from execution_report import record_agent_used, current_report
+from singleflight import AsyncGroup, make_key
+from admission import AdmissionRejected, admit_async
+from resilience import ModelUnavailable, call_with_fallback, llm_policy
 
-# Track which agents are used
-agents_used = set()
+logger = get_logger("agents")
+
+# Model behind the AI Refinery agents, used when an agent's config has no `llm` chain
+AGENT_MODEL = "meta-llama/Llama-3.1-70B-Instruct"
+DEFAULT_MODELS = [f"air:{AGENT_MODEL}"]
+
+# Identical concurrent prompts share one completion
+_completion_flight = AsyncGroup("agent_completion")
+
+# Retrieval used when an agent's config has no `retrieval` profile
+DEFAULT_RETRIEVAL = {"k": 5, "sections": None, "min_score": None}
+
+# Candidates fetched speculatively per chat; each agent's profile is applied to them
+PREFETCH_K = int(os.getenv('PREFETCH_K', '12'))
+
+# (session_id, task) of the current chat's speculative retrieval
+_prefetch = contextvars.ContextVar('resume_prefetch', default=None)
+
+
+def split_session_id(query: str):
+    """Strip the orchestrator's trailing "session_id:<id>" marker -> (query, session_id)"""
+    if "session_id:" not in query:
+        return query, None
+    parts = query.split("session_id:")
+    session_id = parts[1].strip().split()[0] if len(parts) > 1 and parts[1].strip() else None
+    return parts[0].strip(), session_id
+
+
+def start_prefetch(message: str, session_id: str):
+    """
+    Start retrieving the session's top PREFETCH_K chunks for the user's
+    message in the background. Must be called before the DistillerClient
+    starts so the agents it runs can await the result.
+    """
+    if not session_id:
+        return None
+    # Retrieval blocks on HTTP; run it off the event loop while routing proceeds
+    task = asyncio.ensure_future(asyncio.to_thread(search_resume_content, message, session_id, k=PREFETCH_K))
+    _prefetch.set((session_id, task))
+    return task
+
+
+def _sections_of(result) -> set:
+    section = result.get("metadata", {}).get("section")
+    return set(section if isinstance(section, list) else [section])
+
+
+def select_prefetched(candidates, k: int, sections=None, min_score: float = None):
+    """
+    Apply a retrieval profile to prefetched candidates the way
+    search_resume_content would: section filter (dropped if nothing
+    matches), min_score and top k. Whole-resume results (no scores) are
+    only section filtered.
+    """
+    matching = [c for c in candidates if not sections or set(sections) & _sections_of(c)] or candidates
+    if candidates and candidates[0].get("score") is None:
+        return matching
+    if min_score is not None:
+        scored = [c for c in matching if c["score"] >= min_score]
+        if not scored and sections:
+            scored = [c for c in candidates if c["score"] >= min_score]
+        matching = scored
+    return matching[:k]
+
+
+async def retrieve_resume(query: str, session_id: str, config: dict = None):
+    """
+    Resume chunks for an agent, using the `retrieval` profile from its
+    config.yaml entry. The chat's speculative prefetch is used when it
+    covers this session; otherwise the agent searches with its own query.
+    """
+    profile = {**DEFAULT_RETRIEVAL, **(config or {}).get('retrieval', {})}
+    prefetch = _prefetch.get()
+    if prefetch and prefetch[0] == session_id:
+        try:
+            candidates = await asyncio.shield(prefetch[1])
+        except Exception as e:
+            logger.warning("Prefetched retrieval failed, searching again: %s", e)
+        else:
+            results = select_prefetched(candidates, profile["k"], profile["sections"] or None, profile["min_score"])
+            report = current_report()
+            if report is not None:
+                report.retrieval(current_agent.get(), results, profile["k"], profile["sections"] or None)
+            return results
+
+    return await asyncio.to_thread(
+        search_resume_content,
+        query,
+        session_id,
+        k=profile["k"],
+        sections=profile["sections"] or None,
+        min_score=profile["min_score"]
+    )
+
+
+def retrieval_only_answer(agent_name: str, results, error: Exception) -> str:
+    """
+    Degraded answer when no model could answer (over capacity or down): the
+    retrieved resume excerpts, or re-raise when there is nothing useful to return
+    """
+    if not results:
+        raise error
+    logger.warning("%s degraded to retrieval-only: %s", agent_name, error)
+    excerpts = "\n\n".join(r['content'] for r in results)
+    return (
+        "I'm handling a lot of requests right now, so I can't give you a full answer yet. "
+        f"Here is what I found in your resume that's relevant; please ask again in a moment.\n\n{excerpts}"
+    )
+
+
+async def _invoke_model(agent_name: str, model_key: str, prompt: str, hedge: bool = False) -> str:
+    """One completion from a "provider:model" key (air or openai); a hedge is never coalesced"""
+    provider, model = model_key.split(":", 1)
+    with span("agent.llm_call", agent=agent_name, model=model, hedge=hedge):
+        if provider == "openai":
+            return await openai_complete(prompt, model, coalesce=not hedge)
+        client = await auth_manager.get_air_client()
+        async with admit_async(model_key):
+            response = await client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=model,
+            )
+    record_usage(model, getattr(response, "usage", None))
+    return response.choices[0].message.content
+
+
+async def complete(agent_name: str, prompt: str, config: dict = None, results=None) -> str:
+    """
+    Completion for an agent over the model chain in its config's `llm` block
+    (deadlines, breakers, hedging, fallback); falls back to a retrieval-only
+    answer from results when no model answers
+    """
+    policy = llm_policy(config, DEFAULT_MODELS)
+
+    async def call():
+        return await call_with_fallback(
+            agent_name, policy, lambda model_key, hedge=False: _invoke_model(agent_name, model_key, prompt, hedge))
+
+    try:
+        return await _completion_flight.do(make_key(policy['models'], prompt), call)
+    except (AdmissionRejected, ModelUnavailable) as e:
+        return retrieval_only_answer(agent_name, results, e)
 
 # === Agent Definitions ===
 
 async def resume_search_agent(query: str, config: dict = None, **kwargs):
     """Search resume content using semantic vector search"""
     
-    print(f"[AGENT] Resume Search Agent invoked")
-    agents_used.add("Resume Search Agent")
+    logger.debug("Resume Search Agent invoked")
+    record_agent_used("Resume Search Agent")
     
     try:
         # Get configuration values with defaults
@@ -56,50 +204,24 @@ async def resume_search_agent(query: str, config: dict = None, **kwargs):
 
         return f"Found relevant resume content:\n\n{context}"
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return f"Error searching resume: {str(e)}"
 
 
 
-async def resume_assessment_agent(query: str, config: dict = None, **kwargs):
-    """Assess resumes and provide actionable feedback"""
-    
-    print(f"[AGENT] Resume Assessment Agent invoked")
-    agents_used.add("Resume Assessment Agent")
-
-    # Get configuration values with defaults
+def assessment_prompt(request: str, resume_text: str, config: dict = None) -> str:
+    """Resume Assessment Agent prompt for a request and the resume text, per its config"""
     config = config or {}
     assessment_criteria = config.get('assessment_criteria', [])
     scoring_weights = config.get('scoring_weights', {})
     feedback_categories = config.get('feedback_categories', {})
-    
-    # Extract session_id from query if present
-    session_id = None
-    enhanced_query = query
-    if "session_id:" in query:
-        parts = query.split("session_id:")
-        session_id = parts[1].strip().split()[0] if len(parts) > 1 else None
-        enhanced_query = parts[0].strip()
-    
-    # Get resume content using semantic search
-    if session_id:
-        try:
-            results = search_resume_content(enhanced_query, session_id, k=5)
-            if results:
-                resume_text = "\n\n".join([r['content'] for r in results])
-                enhanced_query = f"{enhanced_query}\n\nHere is the user's resume content:\n{resume_text}"
-            else:
-                return "I don't see your resume. Please make sure a resume has been uploaded."
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch resume content: {e}")
-            return "I couldn't access your resume. Please make sure a resume has been uploaded and you have the right session ID."
-    else:
-        return "I don't see your resume. Please provide it to me, and I'll be able to give you a more accurate assessment of your skills and provide recommendations tailored to your experience."
-    
-    # Build assessment prompt based on config
+
     criteria_text = "\n".join([f"- {criterion.replace('_', ' ').title()} (Weight: {scoring_weights.get(criterion, 0.0) })" for criterion in assessment_criteria])
+    logger.debug("Assessment criteria:\n%s", criteria_text)
 
-    prompt = f"""You are a career counselor analyzing a resume.
+    return f"""You are a career counselor analyzing a resume.
 
 Provide:
 1. **STRENGTHS** ({feedback_categories.get('strengths', 'Highlight positive aspects and standout elements')})
@@ -117,21 +239,53 @@ For each criterion, use its scoring weight, for the level of weight each criteri
 Be concise, practical, and encouraging.
 
 
-{enhanced_query}"""
-    client = await auth_manager.get_air_client()
-    response = await client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="meta-llama/Llama-3.1-70B-Instruct",
-    )
-    print(f"[DEBUG] Assessment criteria:\n{criteria_text}")
-    return response.choices[0].message.content
+{request}
+
+Here is the user's resume content:
+{resume_text}"""
+
+
+async def assess_resume(request: str, resume_text: str, config: dict = None, results=None) -> str:
+    """
+    Assessment of resume_text over the agent's model chain. Without results
+    there is no retrieval-only fallback, so AdmissionRejected or
+    ModelUnavailable propagate (the batch job retries those sessions).
+    """
+    return await complete("Resume Assessment Agent", assessment_prompt(request, resume_text, config), config, results)
+
+
+async def resume_assessment_agent(query: str, config: dict = None, **kwargs):
+    """Assess resumes and provide actionable feedback"""
+    
+    logger.debug("Resume Assessment Agent invoked")
+    record_agent_used("Resume Assessment Agent")
+
+    # Extract session_id from query if present
+    enhanced_query, session_id = split_session_id(query)
+    
+    # Get resume content using semantic search (profile from config.yaml)
+    if session_id:
+        try:
+            results = await retrieve_resume(enhanced_query, session_id, config)
+            if not results:
+                return "I don't see your resume. Please make sure a resume has been uploaded."
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.warning("Failed to fetch resume content: %s", e)
+            return "I couldn't access your resume. Please make sure a resume has been uploaded and you have the right session ID."
+    else:
+        return "I don't see your resume. Please provide it to me, and I'll be able to give you a more accurate assessment of your skills and provide recommendations tailored to your experience."
+    
+    resume_text = "\n\n".join([r['content'] for r in results])
+    return await assess_resume(enhanced_query, resume_text, config, results)
 
 
 async def job_search_agent(query: str, config: dict = None, **kwargs):
     """Help users find jobs online"""
     
-    print(f"[AGENT] Job Search Agent invoked")
-    agents_used.add("Job Search Agent")
+    logger.debug("Job Search Agent invoked")
+    record_agent_used("Job Search Agent")
 
     # Get configuration values with defaults
     config = config or {}
@@ -140,22 +294,20 @@ async def job_search_agent(query: str, config: dict = None, **kwargs):
     job_categories = config.get('job_categories', [])
     
     # Extract session_id from query if present
-    session_id = None
-    enhanced_query = query
-    if "session_id:" in query:
-        parts = query.split("session_id:")
-        session_id = parts[1].strip().split()[0] if len(parts) > 1 else None
-        enhanced_query = parts[0].strip()
+    enhanced_query, session_id = split_session_id(query)
+    results = []
     
-    # Get resume content using semantic search if session_id available
+    # Get resume content using semantic search if session_id available (profile from config.yaml)
     if session_id:
         try:
-            results = search_resume_content(enhanced_query, session_id, k=5)
+            results = await retrieve_resume(enhanced_query, session_id, config)
             if results:
                 resume_text = "\n\n".join([r['content'] for r in results])
                 enhanced_query = f"{enhanced_query}\n\nHere is the user's background from their resume:\n{resume_text}"
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"[ERROR] Failed to fetch resume content: {e}")
+            logger.warning("Failed to fetch resume content: %s", e)
     
     # Build platform and category lists for the prompt
     platforms_text = "\n".join([f"- {platform}" for platform in search_platforms])
@@ -184,20 +336,15 @@ Be specific and actionable.
 
 {enhanced_query}"""
 
-    client = await auth_manager.get_air_client()
-    response = await client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="meta-llama/Llama-3.1-70B-Instruct",
-    )
-    return response.choices[0].message.content
+    return await complete("Job Search Agent", prompt, config, results)
 
 
 
 async def interview_prep_agent(query: str, config: dict = None, **kwargs):
     """Help users prepare for interviews"""
     
-    print(f"[AGENT] Interview Prep Agent invoked")
-    agents_used.add("Interview Prep Agent")
+    logger.debug("Interview Prep Agent invoked")
+    record_agent_used("Interview Prep Agent")
 
     # Get configuration values with defaults
     config = config or {}
@@ -206,22 +353,20 @@ async def interview_prep_agent(query: str, config: dict = None, **kwargs):
     answer_frameworks = config.get('answer_frameworks', {})
     
     # Extract session_id from query if present
-    session_id = None
-    enhanced_query = query
-    if "session_id:" in query:
-        parts = query.split("session_id:")
-        session_id = parts[1].strip().split()[0] if len(parts) > 1 else None
-        enhanced_query = parts[0].strip()
+    enhanced_query, session_id = split_session_id(query)
+    results = []
     
-    # Get resume content using semantic search if session_id available
+    # Get resume content using semantic search if session_id available (profile from config.yaml)
     if session_id:
         try:
-            results = search_resume_content(enhanced_query, session_id, k=5)
+            results = await retrieve_resume(enhanced_query, session_id, config)
             if results:
                 resume_text = "\n\n".join([r['content'] for r in results])
                 enhanced_query = f"{enhanced_query}\n\nHere is the user's background from their resume:\n{resume_text}"
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"[ERROR] Failed to fetch resume content: {e}")
+            logger.warning("Failed to fetch resume content: %s", e)
     
     # Build framework text for the prompt
     frameworks_text = "\n".join([f"- {name}: {description}" for name, description in answer_frameworks.items()])
@@ -244,20 +389,15 @@ Be practical and specific.
 
 {enhanced_query}"""
 
-    client = await auth_manager.get_air_client()
-    response = await client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="meta-llama/Llama-3.1-70B-Instruct",
-    )
-    return response.choices[0].message.content
+    return await complete("Interview Prep Agent", prompt, config, results)
 
 
 
 async def general_career_agent(query: str, config: dict = None, **kwargs):
     """General career guidance using OpenAI"""
     
-    print(f"[AGENT] General Career Agent invoked")
-    agents_used.add("General Career Agent")
+    logger.debug("General Career Agent invoked")
+    record_agent_used("General Career Agent")
 
     # Get configuration values with defaults
     config = config or {}
@@ -266,22 +406,20 @@ async def general_career_agent(query: str, config: dict = None, **kwargs):
     max_response_length = config.get('max_response_length', 500)
     
     # Extract session_id from query if present
-    session_id = None
-    enhanced_query = query
-    if "session_id:" in query:
-        parts = query.split("session_id:")
-        session_id = parts[1].strip().split()[0] if len(parts) > 1 else None
-        enhanced_query = parts[0].strip()
+    enhanced_query, session_id = split_session_id(query)
+    results = []
     
-    # Get resume content using semantic search if session_id available
+    # Get resume content using semantic search if session_id available (profile from config.yaml)
     if session_id:
         try:
-            results = search_resume_content(enhanced_query, session_id, k=5)
+            results = await retrieve_resume(enhanced_query, session_id, config)
             if results:
                 resume_text = "\n\n".join([r['content'] for r in results])
                 enhanced_query = f"{enhanced_query}\n\nHere is the user's background from their resume:\n{resume_text}"
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"[ERROR] Failed to fetch resume content: {e}")
+            logger.warning("Failed to fetch resume content: %s", e)
     
     # Enhance query with config
     final_query = f"""
@@ -292,4 +430,4 @@ async def general_career_agent(query: str, config: dict = None, **kwargs):
     Current query: {enhanced_query}
     """
 
-    return await openai_call(final_query)
+    return await complete("General Career Agent", final_query, config, results)
@@ -3,13 +3,30 @@ Authentication and client management for AI Refinery and OpenAI
 """
 
 import os
-from air import AsyncAIRefinery, DistillerClient
-from openai import OpenAI
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from air import AsyncAIRefinery, DistillerClient
+    from openai import OpenAI
+
 # Load environment variables
 load_dotenv()
 
+
+def stub_client(kind: str, factory):
+    """Route client creation through stubs/stub_mode when STUB_MODE is set"""
+    if os.getenv('STUB_MODE', 'off').lower() == 'off':
+        return factory()
+    stubs_dir = str(Path(__file__).parent.parent / 'stubs')
+    if stubs_dir not in sys.path:
+        sys.path.append(stubs_dir)
+    import stub_mode
+    return stub_mode.client(kind, factory)
+
+
 class AIAuthManager:
     """Centralized authentication and client management"""
     
@@ -19,29 +36,44 @@ class AIAuthManager:
         self._air_client = None
         self._openai_client = None
         self._distiller_client = None
-        
-        # Validate API keys
+
+    # API keys are validated and SDKs imported when a client is first
+    # requested, so importing this module does no work and never raises
+    def _require_air_key(self) -> str:
         if not self.air_api_key:
             raise ValueError("AIR_API_KEY not found in environment variables")
+        return self.air_api_key
+
+    def _require_openai_key(self) -> str:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
+        return self.openai_api_key
     
-    async def get_air_client(self) -> AsyncAIRefinery:
+    async def get_air_client(self) -> "AsyncAIRefinery":
         """Get AI Refinery async client"""
         if self._air_client is None:
-            self._air_client = AsyncAIRefinery(api_key=self.air_api_key)
+            def create():
+                from air import AsyncAIRefinery
+                return AsyncAIRefinery(api_key=self._require_air_key())
+            self._air_client = stub_client("air", create)
         return self._air_client
     
-    def get_openai_client(self) -> OpenAI:
+    def get_openai_client(self) -> "OpenAI":
         """Get OpenAI client"""
         if self._openai_client is None:
-            self._openai_client = OpenAI(api_key=self.openai_api_key)
+            def create():
+                from openai import OpenAI
+                return OpenAI(api_key=self._require_openai_key())
+            self._openai_client = stub_client("openai", create)
         return self._openai_client
 
-    def get_distiller_client(self) -> DistillerClient:
+    def get_distiller_client(self) -> "DistillerClient":
         """Get AI Refinery Distiller client for orchestration"""
         if self._distiller_client is None:
-            self._distiller_client = DistillerClient(api_key=self.air_api_key)
+            def create():
+                from air import DistillerClient
+                return DistillerClient(api_key=self._require_air_key())
+            self._distiller_client = stub_client("distiller", create)
         return self._distiller_client
     
 
@@ -2,17 +2,25 @@
 Call to OpenAI GPT models
 """
 
+import os
+import asyncio
+
 from llm_auth import auth_manager
+from tracing import get_logger
+from metrics import record_usage
+from singleflight import AsyncGroup, make_key
+from admission import AdmissionRejected, admit_async
 
-async def openai_call(query: str):
-    """
-    Simple agent function using OpenAI GPT-4
-    """
-    try:
-        openai_client = auth_manager.get_openai_client()
-        
-        # Enhanced career guidance prompt
-        system_prompt = """You are a professional career counselor and advisor. Provide helpful, practical, and actionable career guidance. 
+logger = get_logger("openai_call")
+
+# Client-side timeout so a hung request does not hold its thread forever
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+
+# Identical concurrent queries share one completion
+_flight = AsyncGroup("openai_call")
+
+# Enhanced career guidance prompt
+CAREER_SYSTEM_PROMPT = """You are a professional career counselor and advisor. Provide helpful, practical, and actionable career guidance. 
 
 Guidelines:
 - Be encouraging but realistic
@@ -23,16 +31,55 @@ Guidelines:
 
 Respond in a friendly, professional tone."""
 
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content
+
+async def openai_complete(
+    query: str,
+    model: str = "gpt-4o",
+    system_prompt: str = CAREER_SYSTEM_PROMPT,
+    max_tokens: int = 1000,
+    coalesce: bool = True
+) -> str:
+    """
+    Completion from an OpenAI model (career guidance prompt by default); raises on failure.
+    coalesce=False always sends its own request (hedged attempts must not
+    join the slow call they are racing).
+    """
+    openai_client = auth_manager.get_openai_client()
+
+    request = dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        timeout=OPENAI_TIMEOUT
+    )
+
+    def create():
+        response = openai_client.chat.completions.create(**request)
+        record_usage(model, getattr(response, "usage", None))
+        return response
+
+    async def call():
+        async with admit_async(f"openai:{model}"):
+            # The OpenAI client is synchronous; keep the event loop free while it waits
+            return await asyncio.to_thread(create)
+
+    response = await (_flight.do(make_key(request), call) if coalesce else call())
+    return response.choices[0].message.content
+
+
+async def openai_call(query: str):
+    """
+    Simple agent function using OpenAI GPT-4
+    """
+    try:
+        return await openai_complete(query)
+    except AdmissionRejected:
+        # Let the agent degrade instead of returning an error as the answer
+        raise
     except Exception as e:
-        print(f"Error in agent: {e}")
+        logger.error("Error in agent: %s", e)
         return f"Error processing query: {str(e)}"
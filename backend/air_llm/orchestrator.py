@@ -5,7 +5,7 @@ Career Agents Orchestrator using AI Refinery SDK
 # Standard library imports
 import os
 import sys
-import yaml
+import asyncio
 from pathlib import Path
 
 # Add db directory to path
@@ -13,21 +13,43 @@ backend_dir = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(os.path.join(backend_dir, 'db'))
 
 # Third-party and local imports
-from chunking import search_resume_content
 from llm_auth import auth_manager
+from tracing import get_logger, span
+from metrics import instrument_agent, track_inflight
+from admission import AdmissionRejected
+from execution_report import execution_report, current_report, record_agent_used
+from openai_call import openai_complete
+import conversation_memory
 from agents import (
     resume_search_agent,
     resume_assessment_agent,
     job_search_agent,
     interview_prep_agent,
     general_career_agent,
-    agents_used
+    start_prefetch
 )
 
 # Module configuration
 CONFIG_PATH = Path(__file__).parent / 'config.yaml'
 PROJECT_NAME = 'career_agents'
 
+logger = get_logger("orchestrator")
+
+# Cheap model that folds older turns into the rolling conversation summary
+MEMORY_SUMMARY_MODEL = os.getenv('MEMORY_SUMMARY_MODEL', 'gpt-4o-mini')
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a career coaching conversation.
+Merge the new turns into the existing summary. Keep facts about the user (goals, roles, skills,
+locations, constraints), advice already given and open questions. Drop pleasantries.
+Reply with the updated summary only, under 200 words."""
+
+
+async def summarize_turns(previous_summary: str, turns) -> str:
+    """Fold turns into previous_summary with one call to the summary model"""
+    transcript = "\n\n".join(f"User: {t['user']}\nAssistant: {t['assistant']}" for t in turns)
+    prompt = f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    with span("orchestrator.summarize_memory", turns=len(turns)):
+        return await openai_complete(prompt, MEMORY_SUMMARY_MODEL, system_prompt=SUMMARY_SYSTEM_PROMPT, max_tokens=400)
+
 
 class CareerAgents:
     """Career agents using AI Refinery orchestrator"""
@@ -38,84 +60,106 @@ class CareerAgents:
 
     async def initialize(self):
         """Initialize the AI Refinery project"""
-        self.distiller_client = auth_manager.get_distiller_client()
-        
-        try:
-            self.distiller_client.create_project(
-                config_path=str(self.config_path),
-                project=self.project_name
-            )
-            print(f"✅ Project '{self.project_name}' initialized")
-        except Exception as e:
-            print(f"Note: {e}")
+        with span("orchestrator.initialize", project=self.project_name):
+            self.distiller_client = auth_manager.get_distiller_client()
+            
+            try:
+                self.distiller_client.create_project(
+                    config_path=str(self.config_path),
+                    project=self.project_name
+                )
+                logger.info("Project '%s' initialized", self.project_name)
+            except Exception as e:
+                logger.info("Note: %s", e)
 
     async def chat(self, message: str, user_id: str = "user", session_id: str = None):
         """Chat with the career agents - orchestrator handles routing"""
+        # Speculative retrieval: embed the message and search the session's
+        # resume now, while the project initializes and the orchestrator
+        # routes; agents await the result instead of searching again
+        logger.debug("Chat called with session_id: %s", session_id)
+        prefetch = start_prefetch(message, session_id)
+
         if not self.distiller_client:
             await self.initialize()
 
-        # Get resume context from OpenSearch if session_id provided
-        resume_context = ""
-        resume_sections_data = []
-        print(f"[DEBUG] Chat called with session_id: {session_id}")
+        # Earlier turns: rolling summary plus recent turns verbatim. Folding due
+        # turns into the summary runs alongside this chat; they are still sent
+        # verbatim this time, so the answer does not wait for it.
+        conversation_id = session_id or user_id
+        memory = conversation_memory.load(conversation_id)
+        history = conversation_memory.build_context(memory)
+        fold_task = asyncio.ensure_future(conversation_memory.fold(conversation_id, memory, summarize_turns))
 
-        if session_id:
-            try:
-                print(f"[DEBUG] Searching for resume content with session_id: {session_id}")
-                results = search_resume_content(message, session_id, k=3)
-                print(f"[DEBUG] Search results: {len(results)} chunks found")
-                if results:
-                    resume_sections_data = results
-                    resume_sections = "\n\n".join([
-                        f"Resume Section:\n{result['content']}"
-                        for result in results[:3]
-                    ])
-                    resume_context = f"\n\nUser's Resume Context:\n{resume_sections}\n"
-                    print(f"[DEBUG] Resume context found and added to message")
-                else:
-                    print(f"[DEBUG] No resume content found for session_id: {session_id}")
-            except Exception as e:
-                print(f"[ERROR] Could not fetch resume context: {e}")
-                import traceback
-                traceback.print_exc()
-
-        # Prepend resume context to the message if available
         enhanced_message = message
-        if resume_context:
-            enhanced_message = f"{message}{resume_context}"
+        if history:
+            enhanced_message = f"{enhanced_message}\n\nConversation so far:\n{history}\n"
 
         # Append session_id to message so agents can extract it
         if session_id:
             enhanced_message = f"{enhanced_message} session_id:{session_id}"
 
-        # Executor dictionary
+        # Executor dictionary; each agent is wrapped so its metrics carry its name
         executor_dict = {
             "Resume Assessment Agent": resume_assessment_agent,
             "Job Search Agent": job_search_agent,
             "Interview Prep Agent": interview_prep_agent,
             "General Career Agent": general_career_agent,
         }
+        executor_dict = {name: instrument_agent(name, fn) for name, fn in executor_dict.items()}
+        # An agent over capacity must reach chat_script as a rejection (HTTP 429),
+        # even if the Distiller turns agent exceptions into answer text
+        rejections = []
+
+        def surface_rejection(fn):
+            async def wrapper(*args, **kwargs):
+                try:
+                    return await fn(*args, **kwargs)
+                except AdmissionRejected as e:
+                    rejections.append(e)
+                    raise
+            return wrapper
+
+        executor_dict = {name: surface_rejection(fn) for name, fn in executor_dict.items()}
 
         # Connect and query
-        async with self.distiller_client(
-            project=self.project_name,
-            uuid=user_id,
-            executor_dict=executor_dict
-        ) as dc:
-            # Add orchestrator to agents used
-            agents_used.add("Orchestrator")
-
-            responses = await dc.query(query=enhanced_message)
-            full_response = ""
-            async for response in responses:
-                full_response += response.get('content', '')
-            
-            return full_response, agents_used
+        try:
+            async with self.distiller_client(
+                project=self.project_name,
+                uuid=user_id,
+                executor_dict=executor_dict
+            ) as dc:
+                # Add orchestrator to agents used
+                record_agent_used("Orchestrator")
+
+                # Routing plus the agent call(s) the orchestrator dispatches
+                with span("orchestrator.query"):
+                    responses = await dc.query(query=enhanced_message)
+                    full_response = ""
+                    async for response in responses:
+                        full_response += response.get('content', '')
+            if rejections:
+                raise rejections[0]
+        finally:
+            # fold() handles its own errors; let the summary land even if the query failed
+            await fold_task
+            if prefetch is not None and not prefetch.done():
+                # Routed to no agent that needed the resume
+                prefetch.cancel()
+
+        if full_response:
+            conversation_memory.record_turn(conversation_id, message, full_response)
+        report = current_report()
+        return full_response, report.agents_used if report else []
 
 
 # === Public/terminal tester call ===
 
 async def ask_agents(message: str, user_id: str = "user", session_id: str = None):
-    """Simple function to ask the career agents"""
+    """Ask the career agents; returns (response, ExecutionReport for this request)"""
     agents = CareerAgents()
-    return await agents.chat(message, user_id, session_id)
+    # Opened before the DistillerClient starts so its executor tasks inherit the report
+    with execution_report(user_id=user_id, session_id=session_id) as report:
+        with span("orchestrator.chat", session_id=session_id or ""), track_inflight("chat"):
+            response, _ = await agents.chat(message, user_id, session_id)
+    return response, report
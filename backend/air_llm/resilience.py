@@ -0,0 +1,253 @@
+"""
+Deadlines, circuit breakers, hedged requests and model fallback for LLM calls
+
+Each agent declares an `llm` block in config.yaml:
+
+  llm:
+    models: ["air:meta-llama/Llama-3.1-70B-Instruct", "air:meta-llama/Llama-3.1-8B-Instruct"]
+    timeout: 20          # seconds per attempt
+    deadline: 40         # seconds for the whole chain
+    hedge_percentile: 95 # start a second request once the first is slower than p95
+
+Models are tried in order. A model whose circuit breaker is open is skipped;
+a timeout, error or admission rejection moves on to the next model. Every
+chat is its own process, so breaker state and the latency samples used for
+hedging are shared through a SQLite file (LLM_HEALTH_STATE_PATH), like the
+rate limit buckets in db/admission.py.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+from tracing import get_logger
+from admission import AdmissionRejected
+from metrics import LLM_ATTEMPTS
+
+logger = get_logger("resilience")
+
+LLM_HEALTH_STATE_PATH = os.getenv(
+    'LLM_HEALTH_STATE_PATH', str(Path(__file__).parent.parent / 'llm_health.db'))
+# Consecutive failures that open a model's breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '5'))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+# Defaults for agents whose config has no `llm` block
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', '60'))
+# Latency samples kept per model, and the minimum before hedging kicks in
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', '200'))
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS breakers (
+    model TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    open_until REAL NOT NULL,
+    probe_until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latencies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS latencies_model ON latencies (model, id);
+"""
+
+_local = threading.local()
+
+
+class ModelUnavailable(Exception):
+    """Raised when every model in an agent's chain failed or was skipped"""
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    if not LLM_HEALTH_STATE_PATH:
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(LLM_HEALTH_STATE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(LLM_HEALTH_STATE_PATH, timeout=2.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _state(fn, default=None):
+    """Run fn(conn) against the shared state; fail open on errors"""
+    try:
+        conn = _connect()
+        return fn(conn) if conn else default
+    except sqlite3.Error as e:
+        logger.warning("LLM health state error: %s", e)
+        return default
+
+
+# === Circuit breaker ===
+
+def breaker_allows(model: str, probe_timeout: float) -> bool:
+    """
+    True if a call to model may proceed. Once the open period has passed a
+    single caller is let through as the half-open probe; others keep skipping
+    the model until the probe reports back (or its timeout lapses).
+    """
+    def check(conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT failures, open_until, probe_until FROM breakers WHERE model = ?", (model,)
+            ).fetchone()
+            allowed = True
+            if row and row[0] >= BREAKER_FAILURES:
+                _, open_until, probe_until = row
+                allowed = now >= open_until and now >= probe_until
+                if allowed:
+                    conn.execute("UPDATE breakers SET probe_until = ? WHERE model = ?", (now + probe_timeout, model))
+            conn.execute("COMMIT")
+            return allowed
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return _state(check, True)
+
+
+def record_success(model: str, seconds: float):
+    def write(conn):
+        conn.execute("DELETE FROM breakers WHERE model = ?", (model,))
+        conn.execute("INSERT INTO latencies (model, seconds) VALUES (?, ?)", (model, seconds))
+        conn.execute(
+            "DELETE FROM latencies WHERE model = ? AND id <= "
+            "(SELECT id FROM latencies WHERE model = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (model, model, LATENCY_WINDOW)
+        )
+    _state(write)
+
+
+def record_failure(model: str):
+    def write(conn):
+        now = time.time()
+        conn.execute(
+            "INSERT INTO breakers (model, failures, open_until, probe_until) VALUES (?, 1, 0, 0) "
+            "ON CONFLICT(model) DO UPDATE SET failures = failures + 1, probe_until = 0",
+            (model,)
+        )
+        failures = conn.execute("SELECT failures FROM breakers WHERE model = ?", (model,)).fetchone()[0]
+        if failures >= BREAKER_FAILURES:
+            conn.execute("UPDATE breakers SET open_until = ? WHERE model = ?", (now + BREAKER_OPEN_SECONDS, model))
+            logger.warning("Circuit open for %s after %d failures", model, failures)
+    _state(write)
+
+
+def latency_percentile(model: str, percentile: float) -> Optional[float]:
+    """Recent latency percentile for model in seconds, or None with too few samples"""
+    rows = _state(lambda conn: conn.execute(
+        "SELECT seconds FROM latencies WHERE model = ? ORDER BY id DESC LIMIT ?", (model, LATENCY_WINDOW)
+    ).fetchall(), [])
+    if len(rows) < HEDGE_MIN_SAMPLES:
+        return None
+    values = sorted(row[0] for row in rows)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+# === Calls ===
+
+def llm_policy(config: Dict[str, Any], default_models: List[str]) -> Dict[str, Any]:
+    """An agent's `llm` block from config.yaml with defaults filled in"""
+    policy = dict((config or {}).get('llm') or {})
+    policy.setdefault('models', default_models)
+    policy.setdefault('timeout', LLM_TIMEOUT)
+    policy.setdefault('deadline', LLM_DEADLINE)
+    policy.setdefault('hedge_percentile', None)
+    return policy
+
+
+async def _hedged(model: str, invoke: Callable[..., Awaitable[str]], timeout: float, hedge_percentile):
+    """
+    One attempt at model, with a second request raced against it if the first
+    is slow. The second is made with invoke(model, hedge=True) so the caller
+    can keep it out of request coalescing.
+    """
+    hedge_after = latency_percentile(model, hedge_percentile) if hedge_percentile else None
+    first = asyncio.ensure_future(invoke(model))
+    if hedge_after is None or hedge_after >= timeout:
+        try:
+            return await asyncio.wait_for(first, timeout)
+        finally:
+            first.cancel()
+
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            LLM_ATTEMPTS.inc(model=model, outcome="hedged")
+            tasks.append(asyncio.ensure_future(invoke(model, hedge=True)))
+        deadline = time.monotonic() + timeout - hedge_after
+        while tasks:
+            done, _ = await asyncio.wait(
+                tasks, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    return task.result()
+                # The other request may still succeed; fail only when none is left
+                if not tasks:
+                    raise task.exception()
+        raise asyncio.TimeoutError()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_with_fallback(
+    agent_name: str,
+    policy: Dict[str, Any],
+    invoke: Callable[..., Awaitable[str]]
+) -> str:
+    """
+    Run invoke(model) over the policy's model chain within its deadline
+    (hedged attempts call invoke(model, hedge=True)).
+    Raises AdmissionRejected if every model was over capacity, otherwise
+    ModelUnavailable once the chain is exhausted.
+    """
+    deadline = time.monotonic() + float(policy['deadline'])
+    rejected = None
+    for model in policy['models']:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        timeout = min(float(policy['timeout']), remaining)
+        if not breaker_allows(model, timeout):
+            LLM_ATTEMPTS.inc(model=model, outcome="circuit_open")
+            continue
+        start = time.monotonic()
+        try:
+            result = await _hedged(model, invoke, timeout, policy['hedge_percentile'])
+        except AdmissionRejected as e:
+            # Local back-pressure says nothing about the model's health
+            LLM_ATTEMPTS.inc(model=model, outcome="rejected")
+            rejected = e
+            continue
+        except asyncio.TimeoutError:
+            LLM_ATTEMPTS.inc(model=model, outcome="timeout")
+            logger.warning("%s: %s timed out after %.1fs", agent_name, model, timeout)
+            record_failure(model)
+            continue
+        except Exception as e:
+            LLM_ATTEMPTS.inc(model=model, outcome="error")
+            logger.warning("%s: %s failed: %s", agent_name, model, e)
+            record_failure(model)
+            continue
+        LLM_ATTEMPTS.inc(model=model, outcome="ok")
+        record_success(model, time.monotonic() - start)
+        return result
+
+    if rejected is not None:
+        raise rejected
+    raise ModelUnavailable(f"{agent_name}: no model in {policy['models']} answered")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+HNSW parameter sweep for resume retrieval
+
+Loads a synthetic or recorded corpus into one index per (engine, m,
+ef_construction) combination, then for every ef_search and k runs the query
+set through AWSOpenSearchClient.search_resume_chunks and reports recall@k
+against exact search plus p50/p95/p99 latency.
+
+Targets:
+  --target stub                    in-process stand-in (exact search, plumbing only)
+  --target http://localhost:9200   local OpenSearch container
+
+Recorded corpus: JSONL lines with "content", "embedding" and optional "metadata".
+Recorded queries: JSONL lines with "embedding" and optional "session_id".
+
+Usage: python hnsw_sweep.py --target http://localhost:9200 --ef-search 50 100 200 --m 16 32 --k 3 5 10 --output sweep.jsonl
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR / 'db'))
+sys.path.append(str(BACKEND_DIR / 'stubs'))
+
+from aws_opensearch import AWSOpenSearchClient, build_index_body, bulk_ndjson, EMBEDDING_DIMENSION
+
+
+# --- corpus ---
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length"""
+    return matrix / (np.linalg.norm(matrix, axis=-1, keepdims=True) + 1e-12)
+
+
+def synthetic_corpus(docs: int, queries: int, dimension: int, sessions: int, seed: int):
+    """Clustered unit vectors, roughly like chunks of the same resume sitting close together"""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((sessions, dimension), dtype=np.float32))
+
+    doc_sessions = np.arange(docs) % sessions
+    vectors = _normalize(centers[doc_sessions] + rng.normal(0, 0.35, (docs, dimension)).astype(np.float32))
+    corpus = [
+        {
+            "id": f"bench_{i}",
+            "content": f"synthetic chunk {i}",
+            "embedding": vectors[i],
+            "metadata": {"session_id": f"bench_session_{session}", "section": "auto", "type": "resume"}
+        }
+        for i, session in enumerate(doc_sessions.tolist())
+    ]
+
+    query_sessions = rng.integers(0, sessions, queries)
+    vectors = _normalize(centers[query_sessions] + rng.normal(0, 0.5, (queries, dimension)).astype(np.float32))
+    query_set = [
+        {"embedding": vectors[i], "session_id": f"bench_session_{session}"}
+        for i, session in enumerate(query_sessions.tolist())
+    ]
+    return corpus, query_set
+
+
+def load_jsonl(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def recorded_corpus(corpus_path: str, queries_path: str, queries: int, seed: int):
+    corpus = load_jsonl(corpus_path)
+    for i, doc in enumerate(corpus):
+        doc.setdefault("id", f"bench_{i}")
+        doc.setdefault("metadata", {})
+    if queries_path:
+        query_set = load_jsonl(queries_path)
+    else:
+        # Use corpus vectors as queries when no recorded queries are available
+        rng = random.Random(seed)
+        query_set = [
+            {"embedding": doc["embedding"], "session_id": doc["metadata"].get("session_id")}
+            for doc in rng.sample(corpus, min(queries, len(corpus)))
+        ]
+    return corpus, query_set
+
+
+# --- exact ground truth ---
+
+def exact_top_k(corpus, query_set, k: int, session_filter: bool):
+    """Content of the exact cosine top-k for every query"""
+    matrix = _normalize(np.asarray([doc["embedding"] for doc in corpus], dtype=np.float32))
+    queries = _normalize(np.asarray([query["embedding"] for query in query_set], dtype=np.float32))
+    sessions = np.asarray([doc["metadata"].get("session_id") for doc in corpus], dtype=object)
+
+    truth = []
+    for query, scores in zip(query_set, queries @ matrix.T):
+        if session_filter and query.get("session_id"):
+            scores = np.where(sessions == query["session_id"], scores, -np.inf)
+        top = np.argsort(-scores)[:k]
+        truth.append({corpus[i]["content"] for i in top if np.isfinite(scores[i])})
+    return truth
+
+
+# --- targets ---
+
+def make_client(target: str, user: str = None, password: str = None):
+    if target == "stub":
+        from fake_opensearch import FakeOpenSearch
+        return FakeOpenSearch()
+
+    from opensearchpy import OpenSearch
+    return OpenSearch(
+        hosts=[target],
+        http_auth=(user, password) if user else None,
+        verify_certs=False,
+        ssl_show_warn=False,
+        http_compress=True,
+        timeout=60
+    )
+
+
+def load_index(raw_client, index: str, body, corpus, batch_size: int = 500):
+    if raw_client.indices.exists(index=index):
+        raw_client.indices.delete(index=index)
+    raw_client.indices.create(index=index, body=body)
+
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        actions = [
+            ({"index": {"_index": index, "_id": doc["id"]}},
+             {"content": doc["content"], "embedding": doc["embedding"], "metadata": doc["metadata"]})
+            for doc in corpus[offset:offset + batch_size]
+        ]
+        raw_client.bulk(body=bulk_ndjson(actions))
+    raw_client.indices.refresh(index=index)
+    return time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_queries(client: AWSOpenSearchClient, query_set, truth, k: int, session_filter: bool, warmup: int):
+    for query in query_set[:warmup]:
+        client.search_resume_chunks(query["embedding"], query.get("session_id") if session_filter else None, k)
+
+    latencies, recalls = [], []
+    for query, expected in zip(query_set, truth):
+        start = time.perf_counter()
+        results = client.search_resume_chunks(query["embedding"], query.get("session_id") if session_filter else None, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {r["content"] for r in results}
+        recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+
+    return {
+        "recall_at_k": round(sum(recalls) / len(recalls), 4),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "queries": len(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters for resume retrieval")
+    parser.add_argument("--target", default="stub", help="'stub' or an OpenSearch URL")
+    parser.add_argument("--user", help="Basic auth user for the local container")
+    parser.add_argument("--password", help="Basic auth password for the local container")
+    parser.add_argument("--corpus", help="Recorded corpus JSONL (default: synthetic)")
+    parser.add_argument("--queries-file", help="Recorded queries JSONL")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--session-filter", action="store_true", help="Filter by session like the chat path does")
+    parser.add_argument("--engine", nargs="+", default=["lucene"])
+    parser.add_argument("--space-type", default="cosinesimil")
+    parser.add_argument("--m", nargs="+", type=int, default=[16])
+    parser.add_argument("--ef-construction", nargs="+", type=int, default=[512])
+    parser.add_argument("--ef-search", nargs="+", type=int, default=[100])
+    parser.add_argument("--k", nargs="+", type=int, default=[5])
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark indices")
+    parser.add_argument("--output", help="Append one JSON result per configuration to this file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus, query_set = recorded_corpus(args.corpus, args.queries_file, args.queries, args.seed)
+    else:
+        corpus, query_set = synthetic_corpus(args.docs, args.queries, args.dimension, args.sessions, args.seed)
+    dimension = len(corpus[0]["embedding"])
+
+    truth_by_k = {k: exact_top_k(corpus, query_set, k, args.session_filter) for k in args.k}
+    raw_client = make_client(args.target, args.user, args.password)
+    output = open(args.output, "a") if args.output else None
+
+    print(f"{'engine':<8} {'m':>4} {'efC':>5} {'efS':>5} {'k':>4} {'recall':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for engine, m, ef_construction in itertools.product(args.engine, args.m, args.ef_construction):
+        index = f"bench-{engine}-m{m}-efc{ef_construction}"
+        body = build_index_body(
+            dimension=dimension,
+            engine=engine,
+            space_type=args.space_type,
+            m=m,
+            ef_construction=ef_construction,
+            ef_search=args.ef_search[0]
+        )
+        load_seconds = load_index(raw_client, index, body, corpus)
+        client = AWSOpenSearchClient(client=raw_client, index_name=index)
+
+        for ef_search in args.ef_search:
+            # nmslib/faiss read ef_search from the index setting; lucene sizes
+            # its candidate queue from k, so ef_search has no effect there
+            raw_client.indices.put_settings(index=index, body={"index": {"knn.algo_param.ef_search": ef_search}})
+
+            for k in args.k:
+                stats = run_queries(client, query_set, truth_by_k[k], k, args.session_filter, args.warmup)
+                row = {
+                    "target": args.target,
+                    "engine": engine,
+                    "space_type": args.space_type,
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                    "k": k,
+                    "docs": len(corpus),
+                    "dimension": dimension,
+                    "session_filter": args.session_filter,
+                    "load_seconds": round(load_seconds, 2),
+                    **stats
+                }
+                print(f"{engine:<8} {m:>4} {ef_construction:>5} {ef_search:>5} {k:>4} "
+                      f"{stats['recall_at_k']:>7.3f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+                if output:
+                    output.write(json.dumps(row) + "\n")
+                    output.flush()
+
+        if not args.keep:
+            raw_client.indices.delete(index=index)
+
+    if output:
+        output.close()
+        print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
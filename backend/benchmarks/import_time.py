@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Import-time profile for the Python entry points spawned by Node
+
+Runs each entry module in a fresh interpreter with `python -X importtime`
+and reports total wall time plus the slowest imports (cumulative).
+
+Usage: python import_time.py [--repeat N] [--top N] [--output results.json]
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Module imported by each Node-facing script, and the directories it puts on sys.path
+TARGETS = {
+    "chat_script": ("orchestrator", ["air_llm", "db"]),
+    "process_resume": ("chunking", ["db"]),
+    "search_resume": ("chunking", ["db"]),
+    "get_session_data": ("aws_opensearch", ["db"]),
+}
+
+
+def parse_importtime(stderr: str):
+    """Parse `-X importtime` lines into (module, self_us, cumulative_us)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+            rows.append((module.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_target(module: str, path_dirs, env=None):
+    """Import a module in a fresh interpreter and return timing data"""
+    code = "; ".join(
+        [f"import sys"] +
+        [f"sys.path.append({str(BACKEND_DIR / d)!r})" for d in path_dirs] +
+        [f"import {module}"]
+    )
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    rows = parse_importtime(proc.stderr)
+    return {
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode != 0 and proc.stderr.strip() else None,
+        "wall_ms": round(wall_ms, 2),
+        "import_ms": round(sum(r[1] for r in rows) / 1000, 2),
+        "rows": rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of backend entry points")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per target (best is reported)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to show per target")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    results = {}
+
+    for name, (module, path_dirs) in TARGETS.items():
+        runs = [profile_target(module, path_dirs, env) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["wall_ms"])
+        slowest = sorted(best["rows"], key=lambda r: r[2], reverse=True)[:args.top]
+        results[name] = {
+            "module": module,
+            "ok": best["ok"],
+            "error": best["error"],
+            "wall_ms": best["wall_ms"],
+            "import_ms": best["import_ms"],
+            "wall_ms_runs": [r["wall_ms"] for r in runs],
+            "slowest_imports": [
+                {"module": m, "self_ms": round(s / 1000, 2), "cumulative_ms": round(c / 1000, 2)}
+                for m, s, c in slowest
+            ]
+        }
+
+        print(f"\n{name} (import {module}): wall {best['wall_ms']} ms, imports {best['import_ms']} ms")
+        if not best["ok"]:
+            print(f"  import failed: {best['error']}")
+        for row in results[name]["slowest_imports"]:
+            print(f"  {row['cumulative_ms']:>9.2f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
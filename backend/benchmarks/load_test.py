@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Load generator for concurrent chat and upload traffic
+
+Drives either the Node API (--mode http: POST /api/conversations/:id/messages
+and multipart POST /api/upload) or the Python pipeline in-process
+(--mode direct: ask_agents and process_resume_pipeline). Run the server or
+this script with STUB_MODE=replay for repeatable capacity tests without
+network access or API spend.
+
+Arrival model:
+  --rate R         open loop, Poisson arrivals at R req/s; latency is measured
+                   from the scheduled arrival, so queueing behind
+                   --concurrency counts (no coordinated omission)
+  (no --rate)      closed loop, --concurrency workers back to back
+
+Workload:
+  --mix chat=0.9,upload=0.1
+  --corpus         text file (one message per line) or JSONL with
+                   {"content": ..., "weight": ...}; defaults to a built-in mix
+  --pdf            resume(s) used for uploads and --preload
+
+Reports throughput, error rate and p50/p95/p99 per --interval, then totals.
+Chat responses that are the server's apology text count as errors, as do
+uploads that come back with status "processing_failed".
+
+Usage:
+  python load_test.py --mode http --base-url http://localhost:5000 --rate 2 --concurrency 16 --duration 120 --pdf resume.pdf --preload
+  STUB_MODE=replay python load_test.py --mode direct --concurrency 8 --duration 60 --output load.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import urllib.request
+import urllib.error
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_stats import summarize
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+DEFAULT_CORPUS = [
+    ("Can you review my resume and tell me what to improve?", 3),
+    ("What are the strengths and weaknesses of my resume?", 2),
+    ("What jobs would suit my experience?", 3),
+    ("Find me remote data engineering positions", 1),
+    ("Help me prepare for a software engineering interview", 3),
+    ("What questions should I expect in a behavioral interview?", 2),
+    ("How do I negotiate a salary offer?", 2),
+    ("Should I switch careers into product management?", 1),
+]
+
+# generateAIResponse in routes/conversations.js resolves failures to this text
+APOLOGY_PREFIX = "I apologize, but I encountered an error"
+
+
+def load_corpus(path: str):
+    if not path:
+        return DEFAULT_CORPUS
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                corpus.append((entry["content"], float(entry.get("weight", 1))))
+            else:
+                corpus.append((line, 1.0))
+    return corpus
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        kind, weight = part.split("=", 1)
+        mix[kind.strip()] = float(weight)
+    unknown = set(mix) - {"chat", "upload"}
+    if unknown:
+        raise ValueError(f"Unknown request kinds in --mix: {sorted(unknown)}")
+    return mix
+
+
+class LoadError(Exception):
+    """A request that completed but failed (HTTP error, apology text, failed ingest)"""
+
+
+# === Targets ===
+
+class HttpTarget:
+    """Node API; blocking urllib calls run in worker threads"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: bytes = None, headers=None):
+        request = urllib.request.Request(f"{self.base_url}{path}", data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            raise LoadError(f"HTTP {e.code} {method} {path}")
+
+    def _create_session(self) -> str:
+        return self._request("POST", "/api/conversations", b"{}", {"Content-Type": "application/json"})["id"]
+
+    def _chat(self, session_id: str, content: str):
+        body = json.dumps({"content": content}).encode()
+        result = self._request("POST", f"/api/conversations/{session_id}/messages", body,
+                               {"Content-Type": "application/json"})
+        if result.get("content", "").startswith(APOLOGY_PREFIX):
+            raise LoadError("chat pipeline error")
+
+    def _upload(self, session_id: str, pdf: str):
+        boundary = uuid.uuid4().hex
+        with open(pdf, "rb") as f:
+            data = f.read()
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="conversationId"\r\n\r\n{session_id}\r\n'.encode(),
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{Path(pdf).name}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode(),
+            data,
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ]
+        result = self._request("POST", "/api/upload", b"".join(parts),
+                               {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        if result.get("status") != "processed":
+            raise LoadError(f"upload {result.get('status')}")
+
+    async def create_session(self) -> str:
+        return await asyncio.to_thread(self._create_session)
+
+    async def chat(self, session_id: str, content: str):
+        await asyncio.to_thread(self._chat, session_id, content)
+
+    async def upload(self, session_id: str, pdf: str):
+        await asyncio.to_thread(self._upload, session_id, pdf)
+
+
+class DirectTarget:
+    """ask_agents / process_resume_pipeline in this process (shares its clients and caches)"""
+
+    def __init__(self):
+        os.environ.setdefault('STUB_MODE', 'replay')
+        sys.path.append(str(BACKEND_DIR / 'db'))
+        sys.path.append(str(BACKEND_DIR / 'air_llm'))
+        from chunking import process_resume_pipeline
+        from orchestrator import ask_agents
+        self._ask_agents = ask_agents
+        self._process_resume = process_resume_pipeline
+
+    async def create_session(self) -> str:
+        return str(uuid.uuid4())
+
+    async def chat(self, session_id: str, content: str):
+        await self._ask_agents(content, user_id=session_id, session_id=session_id)
+
+    async def upload(self, session_id: str, pdf: str):
+        if not await asyncio.to_thread(self._process_resume, pdf, Path(pdf).name, session_id):
+            raise LoadError("ingest failed")
+
+
+# === Load loop ===
+
+class Recorder:
+    """Collects results per reporting interval and overall"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.buckets = defaultdict(lambda: defaultdict(lambda: {"latencies": [], "errors": 0}))
+        self.totals = defaultdict(lambda: {"latencies": [], "errors": 0})
+        self.error_kinds = defaultdict(int)
+
+    def record(self, kind: str, latency_ms: float, error: str = None):
+        bucket = int((time.perf_counter() - self.start) // self.interval)
+        for stats in (self.buckets[bucket][kind], self.totals[kind]):
+            if error:
+                stats["errors"] += 1
+            else:
+                stats["latencies"].append(latency_ms)
+        if error:
+            self.error_kinds[f"{kind}: {error}"] += 1
+
+    def interval_rows(self, up_to: int):
+        rows = []
+        for bucket in sorted(b for b in self.buckets if b < up_to):
+            for kind, stats in sorted(self.buckets.pop(bucket).items()):
+                rows.append({
+                    "t": round((bucket + 1) * self.interval, 1),
+                    "kind": kind,
+                    **summarize(stats["latencies"], stats["errors"], self.interval)
+                })
+        return rows
+
+
+async def run_load(target, args, corpus, mix, recorder: Recorder, sessions):
+    rng = random.Random(args.seed)
+    messages, weights = zip(*corpus)
+    kinds, kind_weights = zip(*mix.items())
+    semaphore = asyncio.Semaphore(args.concurrency)
+    deadline = time.perf_counter() + args.duration
+
+    def next_request():
+        kind = rng.choices(kinds, kind_weights)[0]
+        if kind == "upload" and not args.pdf:
+            kind = "chat"
+        payload = rng.choice(args.pdf) if kind == "upload" else rng.choices(messages, weights)[0]
+        return kind, rng.choice(sessions), payload
+
+    async def execute(kind: str, session_id: str, payload: str, scheduled: float):
+        async with semaphore:
+            error = None
+            try:
+                if kind == "chat":
+                    await target.chat(session_id, payload)
+                else:
+                    await target.upload(session_id, payload)
+            except LoadError as e:
+                error = str(e)
+            except Exception as e:
+                error = type(e).__name__
+            recorder.record(kind, (time.perf_counter() - scheduled) * 1000, error)
+
+    tasks = []
+    if args.rate:
+        # Open loop: arrivals are independent of how fast the system answers
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(execute(*next_request(), next_arrival)))
+            next_arrival += rng.expovariate(args.rate)
+    else:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await execute(*next_request(), time.perf_counter())
+        tasks = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    await asyncio.gather(*tasks)
+
+
+async def report_intervals(recorder: Recorder, output, stop: asyncio.Event):
+    bucket = 1
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=recorder.start + bucket * recorder.interval - time.perf_counter())
+        except asyncio.TimeoutError:
+            pass
+        for row in recorder.interval_rows(bucket):
+            print(f"{row['t']:>7.1f}s {row['kind']:<7} {row['requests']:>5} {row['throughput_rps']:>8.2f} "
+                  f"{row['error_rate']:>7.2%} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+            if output:
+                output.write(json.dumps({"type": "interval", **row}) + "\n")
+        bucket += 1
+
+
+async def main_async(args):
+    corpus = load_corpus(args.corpus)
+    mix = parse_mix(args.mix)
+    target = HttpTarget(args.base_url, args.timeout) if args.mode == "http" else DirectTarget()
+    # Blocking calls run in threads; size the pool so it never caps concurrency
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency + 4))
+
+    sessions = [await target.create_session() for _ in range(args.sessions)]
+    if args.preload:
+        if not args.pdf:
+            raise SystemExit("--preload requires --pdf")
+        await asyncio.gather(*(target.upload(s, args.pdf[i % len(args.pdf)]) for i, s in enumerate(sessions)))
+
+    output = open(args.output, "a") if args.output else None
+    recorder = Recorder(args.interval)
+    stop = asyncio.Event()
+    print(f"{'time':>8} {'kind':<7} {'reqs':>5} {'rps':>8} {'errors':>7} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    reporter = asyncio.create_task(report_intervals(recorder, output, stop))
+    await run_load(target, args, corpus, mix, recorder, sessions)
+    wall_seconds = time.perf_counter() - recorder.start
+    stop.set()
+    await reporter
+    for row in recorder.interval_rows(float("inf")):
+        if output:
+            output.write(json.dumps({"type": "interval", **row}) + "\n")
+
+    summary = {
+        "type": "summary",
+        "mode": args.mode,
+        "stub_mode": os.getenv('STUB_MODE', 'off'),
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "sessions": args.sessions,
+        "mix": mix,
+        "wall_seconds": round(wall_seconds, 2),
+        "results": {kind: summarize(s["latencies"], s["errors"], wall_seconds) for kind, s in recorder.totals.items()},
+        "error_kinds": dict(recorder.error_kinds),
+    }
+    print(json.dumps(summary, indent=2))
+    if output:
+        output.write(json.dumps(summary) + "\n")
+        output.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat/upload load generator")
+    parser.add_argument("--mode", choices=["http", "direct"], default="http")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--rate", type=float, help="Poisson arrival rate in req/s (default: closed loop)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max requests in flight")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load")
+    parser.add_argument("--interval", type=float, default=10, help="Reporting interval in seconds")
+    parser.add_argument("--mix", default="chat=1", help="Request mix, e.g. chat=0.9,upload=0.1")
+    parser.add_argument("--corpus", help="Chat messages (text lines or JSONL with content/weight)")
+    parser.add_argument("--pdf", nargs="+", help="Resume PDF(s) for uploads")
+    parser.add_argument("--sessions", type=int, default=10, help="Conversations to spread load over")
+    parser.add_argument("--preload", action="store_true", help="Upload a resume into every session first")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout for http mode")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Append interval and summary JSON lines to this file")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
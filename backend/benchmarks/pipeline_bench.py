@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the chat (and optionally ingest) pipeline
+
+Runs ask_agents against the record/replay stubs, so the orchestrator,
+agents, embedding, retrieval and LLM call paths all execute without network
+access or API spend. Latency per service comes from the recorded fixtures
+(or STUB_LATENCY), which makes runs repeatable and lets a code change be
+measured in isolation.
+
+Record fixtures once against the real services:
+  STUB_MODE=record python pipeline_bench.py --pdf resume.pdf --session-id bench --iterations 1
+Then benchmark offline:
+  STUB_MODE=replay python pipeline_bench.py --pdf resume.pdf --session-id bench --iterations 50 --concurrency 4
+
+Usage: python pipeline_bench.py [--messages messages.txt] [--iterations N] [--concurrency C] [--output results.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Default to offline replay; set STUB_MODE=record (or off) explicitly to hit real services
+os.environ.setdefault('STUB_MODE', 'replay')
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR / 'db'))
+sys.path.append(str(BACKEND_DIR / 'air_llm'))
+sys.path.append(str(BACKEND_DIR / 'stubs'))
+
+from chunking import process_resume_pipeline
+from orchestrator import ask_agents
+from bench_stats import summarize
+
+DEFAULT_MESSAGES = [
+    "Can you review my resume and tell me what to improve?",
+    "What jobs would suit my experience?",
+    "Help me prepare for a software engineering interview",
+    "How do I negotiate a salary offer?",
+]
+
+
+async def run_chat(messages, iterations: int, concurrency: int, session_id: str):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies_ms = []
+    errors = 0
+
+    async def one(message: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await ask_agents(message, user_id="bench", session_id=session_id)
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors += 1
+                print(f"Chat error: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(messages[i % len(messages)]) for i in range(iterations)))
+    return summarize(latencies_ms, errors, time.perf_counter() - start)
+
+
+def run_ingest(pdf: str, session_id: str, iterations: int):
+    latencies_ms = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        ingest_start = time.perf_counter()
+        if process_resume_pipeline(pdf, Path(pdf).name, session_id):
+            latencies_ms.append((time.perf_counter() - ingest_start) * 1000)
+        else:
+            errors += 1
+    return summarize(latencies_ms, errors, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline against recorded fixtures")
+    parser.add_argument("--messages", help="Text file with one chat message per line")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--session-id", help="Session whose resume chunks are searched")
+    parser.add_argument("--pdf", help="Ingest this resume under --session-id before chatting")
+    parser.add_argument("--ingest-iterations", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed chat requests before measuring")
+    parser.add_argument("--output", help="Append the JSON result to this file")
+    args = parser.parse_args()
+
+    if args.messages:
+        with open(args.messages) as f:
+            messages = [line.strip() for line in f if line.strip()]
+    else:
+        messages = DEFAULT_MESSAGES
+
+    result = {
+        "stub_mode": os.environ['STUB_MODE'],
+        "stub_latency": os.getenv('STUB_LATENCY', ''),
+        "stub_latency_scale": os.getenv('STUB_LATENCY_SCALE', '1.0'),
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+    }
+
+    if args.pdf:
+        if not args.session_id:
+            parser.error("--pdf requires --session-id")
+        result["ingest"] = run_ingest(args.pdf, args.session_id, args.ingest_iterations)
+
+    if args.warmup:
+        asyncio.run(run_chat(messages, args.warmup, 1, args.session_id))
+    result["chat"] = asyncio.run(run_chat(messages, args.iterations, args.concurrency, args.session_id))
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
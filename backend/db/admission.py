@@ -0,0 +1,312 @@
+"""
+Admission control for upstream providers: token buckets, bounded concurrency
+and fast rejection
+
+Each limiter key names a provider and model ("openai:embeddings",
+"air:meta-llama/Llama-3.1-70B-Instruct", "opensearch"). A caller first takes
+a token from the key's bucket, then a concurrency slot; if either would
+take longer than max_wait it is rejected with AdmissionRejected instead of
+queueing indefinitely, so callers can degrade or fail fast.
+
+RATE_LIMITS (JSON) overrides or adds keys, e.g.
+  RATE_LIMITS='{"openai:gpt-4o": {"rate": 2, "burst": 4, "concurrency": 2, "max_wait": 3}}'
+"provider:*" entries apply to every model of that provider; keys with no
+entry are not limited.
+
+Every chat runs in its own process, so buckets are shared through a SQLite
+file (RATE_LIMIT_STATE_PATH) unless it is set to an empty string.
+Concurrency slots are per process; the Node route bounds how many chat
+processes run at once.
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional
+
+from tracing import get_logger
+from metrics import ADMISSION_REQUESTS, ADMISSION_WAIT
+
+logger = get_logger("admission")
+
+DEFAULT_RATE_LIMITS = {
+    "openai:embeddings": {"rate": 50, "burst": 50, "concurrency": 8, "max_wait": 2.0},
+    "openai:gpt-4o": {"rate": 5, "burst": 10, "concurrency": 4, "max_wait": 5.0},
+    "openai:gpt-4o-mini": {"rate": 10, "burst": 20, "concurrency": 4, "max_wait": 5.0},
+    "air:*": {"rate": 5, "burst": 10, "concurrency": 4, "max_wait": 5.0},
+    "opensearch": {"rate": 100, "burst": 100, "concurrency": 16, "max_wait": 1.0},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv('RATE_LIMITS', '{}'))}
+RATE_LIMIT_STATE_PATH = os.getenv(
+    'RATE_LIMIT_STATE_PATH', str(Path(__file__).parent.parent / 'rate_limits.db'))
+# Used when an upstream 429 carries no Retry-After
+DEFAULT_THROTTLE_BACKOFF = float(os.getenv('DEFAULT_THROTTLE_BACKOFF', '2.0'))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted within its max wait"""
+
+    def __init__(self, key: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{key}: {reason}")
+        self.key = key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# === Token bucket state ===
+
+class _MemoryBuckets:
+    """Bucket state for this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, list] = {}
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token; returns 0 or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, blocked_until = self._state.get(key, (burst, now, 0.0))
+            return self._take(key, now, tokens, updated, blocked_until, rate, burst)
+
+    def _take(self, key, now, tokens, updated, blocked_until, rate, burst) -> float:
+        if now < blocked_until:
+            self._state[key] = (tokens, updated, blocked_until)
+            return blocked_until - now
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self._state[key] = (tokens - 1, now, blocked_until)
+            return 0.0
+        self._state[key] = (tokens, now, blocked_until)
+        return (1 - tokens) / rate
+
+    def block(self, key: str, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, blocked_until = self._state.get(key, (0.0, now, 0.0))
+            self._state[key] = (0.0, now, max(blocked_until, now + seconds))
+
+
+class _SqliteBuckets:
+    """Bucket state shared by every process through one SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        conn = self._connect()
+        now = time.time()  # wall clock: shared across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated, blocked_until = row if row else (burst, now, 0.0)
+            if now < blocked_until:
+                wait = blocked_until - now
+            else:
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                if tokens >= 1:
+                    tokens, wait = tokens - 1, 0.0
+                else:
+                    wait = (1 - tokens) / rate
+                updated = now
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)",
+                (key, tokens, updated, blocked_until)
+            )
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def block(self, key: str, seconds: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO buckets (key, tokens, updated, blocked_until) VALUES (?, 0, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET tokens = 0, updated = excluded.updated, "
+            "blocked_until = MAX(blocked_until, excluded.blocked_until)",
+            (key, now, now + seconds)
+        )
+
+
+def _make_buckets():
+    if RATE_LIMIT_STATE_PATH:
+        try:
+            buckets = _SqliteBuckets(RATE_LIMIT_STATE_PATH)
+            buckets._connect()
+            return buckets
+        except sqlite3.Error as e:
+            logger.warning("Shared rate limit state unavailable (%s); limiting per process", e)
+    return _MemoryBuckets()
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def _get_buckets():
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                _buckets = _make_buckets()
+    return _buckets
+
+
+# === Limiters ===
+
+class Limiter:
+    """Token bucket plus a concurrency bound for one provider/model key"""
+
+    def __init__(self, key: str, rate: float, burst: float = None, concurrency: int = None, max_wait: float = 1.0):
+        self.key = key
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.max_wait = float(max_wait)
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+    def _take_token(self, deadline: float) -> Optional[float]:
+        """Seconds to sleep before retrying, or None once a token is taken"""
+        try:
+            wait = _get_buckets().take(self.key, self.rate, self.burst)
+        except sqlite3.Error as e:
+            # Fail open: a broken state file must not stop all traffic
+            logger.warning("Rate limit state error for %s: %s", self.key, e)
+            return None
+        if wait <= 0:
+            return None
+        if time.monotonic() + wait > deadline:
+            self._reject("rate limited", wait)
+        return wait
+
+    def _reject(self, reason: str, retry_after: float):
+        ADMISSION_REQUESTS.inc(key=self.key, result="rejected")
+        raise AdmissionRejected(self.key, reason, retry_after=round(max(retry_after, 0.1), 2))
+
+    def acquire(self, max_wait: float = None):
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        while (wait := self._take_token(deadline)) is not None:
+            time.sleep(wait)
+        if self._slots and not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._reject("too many concurrent requests", 1.0)
+        ADMISSION_WAIT.observe(time.monotonic() - start, key=self.key)
+        ADMISSION_REQUESTS.inc(key=self.key, result="admitted")
+
+    async def acquire_async(self, max_wait: float = None):
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        while (wait := self._take_token(deadline)) is not None:
+            await asyncio.sleep(wait)
+        if self._slots:
+            # Poll so the slot can be shared by threads and any event loop
+            delay = 0.005
+            while not self._slots.acquire(blocking=False):
+                if time.monotonic() + delay > deadline:
+                    self._reject("too many concurrent requests", 1.0)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        ADMISSION_WAIT.observe(time.monotonic() - start, key=self.key)
+        ADMISSION_REQUESTS.inc(key=self.key, result="admitted")
+
+    def release(self):
+        if self._slots:
+            self._slots.release()
+
+    def backoff(self, seconds: float):
+        """Stop admitting for a while after the upstream answered 429"""
+        ADMISSION_REQUESTS.inc(key=self.key, result="throttled")
+        logger.warning("%s throttled upstream; pausing %.1fs", self.key, seconds)
+        try:
+            _get_buckets().block(self.key, seconds)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit state error for %s: %s", self.key, e)
+
+
+_limiters: Dict[str, Optional[Limiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str) -> Optional[Limiter]:
+    """Limiter for a key, from its own entry or its provider's "provider:*" entry"""
+    if key not in _limiters:
+        with _limiters_lock:
+            if key not in _limiters:
+                config = RATE_LIMITS.get(key) or RATE_LIMITS.get(f"{key.split(':', 1)[0]}:*")
+                _limiters[key] = Limiter(key, **config) if config else None
+    return _limiters[key]
+
+
+def throttle_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to back off if error is an upstream 429, else None"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError":
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_THROTTLE_BACKOFF * (1 + random.random() * 0.5)
+
+
+def _note_throttle(limiter: Optional[Limiter], error: BaseException):
+    retry_after = throttle_retry_after(error)
+    if limiter and retry_after is not None:
+        limiter.backoff(retry_after)
+
+
+@contextmanager
+def admit(key: str, max_wait: float = None):
+    """Admit one blocking call to key (no-op if the key is not limited)"""
+    limiter = get_limiter(key)
+    if limiter is None:
+        yield
+        return
+    limiter.acquire(max_wait)
+    try:
+        yield
+    except Exception as e:
+        _note_throttle(limiter, e)
+        raise
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def admit_async(key: str, max_wait: float = None):
+    """Admit one coroutine call to key (no-op if the key is not limited)"""
+    limiter = get_limiter(key)
+    if limiter is None:
+        yield
+        return
+    await limiter.acquire_async(max_wait)
+    try:
+        yield
+    except Exception as e:
+        _note_throttle(limiter, e)
+        raise
+    finally:
+        limiter.release()
@@ -0,0 +1,80 @@
+"""
+Cached, self-refreshing AWS credentials for SigV4 request signing
+"""
+
+import os
+import threading
+import boto3
+from botocore.credentials import RefreshableCredentials
+from requests_aws4auth import AWS4Auth
+from tracing import get_logger
+
+logger = get_logger("aws_credentials")
+
+# How often the background thread checks whether temporary credentials are
+# close to expiry. botocore refreshes inside its advisory window (15 minutes
+# before expiry), so a check every minute refreshes well ahead of any request.
+REFRESH_CHECK_INTERVAL = float(os.getenv('AWS_CREDENTIALS_REFRESH_INTERVAL', '60'))
+
+_credentials = None
+_auth_cache = {}
+_lock = threading.RLock()
+_refresher = None
+_stop_refresh = threading.Event()
+
+
+def _refresh_loop(credentials: RefreshableCredentials):
+    """Touch the credentials periodically so botocore refreshes them off the request path"""
+    while not _stop_refresh.wait(REFRESH_CHECK_INTERVAL):
+        try:
+            credentials.get_frozen_credentials()
+        except Exception as e:
+            # The next signing call retries the refresh itself
+            logger.warning("Credential refresh failed: %s", e)
+
+
+def get_aws_credentials():
+    """Get the process-wide boto3 credentials, resolving the provider chain once"""
+    global _credentials, _refresher
+    if _credentials is None:
+        with _lock:
+            if _credentials is None:
+                credentials = boto3.Session().get_credentials()
+                if credentials is None:
+                    raise ValueError("AWS credentials not found")
+
+                # Temporary credentials (assumed role, SSO, instance profile)
+                # are refreshed in the background before they expire
+                if isinstance(credentials, RefreshableCredentials):
+                    _refresher = threading.Thread(
+                        target=_refresh_loop,
+                        args=(credentials,),
+                        name="aws-credentials-refresher",
+                        daemon=True
+                    )
+                    _refresher.start()
+
+                _credentials = credentials
+    return _credentials
+
+
+def get_aws_auth(region: str, service: str = 'es') -> AWS4Auth:
+    """
+    Get a shared AWS4Auth for a region/service.
+    The auth reads the current frozen credentials on every request, so it
+    keeps signing correctly after a session token is rotated.
+    """
+    key = (region, service)
+    auth = _auth_cache.get(key)
+    if auth is None:
+        with _lock:
+            auth = _auth_cache.get(key)
+            if auth is None:
+                # With refreshable_credentials, AWS4Auth takes region and service by keyword only
+                auth = AWS4Auth(
+                    region=region,
+                    service=service,
+                    refreshable_credentials=get_aws_credentials()
+                )
+                _auth_cache[key] = auth
+    return auth
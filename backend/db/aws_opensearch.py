@@ -1,84 +1,374 @@
-import boto3
 import json
 import os
-from typing import List, Dict, Any
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+import sys
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Any
 from dotenv import load_dotenv
+from tracing import get_logger, log_sampled, span, summarize_query
+from metrics import OPENSEARCH_LATENCY, OPENSEARCH_HITS
+import session_cache
+from admission import admit
+
+if TYPE_CHECKING:
+    import numpy as np  # imported where used, to keep script startup fast
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("opensearch")
+
+# Transport tuning (shared by every client in the process)
+POOL_MAXSIZE = int(os.getenv('OPENSEARCH_POOL_MAXSIZE', '10'))
+REQUEST_TIMEOUT = float(os.getenv('OPENSEARCH_TIMEOUT', '30'))
+MAX_RETRIES = int(os.getenv('OPENSEARCH_MAX_RETRIES', '3'))
+HTTP_COMPRESS = os.getenv('OPENSEARCH_HTTP_COMPRESS', 'true').lower() == 'true'
+RETRY_ON_STATUS = (429, 502, 503, 504)
+
+# Index layout. Reads and writes go through the alias; each versioned index
+# behind it (resume-vectors-v1, -v2, ...) fixes its own dimension and HNSW
+# parameters, so changing either means reindexing rather than dropping data.
+INDEX_ALIAS = os.getenv('OPENSEARCH_INDEX', 'resume-vectors')
+EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', '3072'))  # text-embedding-3-large
+HNSW_ENGINE = os.getenv('HNSW_ENGINE', 'lucene')
+HNSW_SPACE_TYPE = os.getenv('HNSW_SPACE_TYPE', 'cosinesimil')
+HNSW_M = int(os.getenv('HNSW_M', '16'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', '512'))
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', '100'))
+# Session deletions (session_id, deleted_at), replayed by reindex.py onto an
+# index that was being filled while they happened
+TOMBSTONE_INDEX = os.getenv('OPENSEARCH_TOMBSTONE_INDEX', f'{INDEX_ALIAS}-deletions')
+# Engines that apply a filter during the kNN search (nmslib only post-filters)
+EFFICIENT_FILTER_ENGINES = ('lucene', 'faiss')
+# Primary shards per versioned index. Chunks are routed by session_id, so
+# every session read, write and delete touches a single shard however many
+# there are; changing this takes a reindex.
+OPENSEARCH_SHARDS = int(os.getenv('OPENSEARCH_SHARDS', '1'))
+# Keep vectors out of _source: kNN search reads the vector index, not
+# _source, so storing them there only multiplies disk size and fetch cost.
+# Such an index can only be rebuilt with reindex.py --mode reembed.
+OPENSEARCH_EXCLUDE_VECTORS = os.getenv('OPENSEARCH_EXCLUDE_VECTORS', 'true').lower() == 'true'
+# How long a point-in-time used by iter_sessions stays open between pages
+SCAN_KEEP_ALIVE = os.getenv('OPENSEARCH_SCAN_KEEP_ALIVE', '5m')
+# Significant digits written per vector component; 9 round-trips every
+# float32 exactly, fewer trade precision for smaller bulk bodies
+VECTOR_DIGITS = int(os.getenv('VECTOR_DIGITS', '9'))
+
+# Cross-session candidate search: nearest chunks pooled per request (per
+# shard for lucene/faiss), and the best chunks returned per candidate
+CANDIDATE_POOL = int(os.getenv('CANDIDATE_POOL', '1000'))
+CANDIDATE_MATCHES = int(os.getenv('CANDIDATE_MATCHES', '3'))
+CANDIDATE_RANKINGS = ('max', 'sum')
+
+# Record/replay for offline benchmarks (see stubs/stub_mode.py)
+STUB_MODE = os.getenv('STUB_MODE', 'off').lower()
+
+# Process-wide client so every caller reuses the same warm connection pool
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_opensearch_client():
+    """Get the shared OpenSearch client for this process"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = AWSOpenSearchClient()
+    return _shared_client
+
+
+def build_index_body(
+    dimension: int = EMBEDDING_DIMENSION,
+    engine: str = HNSW_ENGINE,
+    space_type: str = HNSW_SPACE_TYPE,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    ef_search: int = HNSW_EF_SEARCH,
+    shards: int = OPENSEARCH_SHARDS,
+    exclude_vectors: bool = OPENSEARCH_EXCLUDE_VECTORS
+) -> Dict[str, Any]:
+    """Settings and mapping for a versioned resume index"""
+    body = {
+        "settings": {
+            "index": {
+                "knn": True,
+                "knn.algo_param.ef_search": ef_search,
+                "number_of_shards": shards
+            }
+        },
+        "mappings": {
+            "properties": {
+                "content": {"type": "text"},
+                "embedding": {
+                    "type": "knn_vector",
+                    "dimension": dimension,
+                    "method": {
+                        "name": "hnsw",
+                        "space_type": space_type,
+                        "engine": engine,
+                        "parameters": {
+                            "m": m,
+                            "ef_construction": ef_construction
+                        }
+                    }
+                },
+                "metadata": {
+                    "properties": {
+                        # .keyword sub-field keeps the existing session filters working
+                        "session_id": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+                        "type": {"type": "keyword"},
+                        "section": {"type": "keyword"},
+                        "source": {"type": "keyword"},
+                        "filename": {"type": "keyword"},
+                        # Position in the resume; iter_sessions sorts and pages on it
+                        "chunk_index": {"type": "integer"},
+                        "created_at": {"type": "date"},
+                        # UTC time the chunk was written (reindex catch-up)
+                        "indexed_at": {"type": "date"}
+                    }
+                }
+            }
+        }
+    }
+    if exclude_vectors:
+        body["mappings"]["_source"] = {"excludes": ["embedding"]}
+    return body
+
+
+def utc_now() -> str:
+    """Current UTC time as an ISO 8601 string (the format chunk timestamps are stored in)"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def vectors_in_source(mappings: Dict[str, Any]) -> bool:
+    """False if an index mapping keeps the embedding out of _source"""
+    return "embedding" not in mappings.get("_source", {}).get("excludes", [])
+
+
+@lru_cache(maxsize=8)
+def _vector_format(dimension: int, digits: int) -> str:
+    return "[" + ",".join([f"%.{digits}g"] * dimension) + "]"
+
+
+def encode_vector(vector, digits: int = VECTOR_DIGITS) -> str:
+    """
+    JSON array of a vector at float32 precision (shorter than repr floats,
+    and parsing it back gives the same float32 values), formatted in one
+    pass from a float32 array or list
+    """
+    import numpy as np
+    values = np.asarray(vector, dtype=np.float32).ravel().tolist()
+    return _vector_format(len(values), digits) % tuple(values)
+
+
+def bulk_ndjson(actions: List[tuple]) -> str:
+    """
+    Bulk request body for (action, document) pairs, with each document's
+    embedding written by encode_vector instead of the default float encoder
+    """
+    lines = []
+    for action, doc in actions:
+        lines.append(json.dumps(action, separators=(",", ":"), default=str))
+        vector = doc.get("embedding")
+        rest = {key: value for key, value in doc.items() if key != "embedding"}
+        encoded = json.dumps(rest, separators=(",", ":"), default=str)
+        if vector is not None:
+            encoded = f'{encoded[:-1]}{"," if rest else ""}"embedding":{encode_vector(vector)}}}'
+        lines.append(encoded)
+    return "\n".join(lines) + "\n"
+
+
+def build_metadata_filters(
+    session_id: str = None,
+    sections: List[str] = None,
+    filters: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """term/terms clauses on chunk metadata for a kNN search"""
+    clauses = []
+    if session_id:
+        clauses.append({"term": {"metadata.session_id.keyword": session_id}})
+    if sections:
+        clauses.append({"terms": {"metadata.section": list(sections)}})
+    for field, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({"terms": {f"metadata.{field}": list(value)}})
+        else:
+            clauses.append({"term": {f"metadata.{field}": value}})
+    return clauses
+
+
+# Response fields the read paths use; drops shard stats, index names and ids.
+# With no hits the filtered response has no "hits" key at all.
+SEARCH_FILTER_PATH = ["hits.hits._source", "hits.hits._score"]
+
+
+def knn_query(query_embedding, k: int, filter_clauses: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """kNN query on the embedding field for the k nearest chunks matching filter_clauses"""
+    import numpy as np
+    knn = {"vector": np.asarray(query_embedding, dtype=np.float32).tolist(), "k": k}
+    query = {"bool": {"must": [{"knn": {"embedding": knn}}]}}
+    if filter_clauses:
+        if HNSW_ENGINE in EFFICIENT_FILTER_ENGINES:
+            # Filter inside the kNN search so k hits come from the matching
+            # chunks only; a post-filter would keep the global top k and
+            # usually leave few or none for one session and section
+            knn["filter"] = {"bool": {"filter": filter_clauses}}
+        else:
+            query["bool"]["filter"] = filter_clauses
+    return query
+
+
+def session_routing(session_id: str = None) -> Dict[str, str]:
+    """
+    Request params that send a session's operation to its one shard.
+    Routing only picks the shard; the session_id term filter still applies,
+    since other sessions share it.
+    """
+    return {"routing": session_id} if session_id else {}
+
+
+def chunk_position(chunk: Dict[str, Any]) -> int:
+    """
+    A chunk's position in its resume: metadata.chunk_index, or the suffix of
+    its id (resume_chunk_<session>_<i>) for chunks written before that field
+    """
+    position = chunk.get("metadata", {}).get("chunk_index")
+    if position is not None:
+        return int(position)
+    suffix = chunk["id"].rsplit("_", 1)[-1]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def _in_document_order(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunks sorted by their position in the resume"""
+    return sorted(chunks, key=chunk_position)
+
+
 class AWSOpenSearchClient:
-    def __init__(self):
+    def __init__(self, client=None, index_name: str = None):
+        """
+        client/index_name override the AWS domain and alias, e.g. to point the
+        same query code at a local OpenSearch container or the in-process stand-in
+        """
         self.region = os.getenv('AWS_REGION', 'us-east-1')
         self.host = os.getenv('OPENSEARCH_ENDPOINT')
         self.service = 'es'
-        
-        # Use IAM authentication with IAM ARN is set as master user
-        credentials = boto3.Session().get_credentials()
-        self.awsauth = AWS4Auth(
-            credentials.access_key, 
-            credentials.secret_key, 
-            self.region, 
-            self.service, 
-            session_token=credentials.token
-        )
-        
-        # OpenSearch client
-        self.client = OpenSearch(
+        self.index_name = index_name or INDEX_ALIAS
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenSearch client, built on first use so importing this module stays cheap"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    with span("opensearch.client_init"):
+                        if STUB_MODE == 'off':
+                            self._client = self._build_client()
+                        else:
+                            self._client = self._build_stub_client()
+        return self._client
+
+    def _build_stub_client(self):
+        stubs_dir = str(Path(__file__).parent.parent / 'stubs')
+        if stubs_dir not in sys.path:
+            sys.path.append(stubs_dir)
+        import stub_mode
+        return stub_mode.client("opensearch", self._build_client)
+
+    def _build_client(self):
+        # Heavy imports (opensearch-py, boto3) are deferred until a request is made
+        from opensearchpy import OpenSearch, RequestsHttpConnection
+        from aws_credentials import get_aws_auth
+
+        # Use IAM authentication with IAM ARN is set as master user.
+        # The auth is shared process-wide and follows credential refreshes.
+        awsauth = get_aws_auth(self.region, self.service)
+
+        # OpenSearch client with a pooled keep-alive transport. Requests
+        # reuses pooled TLS connections, so concurrent searches skip the
+        # handshake once the pool is warm.
+        return OpenSearch(
             hosts=[{'host': self.host, 'port': 443}],
-            http_auth=self.awsauth,
+            http_auth=awsauth,
             use_ssl=True,
             verify_certs=True,
-            connection_class=RequestsHttpConnection
+            connection_class=RequestsHttpConnection,
+            pool_maxsize=POOL_MAXSIZE,
+            headers={'Connection': 'keep-alive'},
+            http_compress=HTTP_COMPRESS,  # gzip the large vector payloads
+            timeout=REQUEST_TIMEOUT,
+            max_retries=MAX_RETRIES,
+            retry_on_timeout=True,
+            retry_on_status=RETRY_ON_STATUS
         )
-        
-        self.index_name = 'resume-vectors'
-        self._create_index_if_not_exists()
     
-    def _create_index_if_not_exists(self):
-        """Create index with proper mapping for vector search"""
-        if not self.client.indices.exists(index=self.index_name):
-            mapping = {
-                "settings": {
-                    "index": {
-                        "knn": True,
-                        "knn.algo_param.ef_search": 100
-                    }
-                },
-                "mappings": {
-                    "properties": {
-                        "content": {"type": "text"},
-                        "embedding": {
-                            "type": "knn_vector",
-                            "dimension": 3072,  # text-embedding-3-large dimension
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "cosinesimil",
-                                "engine": "lucene"
-                            }
-                        },
-                        "metadata": {
-                            "properties": {
-                                "session_id": {"type": "keyword"},
-                                "type": {"type": "keyword"},
-                                "section": {"type": "keyword"},
-                                "source": {"type": "keyword"},
-                                "filename": {"type": "keyword"},
-                                "created_at": {"type": "date"}
-                            }
-                        }
-                    }
-                }
-            }
-            
-            self.client.indices.create(index=self.index_name, body=mapping)
-            print(f"Created index: {self.index_name}")
+    def create_index_if_not_exists(self) -> bool:
+        """
+        Create the first versioned index and point the alias at it.
+        Run once per deployment via node-python_scripts/migrate_index.py,
+        not on every client construction. Returns True if the index was created.
+        A legacy concrete index with the alias name is left in place; use
+        node-python_scripts/reindex.py to move it behind the alias.
+        """
+        if self.client.indices.exists(index=self.index_name):
+            return False
+
+        versioned_index = self.versioned_index_name(1)
+        self.create_versioned_index(versioned_index, build_index_body())
+        self.client.indices.update_aliases(body={
+            "actions": [{"add": {"index": versioned_index, "alias": self.index_name}}]
+        })
+        logger.info("Created index: %s (alias: %s)", versioned_index, self.index_name)
+        return True
+
+    def versioned_index_name(self, version: int) -> str:
+        """Concrete index name for a version, e.g. resume-vectors-v2"""
+        return f"{self.index_name}-v{version}"
+
+    def get_alias_indices(self) -> List[str]:
+        """Concrete indices currently behind the alias (empty for a legacy concrete index)"""
+        if not self.client.indices.exists_alias(name=self.index_name):
+            return []
+        return sorted(self.client.indices.get_alias(name=self.index_name).keys())
+
+    def next_index_version(self) -> int:
+        """Next unused version number for the alias"""
+        versions = []
+        prefix = f"{self.index_name}-v"
+        for name in self.client.indices.get(index=f"{prefix}*", ignore_unavailable=True, allow_no_indices=True):
+            suffix = name[len(prefix):]
+            if suffix.isdigit():
+                versions.append(int(suffix))
+        return max(versions, default=0) + 1
+
+    def create_versioned_index(self, index: str, body: Dict[str, Any]):
+        """Create a concrete index (not yet visible through the alias)"""
+        self.client.indices.create(index=index, body=body)
+
+    def swap_alias(self, new_index: str) -> List[str]:
+        """
+        Atomically point the alias at new_index.
+        Returns the indices that were previously behind the alias. A legacy
+        concrete index named like the alias is removed in the same request.
+        """
+        old_indices = self.get_alias_indices()
+        actions = [{"remove": {"index": old, "alias": self.index_name}} for old in old_indices]
+        if not old_indices and self.client.indices.exists(index=self.index_name):
+            actions.append({"remove_index": {"index": self.index_name}})
+        actions.append({"add": {"index": new_index, "alias": self.index_name}})
+
+        self.client.indices.update_aliases(body={"actions": actions})
+        return old_indices
     
     def store_resume_chunks(self, chunks_with_embeddings: List[Dict[str, Any]], session_id: str = None):
         """Store resume chunks with embeddings in OpenSearch"""
         actions = []
+        indexed_at = utc_now()
         
         for chunk_data in chunks_with_embeddings:
             doc = {
@@ -87,64 +377,74 @@ class AWSOpenSearchClient:
                 "metadata": {
                     **chunk_data["metadata"],
                     "session_id": session_id,
-                    "created_at": chunk_data.get("created_at", "2024-01-01T00:00:00Z")
+                    "created_at": chunk_data["metadata"].get("created_at") or indexed_at,
+                    "indexed_at": indexed_at
                 }
             }
             
             action = {
                 "index": {
                     "_index": self.index_name,
-                    "_id": chunk_data["id"]
+                    "_id": chunk_data["id"],
+                    **session_routing(session_id)
                 }
             }
-            actions.append(action)
-            actions.append(doc)
+            actions.append((action, doc))
         
-        # Bulk insert
-        response = self.client.bulk(body=actions)
+        # Bulk insert; only errors are needed back from the response
+        with span("opensearch.bulk", documents=len(chunks_with_embeddings)), \
+                OPENSEARCH_LATENCY.time(operation="bulk"):
+            response = self.client.bulk(
+                body=bulk_ndjson(actions), filter_path=["errors", "items.*.error", "items.*._id"]
+            )
         
         if response.get('errors'):
-            print(f"Errors during bulk insert: {response}")
+            failed = [item for item in response.get('items', []) if next(iter(item.values())).get('error')]
+            logger.error("Errors during bulk insert: %d failed, first: %s", len(failed), failed[:1])
             return False
         
         return True
     
-    def search_resume_chunks(self, query_embedding: List[float], session_id: str = None, k: int = 5):
-        """Search for similar resume chunks using vector similarity"""
+    def search_resume_chunks(
+        self,
+        query_embedding: "np.ndarray",
+        session_id: str = None,
+        k: int = 5,
+        sections: List[str] = None,
+        filters: Dict[str, Any] = None,
+        min_score: float = None
+    ):
+        """
+        Search for similar resume chunks using vector similarity
+
+        sections restricts hits to chunks tagged with any of those section
+        names; filters maps other metadata fields to a value or list of
+        values; min_score drops weak matches (cosinesimil scores are
+        (1 + cosine) / 2).
+        """
         query_body = {
             "size": k,
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "knn": {
-                                "embedding": {
-                                    "vector": query_embedding,
-                                    "k": k
-                                }
-                            }
-                        }
-                    ]
-                }
-            },
+            "query": knn_query(query_embedding, k, build_metadata_filters(session_id, sections, filters)),
             "_source": ["content", "metadata"]
         }
+        if min_score is not None:
+            query_body["min_score"] = min_score
         
-        # Add session filter if provided
-        if session_id:
-            query_body["query"]["bool"]["filter"] = [
-                {"term": {"metadata.session_id.keyword": session_id}}
-            ]
-            print(f"[DEBUG OpenSearch] Searching with session filter: {session_id}")
-        else:
-            print(f"[DEBUG OpenSearch] Searching WITHOUT session filter")
-        
-        print(f"[DEBUG OpenSearch] Query body: {query_body}")
-        response = self.client.search(index=self.index_name, body=query_body)
-        print(f"[DEBUG OpenSearch] Search response hits: {response['hits']['total']['value']}")
+        # Vectors are summarized and the body is only logged for a sample of queries
+        log_sampled(logger, "kNN query body: %s", summarize_query(query_body))
+        with span("opensearch.knn_search", k=k, session_filter=bool(session_id),
+                  sections=",".join(sections or [])) as search_span, \
+                admit("opensearch"), OPENSEARCH_LATENCY.time(operation="knn_search"):
+            response = self.client.search(
+                index=self.index_name, body=query_body, filter_path=SEARCH_FILTER_PATH, **session_routing(session_id)
+            )
+            hits = response.get('hits', {}).get('hits', [])
+            search_span.set_attribute("hits", len(hits))
+        OPENSEARCH_HITS.observe(len(hits), operation="knn_search")
+        logger.debug("kNN search session=%s hits=%d", session_id, len(hits))
         
         results = []
-        for hit in response['hits']['hits']:
+        for hit in hits:
             results.append({
                 "content": hit["_source"]["content"],
                 "metadata": hit["_source"]["metadata"],
@@ -153,6 +453,90 @@ class AWSOpenSearchClient:
         
         return results
     
+    def search_candidates(
+        self,
+        query_embedding: "np.ndarray",
+        page: int = 1,
+        page_size: int = 20,
+        ranking: str = "max",
+        pool: int = CANDIDATE_POOL,
+        sections: List[str] = None,
+        filters: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Candidates (sessions) ranked for a query across every resume in one
+        request: a kNN query pools the nearest chunks, a terms aggregation
+        groups them by session and ranks each by its best ("max") or summed
+        ("sum") chunk score, and bucket_sort cuts out the requested page.
+        Each candidate carries its CANDIDATE_MATCHES best chunks.
+        """
+        if ranking not in CANDIDATE_RANKINGS:
+            raise ValueError(f"ranking must be one of {CANDIDATE_RANKINGS}, not {ranking!r}")
+        query_body = {
+            "size": 0,
+            "query": knn_query(query_embedding, pool, build_metadata_filters(None, sections, filters)),
+            "aggs": {
+                "candidate_count": {"cardinality": {"field": "metadata.session_id.keyword"}},
+                "candidates": {
+                    "terms": {"field": "metadata.session_id.keyword", "size": pool, "order": {"score": "desc"}},
+                    "aggs": {
+                        "score": {ranking: {"script": {"source": "_score"}}},
+                        "matches": {"top_hits": {"size": CANDIDATE_MATCHES, "_source": ["content", "metadata"]}},
+                        "page": {"bucket_sort": {"from": (page - 1) * page_size, "size": page_size}}
+                    }
+                }
+            }
+        }
+
+        log_sampled(logger, "Candidate query body: %s", summarize_query(query_body))
+        with span("opensearch.candidate_search", pool=pool, ranking=ranking, page=page) as search_span, \
+                admit("opensearch"), OPENSEARCH_LATENCY.time(operation="candidate_search"):
+            response = self.client.search(index=self.index_name, body=query_body, filter_path=["aggregations"])
+            aggregations = response.get('aggregations', {})
+            buckets = aggregations.get('candidates', {}).get('buckets', [])
+            search_span.set_attribute("candidates", len(buckets))
+        OPENSEARCH_HITS.observe(len(buckets), operation="candidate_search")
+
+        candidates = []
+        for bucket in buckets:
+            matches = bucket["matches"]["hits"]["hits"]
+            candidates.append({
+                "session_id": bucket["key"],
+                "score": bucket["score"]["value"],
+                "matching_chunks": bucket["doc_count"],
+                "filename": matches[0]["_source"]["metadata"].get("filename") if matches else None,
+                "matches": [
+                    {"content": hit["_source"]["content"], "metadata": hit["_source"]["metadata"], "score": hit["_score"]}
+                    for hit in matches
+                ]
+            })
+        return {
+            "total": aggregations.get('candidate_count', {}).get('value', 0),
+            "page": page,
+            "page_size": page_size,
+            "ranking": ranking,
+            "candidates": candidates
+        }
+    
+    def record_deletion(self, session_id: str):
+        """Write the session's tombstone (deleted_at) for reindex.py to replay"""
+        try:
+            self.client.index(
+                index=TOMBSTONE_INDEX, id=session_id, body={"session_id": session_id, "deleted_at": utc_now()}
+            )
+        except Exception as e:
+            logger.warning("Could not record deletion of %s: %s", session_id, e)
+
+    def deletions_since(self, since: str) -> List[Dict[str, Any]]:
+        """Tombstones written at or after since (ISO 8601 UTC)"""
+        if not self.client.indices.exists(index=TOMBSTONE_INDEX):
+            return []
+        response = self.client.search(index=TOMBSTONE_INDEX, body={
+            "query": {"range": {"deleted_at": {"gte": since}}},
+            "size": 10000
+        })
+        return [hit["_source"] for hit in response.get('hits', {}).get('hits', [])]
+    
     def delete_session_data(self, session_id: str):
         """Delete all resume data for a specific session"""
         query = {
@@ -161,7 +545,11 @@ class AWSOpenSearchClient:
             }
         }
         
-        response = self.client.delete_by_query(index=self.index_name, body=query)
+        # Recorded first so a reindex running now also removes the session from its new index
+        self.record_deletion(session_id)
+        with OPENSEARCH_LATENCY.time(operation="delete_session"):
+            response = self.client.delete_by_query(index=self.index_name, body=query, **session_routing(session_id))
+        session_cache.invalidate(session_id)
         return response.get('deleted', 0)
     
     def get_session_chunks(self, session_id: str):
@@ -174,13 +562,72 @@ class AWSOpenSearchClient:
             "_source": ["content", "metadata"]
         }
         
-        response = self.client.search(index=self.index_name, body=query)
+        with OPENSEARCH_LATENCY.time(operation="get_session_chunks"):
+            response = self.client.search(
+                index=self.index_name, body=query, filter_path=SEARCH_FILTER_PATH, **session_routing(session_id)
+            )
+        hits = response.get('hits', {}).get('hits', [])
+        OPENSEARCH_HITS.observe(len(hits), operation="get_session_chunks")
         
         chunks = []
-        for hit in response['hits']['hits']:
+        for hit in hits:
             chunks.append({
                 "content": hit["_source"]["content"],
                 "metadata": hit["_source"]["metadata"]
             })
         
-        return chunks
\ No newline at end of file
+        return chunks
+    
+    def iter_sessions(self, page_size: int = 1000, session_ids: List[str] = None):
+        """
+        Yield (session_id, chunks) for every session in one pass over the
+        index: pages of chunks sorted by session and chunk_index
+        (search_after), regrouped per session with each session's chunks in
+        document order. A session split across pages is yielded once, after
+        its last chunk arrives.
+
+        The pass reads a point-in-time snapshot, so uploads and deletes made
+        while it runs cannot make pages skip or repeat chunks.
+        """
+        pit = self.client.create_pit(index=self.index_name, keep_alive=SCAN_KEEP_ALIVE)
+        query = {
+            "query": {"terms": {"metadata.session_id.keyword": list(session_ids)}} if session_ids
+            else {"exists": {"field": "metadata.session_id"}},
+            "size": page_size,
+            "pit": {"id": pit["pit_id"], "keep_alive": SCAN_KEEP_ALIVE},
+            "sort": [
+                {"metadata.session_id.keyword": "asc"},
+                {"metadata.chunk_index": {"order": "asc", "missing": "_last"}}
+            ],
+            "_source": ["content", "metadata"]
+        }
+        current, chunks = None, []
+        try:
+            while True:
+                with OPENSEARCH_LATENCY.time(operation="iter_sessions"):
+                    response = self.client.search(
+                        body=query, filter_path=["pit_id", "hits.hits._id", "hits.hits._source", "hits.hits.sort"]
+                    )
+                # The PIT id can change between pages; always send the latest
+                query["pit"]["id"] = response.get("pit_id", query["pit"]["id"])
+                hits = response.get('hits', {}).get('hits', [])
+                for hit in hits:
+                    session_id = hit["_source"]["metadata"].get("session_id")
+                    if session_id != current:
+                        if chunks:
+                            yield current, _in_document_order(chunks)
+                        current, chunks = session_id, []
+                    chunks.append({"id": hit["_id"], "content": hit["_source"]["content"],
+                                   "metadata": hit["_source"]["metadata"]})
+                if len(hits) < page_size:
+                    break
+                query["search_after"] = hits[-1]["sort"]
+            if chunks:
+                yield current, _in_document_order(chunks)
+        finally:
+            try:
+                self.client.delete_pit(body={"pit_id": [query["pit"]["id"]]})
+            except Exception as e:
+                # It expires after SCAN_KEEP_ALIVE anyway
+                logger.warning("Could not delete point-in-time: %s", e)
+
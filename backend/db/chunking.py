@@ -1,11 +1,16 @@
-from pdfminer.high_level import extract_text
 import re
 import os
-from datetime import datetime
-from typing import List, Dict, Any
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from aws_opensearch import AWSOpenSearchClient
+import base64
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, List, Dict, Any
+from aws_opensearch import get_opensearch_client, EMBEDDING_DIMENSION, CANDIDATE_POOL
 from dotenv import load_dotenv
+from tracing import get_logger, span
+from metrics import record_usage, record_cache, track_inflight, current_agent
+from execution_report import current_report
+import session_cache
+from singleflight import Group, make_key
+from admission import AdmissionRejected, admit
 import sys
 from pathlib import Path
 
@@ -16,72 +21,203 @@ except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
 
+if TYPE_CHECKING:
+    import numpy as np  # imported where used, to keep script startup fast
+
 # Load environment variables
 load_dotenv()
 
-# Initialize clients when needed
-opensearch_client = None
+logger = get_logger("chunking")
+
+# Identical concurrent query embeddings and searches share one upstream call
+_embed_flight = Group("embed_query")
+_search_flight = Group("search_resume_content")
+
+# Embedding model; its output dimension must match the index behind the alias
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-large')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+# Ingest is not interactive, so it may wait longer for embedding capacity
+INGEST_ADMISSION_WAIT = float(os.getenv('INGEST_ADMISSION_WAIT', '30'))
+
+def embedding_params(model: str = None, dimensions: int = None) -> Dict[str, Any]:
+    """Model arguments for embeddings.create"""
+    model = model or EMBEDDING_MODEL
+    params = {"model": model}
+    # text-embedding-3 models can shorten their output to the index dimension
+    if model.startswith("text-embedding-3"):
+        params["dimensions"] = dimensions or EMBEDDING_DIMENSION
+    return params
+
+# Chunking. A section that fits in CHUNK_SIZE becomes a single chunk with no
+# overlap; only longer sections are split, with CHUNK_OVERLAP between pieces.
+CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '1000'))  # ~250 tokens
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '100'))
+MIN_SECTION_CHARS = int(os.getenv('MIN_SECTION_CHARS', '80'))
+
+# Canonical section name -> header variants seen in resumes
+SECTION_ALIASES = {
+    "Summary": ["summary", "professional summary", "profile", "professional profile", "objective",
+                "career objective", "about me", "about"],
+    "Experience": ["experience", "work experience", "professional experience", "work history",
+                   "employment", "employment history", "relevant experience", "career history"],
+    "Education": ["education", "academic background", "education and training", "academics"],
+    "Skills": ["skills", "technical skills", "core competencies", "competencies", "key skills",
+               "technologies", "tools"],
+    "Projects": ["projects", "personal projects", "key projects", "selected projects"],
+    "Certifications": ["certifications", "certificates", "licenses", "licenses and certifications"],
+    "Awards": ["awards", "honors", "honors and awards", "achievements"],
+    "Publications": ["publications", "papers"],
+    "Languages": ["languages"],
+    "Volunteering": ["volunteering", "volunteer experience", "leadership", "activities"],
+    "Contact": ["contact", "contact information", "personal information"],
+}
+# Text before the first recognised header (name, contact line)
+HEADER_SECTION = "Contact"
+
+_HEADER_LOOKUP = {alias: name for name, aliases in SECTION_ALIASES.items() for alias in aliases}
+# A header is a short line that is nothing but a known section name, e.g.
+# "WORK EXPERIENCE", "Skills:" or "Education & Training"
+_HEADER_RE = re.compile(
+    r'^[ \t]*(' + '|'.join(
+        re.escape(alias).replace(r'\ and\ ', r'\ (?:and|&)\ ')
+        for alias in sorted(_HEADER_LOOKUP, key=len, reverse=True)
+    ) + r')[ \t]*:?[ \t]*$',
+    re.I | re.M
+)
+
+# Built once per process; the splitter is stateless
+_splitter = None
+
+def _get_splitter():
+    global _splitter
+    if _splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ".", " "]
+        )
+    return _splitter
+
+def canonical_section(header: str) -> str:
+    """Canonical name for a header line ("Work History" -> "Experience")"""
+    normalized = re.sub(r'\s+', ' ', header.replace('&', 'and')).strip(' :').lower()
+    return _HEADER_LOOKUP.get(normalized, header.strip(' :').title())
+
+def split_sections(text: str) -> List[Dict[str, str]]:
+    """Split resume text on header lines into {"section", "content"} dicts"""
+    sections = []
+    matches = list(_HEADER_RE.finditer(text))
+    preamble = text[:matches[0].start()] if matches else text
+    if preamble.strip():
+        sections.append({"section": HEADER_SECTION, "content": preamble.strip()})
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        content = text[match.start():end].strip()
+        if content:
+            sections.append({"section": canonical_section(match.group(1)), "content": content})
+    return sections
+
+def merge_small_sections(sections: List[Dict[str, str]], min_chars: int = MIN_SECTION_CHARS) -> List[Dict[str, Any]]:
+    """
+    Pair each section shorter than min_chars (a two-line Languages list) with
+    an adjacent short section so tiny sections don't become chunks of their
+    own. Substantial sections are never merged, and no entry carries more
+    than two section names, so section filters stay selective.
+    """
+    def fits(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+        return (len(first["sections"]) == 1 and len(second["sections"]) == 1
+                and len(first["content"]) + len(second["content"]) <= CHUNK_SIZE)
 
-def get_opensearch_client():
-    global opensearch_client
-    if opensearch_client is None:
-        opensearch_client = AWSOpenSearchClient()
-    return opensearch_client
+    def combine(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+        return {"sections": list(dict.fromkeys(first["sections"] + second["sections"])),
+                "content": f"{first['content']}\n\n{second['content']}"}
 
-def extract_resume_sections(pdf_file_path: str) -> List[str]:
-    """Extract text from PDF and split into sections"""
+    merged: List[Dict[str, Any]] = []
+    for sec in sections:
+        entry = {"sections": [sec["section"]], "content": sec["content"]}
+        previous = merged[-1] if merged else None
+        if previous and fits(previous, entry) and \
+                max(len(previous["content"]), len(entry["content"])) < min_chars:
+            merged[-1] = combine(previous, entry)
+        else:
+            merged.append(entry)
+    return merged
+
+def extract_resume_sections(pdf_file_path: str) -> List[Dict[str, Any]]:
+    """Extract text from PDF and split into (merged) sections"""
+    from pdfminer.high_level import extract_text  # heavy, only needed at ingest
     text = extract_text(pdf_file_path)
-    # Split by the most common resume headers
-    sections = re.split(
-        r'\n(?=(?:Education|Experience|Work History|Skills|Projects|Certifications|Summary|Profile|Awards|Publications|Objective|Contact)\b)', 
-        text, 
-        flags=re.I
-    )
-    return [s.strip() for s in sections if len(s.strip()) > 50]
-
-def chunk_resume_for_embed(sections: List[str]) -> List[str]:
-    """Split resume sections into smaller chunks for embedding"""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,   # ~700–800 tokens per chunk
-        chunk_overlap=100, # small overlap for context continuity
-        separators=["\n\n", "\n", ".", " "]
-    )
+    return merge_small_sections(split_sections(text))
 
+def chunk_resume_for_embed(sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Split sections into chunks, keeping each chunk's section names"""
     chunks = []
     for sec in sections:
-        for chunk in splitter.split_text(sec):
-            chunks.append(chunk)
+        if len(sec["content"]) <= CHUNK_SIZE:
+            chunks.append({"sections": sec["sections"], "content": sec["content"]})
+            continue
+        for i, piece in enumerate(_get_splitter().split_text(sec["content"])):
+            # Continuation pieces lose the header line; restore it for the embedding
+            if i > 0:
+                piece = f"{' / '.join(sec['sections'])}\n{piece}"
+            chunks.append({"sections": sec["sections"], "content": piece})
     return chunks
 
-def build_chunk_metadata(chunks: List[str], filename: str, session_id: str = None) -> List[Dict[str, Any]]:
+def build_chunk_metadata(chunks: List[Dict[str, Any]], filename: str, session_id: str = None) -> List[Dict[str, Any]]:
     """Build metadata for each chunk"""
     return [
         {
             "id": f"resume_chunk_{session_id}_{i}" if session_id else f"resume_chunk_{i}",
-            "content": chunk,
+            "content": chunk["content"],
             "metadata": {
                 "type": "resume", 
-                "section": "auto", 
+                "section": chunk["sections"],  # keyword array: matches a term filter on any name
                 "source": "pdf",
                 "filename": filename,
                 "session_id": session_id,
-                "created_at": datetime.now()
+                "chunk_index": i,
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
         }
         for i, chunk in enumerate(chunks)
     ]
 
-def embed_chunks(chunks: List[str]) -> List[List[float]]:
-    """Generate embeddings for text chunks using OpenAI"""
+def decode_embedding(embedding) -> "np.ndarray":
+    """float32 vector from an embeddings response item (base64 or a float list)"""
+    import numpy as np
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+    return np.asarray(embedding, dtype=np.float32)
+
+def embed_chunks(chunks: List[str], model: str = None, dimensions: int = None) -> "np.ndarray":
+    """
+    Embeddings for text chunks as one float32 matrix (a row per chunk).
+    Identical texts are embedded once; requests are batched and the vectors
+    come back base64-encoded, so they are never boxed as Python floats.
+    """
+    import numpy as np
     client = auth_manager.get_openai_client()
-    embeddings = []
-    for chunk in chunks:
-        emb = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=chunk
-        )
-        embeddings.append(emb.data[0].embedding)
-    return embeddings
+    params = embedding_params(model, dimensions)
+    unique = list(dict.fromkeys(chunks))
+    matrix = None
+    for start in range(0, len(unique), EMBEDDING_BATCH_SIZE):
+        batch = unique[start:start + EMBEDDING_BATCH_SIZE]
+        with admit("openai:embeddings", max_wait=INGEST_ADMISSION_WAIT):
+            emb = client.embeddings.create(input=batch, encoding_format="base64", **params)
+        record_usage(params["model"], getattr(emb, "usage", None), agent="ingest")
+        for item in emb.data:
+            vector = decode_embedding(item.embedding)
+            if matrix is None:
+                # Sized from the response: models without `dimensions` return their native size
+                matrix = np.empty((len(unique), vector.shape[0]), dtype=np.float32)
+            matrix[start + item.index] = vector
+    if matrix is None:
+        return np.empty((0, params.get("dimensions") or EMBEDDING_DIMENSION), dtype=np.float32)
+    if len(unique) == len(chunks):
+        return matrix
+    row = {text: i for i, text in enumerate(unique)}
+    return matrix[[row[text] for text in chunks]]
 
 def process_resume_pipeline(pdf_file_path: str, filename: str, session_id: str = None) -> bool:
     """
@@ -89,67 +225,169 @@ def process_resume_pipeline(pdf_file_path: str, filename: str, session_id: str =
     Returns True if successful, False otherwise
     """
     try:
-        # Step 1: Extract sections from PDF
-        print(f"Extracting sections from {filename}...")
-        sections = extract_resume_sections(pdf_file_path)
-        
-        # Step 2: Chunk the sections
-        print("Chunking resume sections...")
-        chunks = chunk_resume_for_embed(sections)
-        
-        # Step 3: Build metadata
-        print("Building chunk metadata...")
-        chunks_with_metadata = build_chunk_metadata(chunks, filename, session_id)
-        
-        # Step 4: Generate embeddings
-        print("Generating embeddings...")
-        embeddings = embed_chunks(chunks)
-        
-        # Step 5: Combine chunks with embeddings
-        chunks_with_embeddings = []
-        for i, chunk_data in enumerate(chunks_with_metadata):
-            chunk_data["embedding"] = embeddings[i]
-            chunks_with_embeddings.append(chunk_data)
-        
-        # Step 6: Store in OpenSearch
-        print("Storing in OpenSearch...")
-        opensearch_client = get_opensearch_client()
-        success = opensearch_client.store_resume_chunks(chunks_with_embeddings, session_id)
+        with span("ingest.pipeline", filename=filename, session_id=session_id or ""), track_inflight("ingest"):
+            # Step 1: Extract sections from PDF
+            logger.info("Extracting sections from %s...", filename)
+            with span("ingest.extract") as extract_span:
+                sections = extract_resume_sections(pdf_file_path)
+                extract_span.set_attribute("sections", len(sections))
+            
+            # Step 2: Chunk the sections
+            logger.info("Chunking resume sections...")
+            with span("ingest.chunk") as chunk_span:
+                chunks = chunk_resume_for_embed(sections)
+                chunk_span.set_attribute("chunks", len(chunks))
+            
+            # Step 3: Build metadata
+            chunks_with_metadata = build_chunk_metadata(chunks, filename, session_id)
+            
+            # Step 4: Generate embeddings
+            logger.info("Generating embeddings...")
+            with span("ingest.embed", chunks=len(chunks), model=EMBEDDING_MODEL):
+                embeddings = embed_chunks([chunk["content"] for chunk in chunks])
+            
+            # Step 5: Combine chunks with embeddings (rows are views of the matrix, not copies)
+            chunks_with_embeddings = []
+            for i, chunk_data in enumerate(chunks_with_metadata):
+                chunk_data["embedding"] = embeddings[i]
+                chunks_with_embeddings.append(chunk_data)
+            
+            # Step 6: Store in OpenSearch
+            logger.info("Storing in OpenSearch...")
+            opensearch_client = get_opensearch_client()
+            with span("ingest.bulk", chunks=len(chunks_with_embeddings)):
+                success = opensearch_client.store_resume_chunks(chunks_with_embeddings, session_id)
         
         if success:
-            print(f"Successfully processed resume: {filename}")
+            # Keep the ordered chunks locally so small resumes skip retrieval entirely
+            session_cache.put_session(session_id, chunks_with_metadata, filename)
+            logger.info("Successfully processed resume: %s", filename)
             return True
         else:
-            print(f"Failed to store chunks for: {filename}")
+            logger.error("Failed to store chunks for: %s", filename)
             return False
             
     except Exception as e:
-        print(f"Error processing resume {filename}: {str(e)}")
+        logger.exception("Error processing resume %s: %s", filename, e)
         return False
 
-def search_resume_content(query: str, session_id: str = None, k: int = 5) -> List[Dict[str, Any]]:
+def embed_query(query: str) -> "np.ndarray":
+    """Embedding for a search query (float32)"""
+    params = embedding_params()
+    return _embed_flight.do(make_key(query, params), _embed_query, query, params)
+
+def _embed_query(query: str, params: Dict[str, Any]) -> "np.ndarray":
+    client = auth_manager.get_openai_client()
+    with span("retrieval.embed_query", model=EMBEDDING_MODEL), admit("openai:embeddings"):
+        response = client.embeddings.create(
+            input=query,
+            encoding_format="base64",
+            **params
+        )
+    record_usage(EMBEDDING_MODEL, getattr(response, "usage", None))
+    return decode_embedding(response.data[0].embedding)
+
+def _knn(
+    query_embedding: "np.ndarray",
+    session_id: str,
+    k: int,
+    sections: List[str] = None,
+    filters: Dict[str, Any] = None,
+    min_score: float = None
+) -> List[Dict[str, Any]]:
+    """kNN over the session's cached vectors when available, else OpenSearch"""
+    if session_id:
+        with span("retrieval.session_vectors", session_id=session_id) as cache_span:
+            local = session_cache.search_session(session_id, query_embedding, k, sections, filters, min_score)
+            cache_span.set_attribute("hit", local is not None)
+        record_cache("session_vectors", local is not None)
+        if local is not None:
+            return local
+    opensearch_client = get_opensearch_client()
+    return opensearch_client.search_resume_chunks(
+        query_embedding, session_id, k, sections=sections, filters=filters, min_score=min_score
+    )
+
+def search_resume_content(
+    query: str,
+    session_id: str = None,
+    k: int = 5,
+    sections: List[str] = None,
+    filters: Dict[str, Any] = None,
+    min_score: float = None
+) -> List[Dict[str, Any]]:
     """
     Search resume content using semantic similarity
+
+    When a section-filtered search finds nothing (a resume without
+    recognisable headers, or chunks indexed before section tagging), the
+    search is repeated without the section filter using the same embedding.
+
+    Sessions whose resume has at most WHOLE_RESUME_MAX_CHUNKS chunks are
+    answered from the local session cache with the whole resume in document
+    order (k and min_score do not apply), skipping the embedding and kNN.
+    Larger cached sessions are scored locally against their cached vectors,
+    so only sessions missing from the cache reach OpenSearch.
+
+    Identical concurrent searches are coalesced and share one result list.
     """
+    key = make_key(query, session_id, k, sections, filters, min_score)
+    results = _search_flight.do(key, _search_resume_content, query, session_id, k, sections, filters, min_score)
+    report = current_report()
+    if report is not None:
+        agent = current_agent.get()
+        report.retrieval("Orchestrator" if agent == "none" else agent, results, k, sections)
+    return results
+
+def _search_resume_content(
+    query: str,
+    session_id: str,
+    k: int,
+    sections: List[str],
+    filters: Dict[str, Any],
+    min_score: float
+) -> List[Dict[str, Any]]:
     try:
-        print(f"[DEBUG chunking] Searching with query: '{query[:50]}...', session_id: {session_id}")
-        # Generate embedding for the query
-        client = auth_manager.get_openai_client()
-        query_embedding = client.embeddings.create(
-            model="text-embedding-3-large",
-            input=query
-        ).data[0].embedding
-        
-        print(f"[DEBUG chunking] Generated embedding, searching in OpenSearch...")
-        # Search in OpenSearch
-        opensearch_client = get_opensearch_client()
-        results = opensearch_client.search_resume_chunks(query_embedding, session_id, k)
+        logger.debug("Searching with query: '%s...', session_id: %s, sections: %s", query[:50], session_id, sections)
+        if session_id and not filters:
+            with span("retrieval.whole_resume", session_id=session_id) as cache_span:
+                cached = session_cache.whole_resume(session_id, sections)
+                cache_span.set_attribute("hit", cached is not None)
+            record_cache("whole_resume", cached is not None)
+            if cached is not None:
+                return cached
+
+        query_embedding = embed_query(query)
+        results = _knn(query_embedding, session_id, k, sections, filters, min_score)
+        if not results and sections:
+            results = _knn(query_embedding, session_id, k, None, filters, min_score)
         
-        print(f"[DEBUG chunking] Found {len(results)} results")
+        logger.debug("Found %d results", len(results))
         return results
-        
+
+    except AdmissionRejected:
+        # Overload is not "no resume": let callers report it
+        raise
     except Exception as e:
-        print(f"[ERROR chunking] Error searching resume content: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
\ No newline at end of file
+        logger.exception("Error searching resume content: %s", e)
+        return []
+
+def search_candidates(
+    query: str,
+    page: int = 1,
+    page_size: int = 20,
+    ranking: str = "max",
+    pool: int = CANDIDATE_POOL,
+    sections: List[str] = None,
+    filters: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Recruiter-style search across all resumes: sessions ranked by their best
+    ("max") or summed ("sum") matching chunk scores, one page at a time
+    (see AWSOpenSearchClient.search_candidates)
+    """
+    with span("retrieval.candidates", ranking=ranking, page=page):
+        query_embedding = embed_query(query)
+        return get_opensearch_client().search_candidates(
+            query_embedding, page, page_size, ranking=ranking, pool=pool, sections=sections, filters=filters
+        )
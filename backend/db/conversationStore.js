@@ -0,0 +1,155 @@
+import Database from 'better-sqlite3';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { dirname } from 'path';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = dirname(__filename);
+
+// Persistent conversation and message store (SQLite, WAL mode).
+// Conversations are looked up by primary key and messages through the
+// (conversation_id, timestamp, seq) index, so each request costs the same
+// however much history the server holds.
+const CONVERSATION_DB_PATH = process.env.CONVERSATION_DB_PATH || path.join(__dirname, '../conversations.db');
+
+const db = new Database(CONVERSATION_DB_PATH);
+db.pragma('journal_mode = WAL');
+db.pragma('synchronous = NORMAL');
+db.pragma('foreign_keys = ON');
+
+db.exec(`
+  CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+  );
+  CREATE INDEX IF NOT EXISTS conversations_created ON conversations (created_at);
+
+  CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    type TEXT,
+    attachments TEXT,
+    timestamp TEXT NOT NULL
+  );
+  CREATE INDEX IF NOT EXISTS messages_conversation_time ON messages (conversation_id, timestamp, seq);
+`);
+
+const statements = {
+  listConversations: db.prepare(
+    'SELECT * FROM conversations ORDER BY created_at DESC LIMIT ?'),
+  listConversationsBefore: db.prepare(
+    'SELECT * FROM conversations WHERE created_at < ? ORDER BY created_at DESC LIMIT ?'),
+  getConversation: db.prepare('SELECT * FROM conversations WHERE id = ?'),
+  insertConversation: db.prepare(
+    'INSERT INTO conversations (id, title, created_at, updated_at) VALUES (@id, @title, @createdAt, @updatedAt)'),
+  deleteConversation: db.prepare('DELETE FROM conversations WHERE id = ?'),
+  touchConversation: db.prepare(
+    'UPDATE conversations SET updated_at = ?, message_count = message_count + ? WHERE id = ?'),
+  setTitle: db.prepare('UPDATE conversations SET title = ? WHERE id = ?'),
+  insertMessage: db.prepare(
+    `INSERT INTO messages (id, conversation_id, role, content, type, attachments, timestamp)
+     VALUES (@id, @conversationId, @role, @content, @type, @attachments, @timestamp)`),
+  getMessage: db.prepare('SELECT * FROM messages WHERE id = ?'),
+  deleteMessage: db.prepare('DELETE FROM messages WHERE id = ?'),
+  // Newest page first, then flipped to chronological order by listMessages
+  listMessages: db.prepare(
+    'SELECT * FROM messages WHERE conversation_id = ? ORDER BY timestamp DESC, seq DESC LIMIT ?'),
+  listMessagesBefore: db.prepare(
+    `SELECT * FROM messages WHERE conversation_id = ? AND (timestamp, seq) < (?, ?)
+     ORDER BY timestamp DESC, seq DESC LIMIT ?`),
+};
+
+const toConversation = (row) => row && ({
+  id: row.id,
+  title: row.title,
+  createdAt: row.created_at,
+  updatedAt: row.updated_at,
+  messageCount: row.message_count,
+});
+
+const toMessage = (row) => {
+  const message = {
+    id: row.id,
+    conversationId: row.conversation_id,
+    role: row.role,
+    content: row.content,
+    timestamp: row.timestamp,
+  };
+  if (row.type !== null) message.type = row.type;
+  if (row.attachments !== null) message.attachments = JSON.parse(row.attachments);
+  return message;
+};
+
+// Cursor for the page after `row`: "<timestamp>|<seq>"
+const messageCursor = (row) => `${row.timestamp}|${row.seq}`;
+
+export function listConversations({ limit = -1, before } = {}) {
+  const rows = before
+    ? statements.listConversationsBefore.all(before, limit)
+    : statements.listConversations.all(limit);
+  return rows.map(toConversation);
+}
+
+export function getConversation(id) {
+  return toConversation(statements.getConversation.get(id));
+}
+
+export function createConversation(conversation) {
+  statements.insertConversation.run(conversation);
+  return getConversation(conversation.id);
+}
+
+// Messages are removed with it (ON DELETE CASCADE); returns false if it did not exist
+export function deleteConversation(id) {
+  return statements.deleteConversation.run(id).changes > 0;
+}
+
+// Store a message and bump its conversation; a user message that is the
+// conversation's first message also becomes its title. Returns null if the
+// conversation does not exist (e.g. deleted while a reply was generated).
+export const addMessage = db.transaction((message) => {
+  const conversation = statements.getConversation.get(message.conversationId);
+  if (!conversation) return null;
+  statements.insertMessage.run({
+    type: null,
+    ...message,
+    attachments: message.attachments ? JSON.stringify(message.attachments) : null,
+  });
+  statements.touchConversation.run(message.timestamp, 1, message.conversationId);
+  if (message.role === 'user' && conversation.message_count === 0) {
+    const title = message.content.substring(0, 50) + (message.content.length > 50 ? '...' : '');
+    statements.setTitle.run(title, message.conversationId);
+  }
+  return message;
+});
+
+export const removeMessage = db.transaction((id) => {
+  const row = statements.getMessage.get(id);
+  if (!row) return false;
+  statements.deleteMessage.run(id);
+  statements.touchConversation.run(new Date().toISOString(), -1, row.conversation_id);
+  return true;
+});
+
+// One page of a conversation's messages in chronological order. Without a
+// limit the whole conversation is returned; with one, the newest `limit`
+// messages before the `before` cursor, plus the cursor for the next page.
+export function listMessages(conversationId, { limit = -1, before } = {}) {
+  let rows;
+  if (before) {
+    const separator = before.lastIndexOf('|');
+    const timestamp = before.slice(0, separator);
+    const seq = parseInt(before.slice(separator + 1), 10);
+    rows = statements.listMessagesBefore.all(conversationId, timestamp, seq, limit);
+  } else {
+    rows = statements.listMessages.all(conversationId, limit);
+  }
+  const nextCursor = limit > 0 && rows.length === limit ? messageCursor(rows[rows.length - 1]) : null;
+  return { messages: rows.reverse().map(toMessage), nextCursor };
+}
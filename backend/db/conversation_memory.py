@@ -0,0 +1,209 @@
+"""
+Bounded conversation memory: recent turns verbatim plus a rolling summary
+
+Each chat runs in its own process, so turns and summaries are kept in a
+SQLite file (CONVERSATION_MEMORY_PATH). The prompt context for a
+conversation is its rolling summary plus the turns not yet folded into it.
+Once MEMORY_RECENT_TURNS + MEMORY_SUMMARY_EVERY turns are unsummarized, the
+oldest MEMORY_SUMMARY_EVERY are folded into the summary with one cheap
+model call, so a chat never carries more than that many verbatim turns and
+the context stays under MEMORY_MAX_TOKENS however long the chat runs.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Any, List
+
+from tracing import get_logger
+
+logger = get_logger("conversation_memory")
+
+CONVERSATION_MEMORY_PATH = os.getenv(
+    'CONVERSATION_MEMORY_PATH', str(Path(__file__).parent.parent / 'conversation_memory.db'))
+CONVERSATION_MEMORY_ENABLED = os.getenv('CONVERSATION_MEMORY_ENABLED', 'true').lower() == 'true'
+# Turns always kept verbatim, and how many older turns each summary call folds in
+MEMORY_RECENT_TURNS = int(os.getenv('MEMORY_RECENT_TURNS', '4'))
+MEMORY_SUMMARY_EVERY = int(os.getenv('MEMORY_SUMMARY_EVERY', '4'))
+# Upper bound on the context added to a prompt (estimated tokens)
+MEMORY_MAX_TOKENS = int(os.getenv('MEMORY_MAX_TOKENS', '1500'))
+# Longest single message kept verbatim (estimated tokens)
+MEMORY_MAX_TURN_TOKENS = int(os.getenv('MEMORY_MAX_TURN_TOKENS', '400'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    user_message TEXT NOT NULL,
+    assistant_message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    conversation_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    summarized_upto INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(CONVERSATION_MEMORY_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(CONVERSATION_MEMORY_PATH, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " ..."
+
+
+def _summary_row(conn, conversation_id: str):
+    row = conn.execute(
+        "SELECT summary, summarized_upto FROM summaries WHERE conversation_id = ?", (conversation_id,)
+    ).fetchone()
+    return row if row else ("", 0)
+
+
+def load(conversation_id: str) -> Dict[str, Any]:
+    """{"summary", "summarized_upto", "turns": [{"position", "user", "assistant"}]} for unsummarized turns"""
+    empty = {"summary": "", "summarized_upto": 0, "turns": []}
+    if not CONVERSATION_MEMORY_ENABLED or not conversation_id:
+        return empty
+    try:
+        conn = _connect()
+        summary, upto = _summary_row(conn, conversation_id)
+        rows = conn.execute(
+            "SELECT position, user_message, assistant_message FROM turns "
+            "WHERE conversation_id = ? AND position >= ? ORDER BY position",
+            (conversation_id, upto)
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Conversation memory read failed: %s", e)
+        return empty
+    return {
+        "summary": summary,
+        "summarized_upto": upto,
+        "turns": [{"position": p, "user": u, "assistant": a} for p, u, a in rows],
+    }
+
+
+def _format_turn(turn: Dict[str, Any]) -> str:
+    return (f"User: {_truncate(turn['user'], MEMORY_MAX_TURN_TOKENS)}\n"
+            f"Assistant: {_truncate(turn['assistant'], MEMORY_MAX_TURN_TOKENS)}")
+
+
+def build_context(memory: Dict[str, Any], max_tokens: int = None) -> str:
+    """
+    Prompt text for a loaded memory, newest turns kept first when the cap
+    is hit; empty for a new conversation
+    """
+    max_tokens = MEMORY_MAX_TOKENS if max_tokens is None else max_tokens
+    summary = memory["summary"]
+    budget = max_tokens - estimate_tokens(summary)
+    recent = []
+    for turn in reversed(memory["turns"]):
+        text = _format_turn(turn)
+        if estimate_tokens(text) > budget:
+            break
+        recent.insert(0, text)
+        budget -= estimate_tokens(text)
+
+    parts = []
+    if summary:
+        parts.append(f"Summary of the earlier conversation:\n{_truncate(summary, max_tokens)}")
+    if recent:
+        parts.append("Recent turns:\n" + "\n\n".join(recent))
+    return "\n\n".join(parts)
+
+
+def record_turn(conversation_id: str, user_message: str, assistant_message: str):
+    """Append a completed user/assistant exchange"""
+    if not CONVERSATION_MEMORY_ENABLED or not conversation_id:
+        return
+    try:
+        conn = _connect()
+        with conn:
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM turns WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO turns (conversation_id, position, user_message, assistant_message, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, position, user_message, assistant_message, time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning("Could not record turn for %s: %s", conversation_id, e)
+
+
+def turns_to_fold(memory: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The oldest turns due to be folded into the summary (empty until a full batch is due)"""
+    if len(memory["turns"]) < MEMORY_RECENT_TURNS + MEMORY_SUMMARY_EVERY:
+        return []
+    return memory["turns"][:MEMORY_SUMMARY_EVERY]
+
+
+async def fold(
+    conversation_id: str,
+    memory: Dict[str, Any],
+    summarize: Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+) -> bool:
+    """
+    Fold the due turns into the rolling summary with summarize(previous_summary,
+    turns); returns True if the summary advanced. Failures leave the turns
+    verbatim for the next chat to retry.
+    """
+    batch = turns_to_fold(memory)
+    if not batch:
+        return False
+    try:
+        summary = await summarize(memory["summary"], batch)
+    except Exception as e:
+        logger.warning("Conversation summary failed for %s: %s", conversation_id, e)
+        return False
+
+    upto = batch[-1]["position"] + 1
+    try:
+        conn = _connect()
+        with conn:
+            # Only advance if no concurrent chat folded these turns first
+            conn.execute(
+                "INSERT INTO summaries (conversation_id, summary, summarized_upto, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET summary = excluded.summary, "
+                "summarized_upto = excluded.summarized_upto, updated_at = excluded.updated_at "
+                "WHERE summaries.summarized_upto = ?",
+                (conversation_id, summary, upto, time.time(), memory["summarized_upto"])
+            )
+    except sqlite3.Error as e:
+        logger.warning("Could not save summary for %s: %s", conversation_id, e)
+        return False
+    return True
+
+
+def forget(conversation_id: str):
+    """Delete a conversation's turns and summary"""
+    if not conversation_id:
+        return
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM summaries WHERE conversation_id = ?", (conversation_id,))
+    except sqlite3.Error as e:
+        logger.warning("Could not delete conversation memory for %s: %s", conversation_id, e)
@@ -0,0 +1,130 @@
+"""
+Per-request execution report carried in a contextvar
+
+A chat opens a report with execution_report(); everything that runs inside
+it (agents, retrieval, LLM calls, caches), including tasks and to_thread
+calls started from it, records into that request's report. Concurrent
+requests in one process each see their own report. Outside a report the
+record_* calls do nothing.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+
+class ExecutionReport:
+    """Agents run, their wall clock and tokens, retrieval hits and cache results for one request"""
+
+    def __init__(self, **info):
+        self.info = info
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        # Agent tasks share this object across threads and tasks
+        self._lock = threading.Lock()
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.retrievals: List[Dict[str, Any]] = []
+        self.caches: Dict[str, Dict[str, int]] = {}
+
+    def _agent(self, name: str) -> Dict[str, Any]:
+        agent = self.agents.get(name)
+        if agent is None:
+            agent = self.agents[name] = {
+                "calls": 0, "seconds": 0.0, "status": "ok",
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "models": [],
+            }
+        return agent
+
+    def agent_used(self, name: str):
+        with self._lock:
+            self._agent(name)
+
+    def agent_run(self, name: str, seconds: float, status: str):
+        with self._lock:
+            agent = self._agent(name)
+            agent["calls"] += 1
+            agent["seconds"] += seconds
+            if status != "ok":
+                agent["status"] = status
+
+    def tokens(self, name: str, model: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        with self._lock:
+            agent = self._agent(name)
+            agent["prompt_tokens"] += prompt_tokens
+            agent["completion_tokens"] += completion_tokens
+            agent["cost_usd"] += cost
+            if model not in agent["models"]:
+                agent["models"].append(model)
+
+    def retrieval(self, name: str, results: List[Dict[str, Any]], k: int, sections: Optional[List[str]]):
+        entry = {
+            "agent": name,
+            "k": k,
+            "sections": sections,
+            "hits": len(results),
+            "scores": [None if r.get("score") is None else round(r["score"], 4) for r in results],
+            "hit_sections": [r.get("metadata", {}).get("section") for r in results],
+        }
+        with self._lock:
+            self.retrievals.append(entry)
+
+    def cache(self, cache: str, hit: bool):
+        with self._lock:
+            counts = self.caches.setdefault(cache, {"hit": 0, "miss": 0})
+            counts["hit" if hit else "miss"] += 1
+
+    @property
+    def agents_used(self) -> List[str]:
+        """Agent names in the order they first ran"""
+        return list(self.agents)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        with self._lock:
+            agents = {
+                name: {**stats, "seconds": round(stats["seconds"], 4), "cost_usd": round(stats["cost_usd"], 6)}
+                for name, stats in self.agents.items()
+            }
+            return {
+                **self.info,
+                "seconds": round(end - self.started, 4),
+                "agents": agents,
+                "tokens": {
+                    "prompt": sum(a["prompt_tokens"] for a in agents.values()),
+                    "completion": sum(a["completion_tokens"] for a in agents.values()),
+                    "cost_usd": round(sum(a["cost_usd"] for a in agents.values()), 6),
+                },
+                "retrieval": list(self.retrievals),
+                "caches": {name: dict(counts) for name, counts in self.caches.items()},
+            }
+
+
+_current_report: contextvars.ContextVar = contextvars.ContextVar('execution_report', default=None)
+
+
+def current_report() -> Optional[ExecutionReport]:
+    return _current_report.get()
+
+
+def record_agent_used(name: str):
+    """Note that an agent ran in the current request"""
+    report = _current_report.get()
+    if report is not None:
+        report.agent_used(name)
+
+
+@contextmanager
+def execution_report(**info):
+    """Collect an ExecutionReport for the code run inside this block"""
+    report = ExecutionReport(**info)
+    token = _current_report.set(report)
+    try:
+        yield report
+    finally:
+        report.finish()
+        _current_report.reset(token)
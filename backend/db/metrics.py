@@ -0,0 +1,360 @@
+"""
+Metrics registry with Prometheus text exposition
+
+Every chat and upload runs in its own short-lived Python process, so each
+process records into an in-memory registry and, when METRICS_STATE_FILE is
+set, merges its deltas into that shared file at exit (in-flight gauges are
+merged as they change). node-python_scripts/metrics_server.py serves the
+merged state on /metrics; a long-lived worker can call serve_metrics()
+to expose its own registry directly.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, Sequence
+
+from execution_report import current_report
+
+try:
+    import fcntl
+except ImportError:  # Windows: merge without a file lock
+    fcntl = None
+
+METRICS_STATE_FILE = os.getenv('METRICS_STATE_FILE')
+
+# USD per 1M tokens as (prompt, completion); override with MODEL_PRICING='{"model": [in, out]}'
+MODEL_PRICING = {
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-3-small": (0.02, 0.0),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+MODEL_PRICING.update({k: tuple(v) for k, v in json.loads(os.getenv('MODEL_PRICING', '{}')).items()})
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+HIT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Agent currently running in this task, used to label token usage and retrieval
+current_agent = contextvars.ContextVar('current_agent', default='none')
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: "Registry", name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], Any] = {}
+
+    def meta(self) -> Dict[str, Any]:
+        return {"type": self.kind, "help": self.help, "labelnames": list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def meta(self) -> Dict[str, Any]:
+        return {**super().meta(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    """Holds this process's metrics and merges them into the shared state file"""
+
+    def __init__(self, state_file: str = None):
+        self.lock = threading.RLock()
+        self.metrics: Dict[str, _Metric] = {}
+        self.state_file = state_file
+        if state_file:
+            atexit.register(self.flush)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of all values"""
+        with self.lock:
+            return {
+                name: {
+                    "meta": metric.meta(),
+                    "values": [[list(key), json.loads(json.dumps(value))] for key, value in metric.values.items()]
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Merge this process's values into the state file and reset them"""
+        if not self.state_file:
+            return
+        with self.lock:
+            delta = self.snapshot()
+            for metric in self.metrics.values():
+                metric.values.clear()
+        if not any(entry["values"] for entry in delta.values()):
+            return
+
+        with open(self.state_file, "a+") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content.strip() else {}
+                merge_state(state, delta)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def merge_state(state: Dict[str, Any], delta: Dict[str, Any]):
+    """Add one snapshot into another (counters/gauges sum, histograms add bucketwise)"""
+    for name, entry in delta.items():
+        target = state.setdefault(name, {"meta": entry["meta"], "values": []})
+        existing = {tuple(key): value for key, value in target["values"]}
+        for key, value in entry["values"]:
+            key = tuple(key)
+            if key not in existing:
+                existing[key] = value
+            elif isinstance(value, dict):
+                current = existing[key]
+                current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                current["sum"] += value["sum"]
+                current["count"] += value["count"]
+            else:
+                existing[key] += value
+        target["values"] = [[list(key), value] for key, value in existing.items()]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labelnames, key, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus(state: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (0.0.4) for a snapshot or merged state"""
+    lines = []
+    for name in sorted(state):
+        meta, values = state[name]["meta"], state[name]["values"]
+        lines.append(f"# HELP {name} {meta['help']}")
+        lines.append(f"# TYPE {name} {meta['type']}")
+        labelnames = meta["labelnames"]
+        for key, value in values:
+            if meta["type"] == "histogram":
+                for bound, count in zip(meta["buckets"], value["buckets"]):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_labels_text(labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_labels_text(labelnames, key, le)} {value['count']}")
+                lines.append(f"{name}_sum{_labels_text(labelnames, key)} {value['sum']}")
+                lines.append(f"{name}_count{_labels_text(labelnames, key)} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels_text(labelnames, key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            content = f.read()
+        return json.loads(content) if content.strip() else {}
+    except FileNotFoundError:
+        return {}
+
+
+# === Process registry and the metrics the pipeline records ===
+
+registry = Registry(METRICS_STATE_FILE)
+
+AGENT_LATENCY = registry.histogram(
+    "agent_latency_seconds", "Wall-clock time per agent invocation", ["agent"])
+AGENT_REQUESTS = registry.counter(
+    "agent_requests_total", "Agent invocations by outcome", ["agent", "status"])
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "Tokens reported by response.usage", ["agent", "model", "kind"])
+LLM_COST = registry.counter(
+    "llm_cost_usd_total", "Estimated spend from token usage and MODEL_PRICING", ["agent", "model"])
+OPENSEARCH_LATENCY = registry.histogram(
+    "opensearch_query_seconds", "OpenSearch request latency", ["operation"])
+OPENSEARCH_HITS = registry.histogram(
+    "opensearch_hits", "Hits returned per OpenSearch query", ["operation"], buckets=HIT_BUCKETS)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Cache lookups by result", ["cache", "result"])
+COALESCED_REQUESTS = registry.counter(
+    "coalesced_requests_total", "Single-flight calls by role (leader ran it, shared awaited it)", ["group", "result"])
+ADMISSION_REQUESTS = registry.counter(
+    "admission_requests_total", "Upstream admission decisions (admitted, rejected, throttled)", ["key", "result"])
+ADMISSION_WAIT = registry.histogram(
+    "admission_wait_seconds", "Time spent waiting for a rate limit token and concurrency slot", ["key"])
+LLM_ATTEMPTS = registry.counter(
+    "llm_attempts_total", "LLM attempts by model and outcome (ok, error, timeout, circuit_open, rejected, hedged)",
+    ["model", "outcome"])
+INFLIGHT = registry.gauge(
+    "inflight_requests", "Requests currently being processed", ["kind"])
+
+
+def record_usage(model: str, usage: Any, agent: str = None):
+    """Count tokens and cost from an OpenAI-style response.usage"""
+    if usage is None:
+        return
+    agent = agent or current_agent.get()
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, model=model, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, agent=agent, model=model, kind="completion")
+
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    if cost:
+        LLM_COST.inc(cost, agent=agent, model=model)
+
+    report = current_report()
+    if report is not None:
+        # Calls made outside any agent (pre-search, memory summaries) belong to the orchestrator
+        report.tokens("Orchestrator" if agent == "none" else agent, model, prompt_tokens, completion_tokens, cost)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    report = current_report()
+    if report is not None:
+        report.cache(cache, hit)
+
+
+@contextmanager
+def track_inflight(kind: str):
+    """In-flight gauge; merged immediately so the sidecar sees live values"""
+    INFLIGHT.inc(kind=kind)
+    registry.flush()
+    try:
+        yield
+    finally:
+        INFLIGHT.dec(kind=kind)
+        registry.flush()
+
+
+def instrument_agent(agent_name: str, fn):
+    """Wrap an executor_dict entry with latency, outcome and agent labelling"""
+    async def wrapper(*args, **kwargs):
+        token = current_agent.set(agent_name)
+        start = time.perf_counter()
+        status = "ok"
+        INFLIGHT.inc(kind="agent")
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            INFLIGHT.dec(kind="agent")
+            elapsed = time.perf_counter() - start
+            AGENT_LATENCY.observe(elapsed, agent=agent_name)
+            AGENT_REQUESTS.inc(agent=agent_name, status=status)
+            report = current_report()
+            if report is not None:
+                report.agent_run(agent_name, elapsed, status)
+            current_agent.reset(token)
+    wrapper.__name__ = getattr(fn, "__name__", agent_name)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+def serve_metrics(port: int, state_file: str = None):
+    """Serve /metrics from a daemon thread (merged file state plus this process)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            state = load_state(state_file) if state_file else {}
+            merge_state(state, registry.snapshot())
+            body = render_prometheus(state).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
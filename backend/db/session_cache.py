@@ -0,0 +1,287 @@
+"""
+Local cache of each session's resume chunks and vectors, written at ingest
+
+Upload and chat run in separate short-lived processes, so the shared layer
+is a SQLite file (WAL mode, safe for concurrent readers and one writer)
+rather than process memory. An in-process LRU sits in front of it for
+long-lived workers; entries are revalidated against the session's
+updated_at, so an invalidation by another process is never missed.
+
+The cache holds the ordered chunk texts, metadata and embeddings (float32
+blobs). Small resumes are returned whole without an embedding call or kNN
+query; larger ones are scored locally against the query embedding instead
+of OpenSearch, with one matrix-vector product over the session's
+pre-normalized vectors.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+
+from tracing import get_logger
+
+if TYPE_CHECKING:
+    import numpy as np  # imported where used, to keep script startup fast
+
+logger = get_logger("session_cache")
+
+SESSION_CACHE_PATH = os.getenv('SESSION_CACHE_PATH', str(Path(__file__).parent.parent / 'session_cache.db'))
+SESSION_CACHE_ENABLED = os.getenv('SESSION_CACHE_ENABLED', 'true').lower() == 'true'
+# Sessions with at most this many chunks are answered with the whole resume
+WHOLE_RESUME_MAX_CHUNKS = int(os.getenv('WHOLE_RESUME_MAX_CHUNKS', '8'))
+# Sessions kept decoded in this process
+SESSION_LRU_SIZE = int(os.getenv('SESSION_LRU_SIZE', '64'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    filename TEXT,
+    chunk_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (session_id, position)
+);
+"""
+
+# sqlite3 connections are not shared across threads
+_local = threading.local()
+
+# session_id -> (updated_at, chunks, unit-normalized vector matrix or None)
+_lru: "OrderedDict[str, tuple]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(SESSION_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(SESSION_CACHE_PATH, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+        if "embedding" not in columns:
+            # Caches created before vectors were stored
+            conn.execute("ALTER TABLE chunks ADD COLUMN embedding BLOB")
+        _local.conn = conn
+    return conn
+
+
+def _encode_vector(vector) -> Optional[bytes]:
+    import numpy as np
+    return np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+
+
+def _decode_vector(blob: Optional[bytes]) -> Optional["np.ndarray"]:
+    import numpy as np
+    return np.frombuffer(blob, dtype=np.float32) if blob is not None else None
+
+
+def _unit_matrix(chunks: List[Dict[str, Any]]) -> Optional["np.ndarray"]:
+    """The chunks' vectors stacked and normalized to unit length, or None if any is missing"""
+    if not chunks or any(chunk["embedding"] is None for chunk in chunks):
+        return None
+    import numpy as np
+    matrix = np.stack([chunk["embedding"] for chunk in chunks]).astype(np.float32, copy=False)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _lru_put(session_id: str, updated_at: float, chunks: List[Dict[str, Any]]) -> tuple:
+    entry = (updated_at, chunks, _unit_matrix(chunks))
+    with _lru_lock:
+        _lru[session_id] = entry
+        _lru.move_to_end(session_id)
+        while len(_lru) > SESSION_LRU_SIZE:
+            _lru.popitem(last=False)
+    return entry
+
+
+def _lru_drop(session_id: str):
+    with _lru_lock:
+        _lru.pop(session_id, None)
+
+
+def put_session(session_id: str, chunks: List[Dict[str, Any]], filename: str = None):
+    """
+    Replace the cached chunks for a session (chunks as built by
+    build_chunk_metadata, with "embedding" when available)
+    """
+    if not SESSION_CACHE_ENABLED or not session_id:
+        return
+    updated_at = time.time()
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO chunks (session_id, position, content, metadata, embedding) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, i, chunk["content"], json.dumps(chunk["metadata"], default=str),
+                  _encode_vector(chunk.get("embedding")))
+                 for i, chunk in enumerate(chunks)]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, filename, chunk_count, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, filename, len(chunks), updated_at)
+            )
+    except sqlite3.Error as e:
+        # The cache is an optimisation; ingest has already succeeded
+        logger.warning("Could not cache session %s: %s", session_id, e)
+        _lru_drop(session_id)
+        return
+    import numpy as np
+    _lru_put(session_id, updated_at, [
+        {"content": chunk["content"],
+         "metadata": json.loads(json.dumps(chunk["metadata"], default=str)),
+         "embedding": np.asarray(chunk["embedding"], dtype=np.float32) if chunk.get("embedding") is not None else None}
+        for chunk in chunks
+    ])
+
+
+def _session_row(session_id: str):
+    try:
+        return _connect().execute(
+            "SELECT chunk_count, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Session cache read failed: %s", e)
+        return None
+
+
+def get_chunk_count(session_id: str) -> Optional[int]:
+    """Chunk count recorded at ingest, or None if the session is not cached"""
+    if not SESSION_CACHE_ENABLED or not session_id:
+        return None
+    row = _session_row(session_id)
+    return row[0] if row else None
+
+
+def _session_entry(session_id: str) -> Optional[tuple]:
+    """(updated_at, chunks, unit matrix) for a cached session, or None"""
+    if not SESSION_CACHE_ENABLED or not session_id:
+        return None
+    row = _session_row(session_id)
+    if row is None:
+        _lru_drop(session_id)
+        return None
+    _, updated_at = row
+
+    with _lru_lock:
+        entry = _lru.get(session_id)
+        if entry and entry[0] == updated_at:
+            _lru.move_to_end(session_id)
+            return entry
+
+    try:
+        rows = _connect().execute(
+            "SELECT content, metadata, embedding FROM chunks WHERE session_id = ? ORDER BY position", (session_id,)
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Session cache read failed: %s", e)
+        return None
+    chunks = [
+        {"content": content, "metadata": json.loads(metadata), "embedding": _decode_vector(embedding)}
+        for content, metadata, embedding in rows
+    ]
+    return _lru_put(session_id, updated_at, chunks)
+
+
+def get_session(session_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Cached chunks in document order ({"content", "metadata", "embedding"}),
+    or None if the session is not cached
+    """
+    entry = _session_entry(session_id)
+    return entry[1] if entry else None
+
+
+def invalidate(session_id: str):
+    """Drop a session from the cache (called when its OpenSearch data is deleted)"""
+    _lru_drop(session_id)
+    if not SESSION_CACHE_ENABLED or not session_id:
+        return
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    except sqlite3.Error as e:
+        logger.warning("Could not invalidate cached session %s: %s", session_id, e)
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _matches(metadata: Dict[str, Any], sections: List[str] = None, filters: Dict[str, Any] = None) -> bool:
+    """Local equivalent of build_metadata_filters"""
+    if sections and not set(sections) & set(_as_list(metadata.get("section"))):
+        return False
+    for field, value in (filters or {}).items():
+        wanted = set(_as_list(list(value) if isinstance(value, (tuple, set)) else value))
+        if not wanted & set(_as_list(metadata.get(field))):
+            return False
+    return True
+
+
+def _result(chunk: Dict[str, Any], score: Optional[float]) -> Dict[str, Any]:
+    return {"content": chunk["content"], "metadata": chunk["metadata"], "score": score}
+
+
+def whole_resume(session_id: str, sections: List[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    The session's full resume if it is cached and small enough, else None
+
+    With sections, only chunks tagged with one of them are returned (all
+    chunks if none match, mirroring the unfiltered retry in retrieval).
+    """
+    count = get_chunk_count(session_id)
+    if not count or count > WHOLE_RESUME_MAX_CHUNKS:
+        return None
+    chunks = get_session(session_id)
+    if not chunks:
+        return None
+    if sections:
+        chunks = [c for c in chunks if _matches(c["metadata"], sections)] or chunks
+    return [_result(chunk, None) for chunk in chunks]
+
+
+def search_session(
+    session_id: str,
+    query_embedding: "np.ndarray",
+    k: int = 5,
+    sections: List[str] = None,
+    filters: Dict[str, Any] = None,
+    min_score: float = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Exact kNN over the session's cached vectors, scored like OpenSearch
+    cosinesimil ((1 + cosine) / 2); None if the session or its vectors are
+    not cached
+    """
+    entry = _session_entry(session_id)
+    if not entry or entry[2] is None:
+        return None
+    _, chunks, matrix = entry
+    import numpy as np
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    scores = (1.0 + matrix @ (query / norm if norm else query)) / 2.0
+
+    candidates = [i for i, chunk in enumerate(chunks) if _matches(chunk["metadata"], sections, filters)]
+    if min_score is not None:
+        candidates = [i for i in candidates if scores[i] >= min_score]
+    candidates.sort(key=lambda i: scores[i], reverse=True)
+    return [_result(chunks[i], float(scores[i])) for i in candidates[:k]]
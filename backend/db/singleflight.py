@@ -0,0 +1,103 @@
+"""
+Single-flight request coalescing
+
+Concurrent callers asking for the same key share one upstream call: the
+first caller (the leader) runs it and everyone who arrives while it is in
+flight gets the same result or exception. Nothing is cached afterwards;
+the next call after completion runs again.
+
+Results are shared objects, so callers must not mutate them. Coalescing is
+per process; every chat runs in its own process, so this pays off for
+concurrent agents and threads within a process (and long-lived workers),
+while duplicate chat submits are coalesced on the Node side.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, Dict
+
+from metrics import COALESCED_REQUESTS
+
+SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT_ENABLED', 'true').lower() == 'true'
+
+
+def make_key(*parts: Any) -> str:
+    """Stable key for arbitrary JSON-able arguments"""
+    canonical = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Coalesces blocking calls made from multiple threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable, *args, **kwargs):
+        if not SINGLEFLIGHT_ENABLED:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.inc(group=self.name, result="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        COALESCED_REQUESTS.inc(group=self.name, result="leader")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncGroup:
+    """Coalesces coroutine calls within an event loop"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable, *args, **kwargs):
+        if not SINGLEFLIGHT_ENABLED:
+            return await fn(*args, **kwargs)
+
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            # The call runs as its own task so a cancelled caller does not
+            # cancel it for everyone else
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            COALESCED_REQUESTS.inc(group=self.name, result="leader")
+        else:
+            COALESCED_REQUESTS.inc(group=self.name, result="shared")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
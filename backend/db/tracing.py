@@ -0,0 +1,293 @@
+"""
+Span-based tracing and logging for the chat and ingest pipelines
+
+Exporters (TRACING_EXPORTER):
+  none     default; span() returns a shared no-op object and traced() leaves
+           functions untouched, so disabled tracing costs nothing
+  console  one JSON span per line on stderr
+  jsonl    one JSON span per line appended to TRACING_FILE
+  otlp     OpenTelemetry SDK + OTLP exporter (configured with the standard
+           OTEL_EXPORTER_OTLP_* variables); falls back to jsonl if the SDK
+           is not installed
+
+console/jsonl spans use OTLP/JSON field names (traceId, spanId, parentSpanId,
+startTimeUnixNano, ...) so they can be replayed into any OTLP collector.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import atexit
+import inspect
+import logging
+import secrets
+import functools
+import threading
+import contextvars
+from typing import Dict, Any
+
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACING_FILE = os.getenv('TRACING_FILE', 'traces.jsonl')
+SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'career-agents')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING').upper()
+DEBUG_SAMPLE_RATE = float(os.getenv('DEBUG_SAMPLE_RATE', '0.01'))
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_write_lock = threading.Lock()
+_logging_configured = False
+
+
+# === Logging ===
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger writing to stderr so stdout stays reserved for the JSON Node parses"""
+    global _logging_configured
+    if not _logging_configured:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("[%(levelname)s %(name)s] %(message)s"))
+        root = logging.getLogger("career")
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _logging_configured = True
+    return logging.getLogger(f"career.{name}")
+
+
+def log_sampled(logger: logging.Logger, message: str, *args, level: int = logging.DEBUG):
+    """Log only when the level is enabled and this call falls inside DEBUG_SAMPLE_RATE"""
+    if logger.isEnabledFor(level) and random.random() < DEBUG_SAMPLE_RATE:
+        logger.log(level, message, *args)
+
+
+def summarize_query(body: Any) -> Any:
+    """Copy of a query body with embedding vectors replaced by a short placeholder"""
+    if isinstance(body, dict):
+        return {key: summarize_query(value) for key, value in body.items()}
+    if isinstance(body, list):
+        if len(body) > 16 and all(isinstance(x, (int, float)) for x in body[:16]):
+            return f"<vector dim={len(body)}>"
+        return [summarize_query(value) for value in body]
+    return body
+
+
+# === Spans ===
+
+class _NoopSpan:
+    """Shared do-nothing span used when tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed pipeline stage; nested spans share the trace id"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any] = None, start_ns: int = None):
+        parent = _current_span.get()
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        self.start_ns = self.start_ns or time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        _exporter.export(self)
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "resource": {"service.name": SERVICE_NAME},
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+
+
+class _OtelSpan:
+    """Span backed by the OpenTelemetry SDK"""
+
+    def __init__(self, tracer, name: str, attributes: Dict[str, Any] = None, start_ns: int = None):
+        self._cm = tracer.start_as_current_span(
+            name,
+            attributes={k: v if isinstance(v, (bool, int, float, str)) else str(v) for k, v in (attributes or {}).items()},
+            start_time=start_ns,
+            record_exception=True
+        )
+        self._span = None
+
+    def __enter__(self):
+        self._span = self._cm.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cm.__exit__(exc_type, exc, tb)
+
+    def set_attribute(self, key: str, value: Any):
+        self._span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+
+# === Exporters ===
+
+class _StreamExporter:
+    def __init__(self, stream_factory):
+        self._stream_factory = stream_factory
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_otlp())
+        with _write_lock:
+            stream = self._stream_factory()
+            stream.write(line + "\n")
+            stream.flush()
+
+
+class _FileExporter:
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_otlp())
+        with _write_lock:
+            if self._file is None:
+                self._file = open(self._path, "a")
+                atexit.register(self._file.close)
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+def _build_otel_tracer():
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OpenTelemetry SDK not installed, writing spans to TRACING_FILE instead", file=sys.stderr)
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    # Short-lived scripts must flush the batch before exiting
+    atexit.register(provider.shutdown)
+    return trace.get_tracer(SERVICE_NAME)
+
+
+_otel_tracer = None
+_exporter = None
+
+if TRACING_EXPORTER == 'otlp':
+    _otel_tracer = _build_otel_tracer()
+    if _otel_tracer is None:
+        _exporter = _FileExporter(TRACING_FILE)
+elif TRACING_EXPORTER == 'console':
+    _exporter = _StreamExporter(lambda: sys.stderr)
+elif TRACING_EXPORTER == 'jsonl':
+    _exporter = _FileExporter(TRACING_FILE)
+
+ENABLED = _otel_tracer is not None or _exporter is not None
+
+
+def span(name: str, **attributes):
+    """Context manager timing one stage: `with span("opensearch.knn_search", k=5):`"""
+    if not ENABLED:
+        return NOOP_SPAN
+    if _otel_tracer is not None:
+        return _OtelSpan(_otel_tracer, name, attributes)
+    return Span(name, attributes)
+
+
+def record_span(name: str, start_ns: int, end_ns: int = None, **attributes):
+    """Record a stage that has already happened, e.g. module imports"""
+    if not ENABLED:
+        return
+    end_ns = end_ns or time.time_ns()
+    if _otel_tracer is not None:
+        otel_span = _otel_tracer.start_span(name, start_time=start_ns, attributes=attributes)
+        otel_span.end(end_time=end_ns)
+        return
+    finished = Span(name, attributes, start_ns)
+    finished.end_ns = end_ns
+    _exporter.export(finished)
+
+
+def traced(name: str = None):
+    """Decorator wrapping a sync or async function in a span; a no-op when tracing is disabled"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
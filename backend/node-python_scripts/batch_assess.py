@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Batch job: Resume Assessment Agent output for every resume in the index
+
+Sessions are read in one paginated pass over a point-in-time snapshot of the
+index (sorted by session, see AWSOpenSearchClient.iter_sessions) and each
+whole resume is assessed
+with the agent's prompt and model chain from config.yaml. At most
+--concurrency assessments run at once, and every LLM call goes through the
+shared per-provider rate limits (db/admission.py), so a batch run and live
+chats draw from the same budgets.
+
+Each finished session is appended to the --output JSONL file as soon as it
+completes. Rerunning with the same output skips sessions already assessed
+and retries failed ones, so a crashed run resumes where it stopped. A
+session with gaps in its chunk positions is recorded as failed, not assessed.
+
+Usage: python batch_assess.py --output assessments.jsonl [--sessions-file ids.txt] [--concurrency 4]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+# Add the db and air_llm directories to the path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent / 'db'))
+sys.path.append(str(Path(__file__).parent.parent / 'air_llm'))
+
+try:
+    from aws_opensearch import get_opensearch_client, chunk_position
+    from admission import AdmissionRejected
+    from agents import assess_resume
+    from tracing import get_logger
+except ImportError as e:
+    print(f"Import error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+logger = get_logger("batch_assess")
+
+CONFIG_PATH = Path(__file__).parent.parent / 'air_llm' / 'config.yaml'
+AGENT_NAME = "Resume Assessment Agent"
+DEFAULT_REQUEST = "Please assess my resume."
+
+
+def agent_config(name: str = AGENT_NAME) -> dict:
+    """An agent's `config` block from air_llm/config.yaml"""
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    for agent in config.get("utility_agents", []):
+        if agent.get("agent_name") == name:
+            return agent.get("config") or {}
+    raise RuntimeError(f"{name} not found in {CONFIG_PATH}")
+
+
+def completed_sessions(output_path: str) -> set:
+    """Session ids already assessed successfully in a previous run's output"""
+    done = set()
+    path = Path(output_path)
+    if not path.exists():
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that session is simply redone
+                continue
+            if record.get("status") == "ok":
+                done.add(record["session_id"])
+    return done
+
+
+def end_partial_line(output_path: str):
+    """Terminate a last line cut short by a crash so new records start on their own line"""
+    path = Path(output_path)
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, 2)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def missing_chunks(chunks) -> list:
+    """Positions absent from a session's chunks (which should number 0..n-1)"""
+    present = {chunk_position(chunk) for chunk in chunks}
+    return sorted(set(range(max(present) + 1)) - present)
+
+
+def read_session_ids(path: str) -> list:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def assess_session(session_id: str, chunks, config: dict, request: str, retries: int) -> dict:
+    """Assess one session, waiting out rate-limit rejections up to `retries` times"""
+    start = time.perf_counter()
+    record = {
+        "session_id": session_id,
+        "filename": chunks[0]["metadata"].get("filename"),
+        "chunks": len(chunks),
+    }
+    gaps = missing_chunks(chunks)
+    if gaps:
+        # Never record an assessment of part of a resume as done
+        record.update(status="error", error=f"incomplete resume, missing chunks {gaps}",
+                      seconds=0.0, finished_at=datetime.now().isoformat())
+        return record
+    resume_text = "\n\n".join(chunk["content"] for chunk in chunks)
+    for attempt in range(retries + 1):
+        try:
+            record["assessment"] = await assess_resume(request, resume_text, config)
+            record["status"] = "ok"
+            break
+        except AdmissionRejected as e:
+            if attempt == retries:
+                record.update(status="error", error=str(e))
+                break
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            logger.warning("Assessment failed for %s: %s", session_id, e)
+            record.update(status="error", error=str(e))
+            break
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["finished_at"] = datetime.now().isoformat()
+    return record
+
+
+async def run(args) -> dict:
+    config = agent_config()
+    done = completed_sessions(args.output)
+    end_partial_line(args.output)
+    session_ids = read_session_ids(args.sessions_file) if args.sessions_file else None
+    client = get_opensearch_client()
+    sessions = client.iter_sessions(page_size=args.page_size, session_ids=session_ids)
+
+    stats = {"assessed": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+    last_report = start
+    pending = set()
+
+    def rate() -> float:
+        elapsed = time.perf_counter() - start
+        return round((stats["assessed"] + stats["failed"]) * 60 / elapsed, 2) if elapsed else 0.0
+
+    with open(args.output, "a") as output:
+        def finish(task):
+            nonlocal last_report
+            record = task.result()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            stats["assessed" if record["status"] == "ok" else "failed"] += 1
+            if time.perf_counter() - last_report >= args.report_every:
+                last_report = time.perf_counter()
+                print(f"{stats['assessed']} assessed, {stats['failed']} failed, "
+                      f"{stats['skipped']} skipped, {rate()} sessions/min", file=sys.stderr)
+
+        while True:
+            # The scan blocks on HTTP; fetch the next session off the event loop
+            session = await asyncio.to_thread(next, sessions, None)
+            if session is None:
+                break
+            session_id, chunks = session
+            if session_id in done:
+                stats["skipped"] += 1
+                continue
+            if args.limit and stats["assessed"] + stats["failed"] + len(pending) >= args.limit:
+                break
+            if len(pending) >= args.concurrency:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    finish(task)
+            pending.add(asyncio.ensure_future(
+                assess_session(session_id, chunks, config, args.request, args.retries)))
+
+        if pending:
+            finished, _ = await asyncio.wait(pending)
+            for task in finished:
+                finish(task)
+
+    return {
+        **stats,
+        "output": args.output,
+        "seconds": round(time.perf_counter() - start, 2),
+        "sessions_per_minute": rate(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Resume Assessment Agent over many sessions")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to (and resumed from)")
+    parser.add_argument("--sessions-file", help="Only assess these session ids (one per line)")
+    parser.add_argument("--request", default=DEFAULT_REQUEST, help="User request the assessment answers")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=5, help="Waits for rate-limit capacity per session")
+    parser.add_argument("--page-size", type=int, default=1000, help="Chunks fetched per page of the scan")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many sessions (0: all)")
+    parser.add_argument("--report-every", type=float, default=30.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    try:
+        result = asyncio.run(run(args))
+        result["success"] = result["failed"] == 0
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result["success"] else 1)
+
+    except Exception as e:
+        print(f"Error running batch assessment: {str(e)}", file=sys.stderr)
+        print(json.dumps({"success": False, "error": str(e)}, indent=2))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -8,18 +8,10 @@ Includes web interface functionality
 import sys
 import os
 import json
+import time
 import asyncio
 from pathlib import Path
 
-# pretty markdown rendering
-try:
-    from rich.console import Console
-    from rich.markdown import Markdown
-    from rich.panel import Panel
-    RICH_AVAILABLE = True
-except ImportError:
-    RICH_AVAILABLE = False
-
 # Add air_llm directory to path
 sys.path.append(str(Path(__file__).parent.parent / 'air_llm'))
 
@@ -27,11 +19,15 @@ sys.path.append(str(Path(__file__).parent.parent / 'air_llm'))
 backend_dir = str(Path(__file__).parent.parent)
 sys.path.append(os.path.join(backend_dir, 'db'))
 
+_import_start_ns = time.time_ns()
 try:
     from orchestrator import ask_agents
+    from tracing import record_span
+    from admission import AdmissionRejected
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
+record_span("import", _import_start_ns, module="orchestrator")
 
 async def handle_chat(user_message: str, user_id: str = "user", session_id: str = None):
     """
@@ -45,13 +41,22 @@ async def handle_chat(user_message: str, user_id: str = "user", session_id: str
     """
     try:
         # Pass session_id directly to ask_agents so it can fetch resume context
-        response, agents_used = await ask_agents(user_message, user_id, session_id)
+        response, report = await ask_agents(user_message, user_id, session_id)
         return {
             'success': True,
             'response': response,
-            'agents_used': list(agents_used),
+            'agents_used': report.agents_used,
+            'report': report.to_dict(),
             'service': 'AI Refinery (Orchestrator) + AWS OpenSearch + OpenAI'
         }
+    except AdmissionRejected as e:
+        # Over capacity: Node answers 429 with Retry-After instead of an apology
+        return {
+            'success': False,
+            'rejected': True,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }
     except Exception as e:
         return {
             'success': False,
@@ -82,8 +87,20 @@ def main():
         # Run async chat handler
         result = asyncio.run(handle_chat(message, user_id, session_id))
         
+        # Pretty markdown rendering is only imported when asked for, so the
+        # JSON path used by Node does not pay for loading rich
+        rich_available = False
+        if output_format == 'pretty':
+            try:
+                from rich.console import Console
+                from rich.markdown import Markdown
+                from rich.panel import Panel
+                rich_available = True
+            except ImportError:
+                pass
+
         # Terminal output based on format
-        if output_format == 'pretty' and RICH_AVAILABLE:
+        if output_format == 'pretty' and rich_available:
             # Pretty markdown rendering for terminal viewing
             console = Console()
             
@@ -97,6 +114,12 @@ def main():
                 console.print(md)
                 
                 console.print(f"\n[bold blue]Agents Used:[/bold blue] [yellow]{', '.join(result['agents_used'])}[/yellow]")
+                report = result['report']
+                console.print(
+                    f"[bold blue]Report:[/bold blue] {report['seconds']:.2f}s, "
+                    f"{report['tokens']['prompt'] + report['tokens']['completion']} tokens "
+                    f"(${report['tokens']['cost_usd']:.4f}), {len(report['retrieval'])} retrievals"
+                )
                 console.print(f"[bold blue]Service:[/bold blue] {result['service']}\n")
             else:
                 console.print("\n")
@@ -14,7 +14,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent / 'db'))
 
 try:
-    from aws_opensearch import AWSOpenSearchClient
+    from aws_opensearch import AWSOpenSearchClient, get_opensearch_client
+    import conversation_memory
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
@@ -70,7 +71,7 @@ def main():
     
     try:
         # Initialize OpenSearch client
-        client = AWSOpenSearchClient()
+        client = get_opensearch_client()
         
         # Delete associated files first (get filenames from OpenSearch before deleting)
         if uploads_dir:
@@ -80,6 +81,9 @@ def main():
         # Delete from OpenSearch using existing method
         deleted_count = client.delete_session_data(session_id)
         cleanup_result["opensearch_deleted"] = deleted_count
+
+        # Sessions are keyed by conversation id, which also keys chat memory
+        conversation_memory.forget(session_id)
         
         # Only output JSON for Node.js parsing
         print(json.dumps(cleanup_result, indent=2))
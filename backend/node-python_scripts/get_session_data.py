@@ -12,7 +12,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent / 'db'))
 
 try:
-    from aws_opensearch import AWSOpenSearchClient
+    from aws_opensearch import get_opensearch_client
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
@@ -25,7 +25,7 @@ def main():
     session_id = sys.argv[1]
     
     try:
-        client = AWSOpenSearchClient()
+        client = get_opensearch_client()
         chunks = client.get_session_chunks(session_id)
         
         result = {
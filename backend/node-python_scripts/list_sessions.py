@@ -12,7 +12,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent / 'db'))
 
 try:
-    from aws_opensearch import AWSOpenSearchClient
+    from aws_opensearch import get_opensearch_client
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
@@ -20,33 +20,39 @@ except ImportError as e:
 def list_all_files_and_sessions():
     """List all files and their associated sessions from OpenSearch"""
     try:
-        client = AWSOpenSearchClient()
+        client = get_opensearch_client()
         
+        # One aggregation instead of fetching every chunk: sessions, then
+        # their files with chunk counts and latest upload time
         query = {
-            "query": {"match_all": {}},
-            "_source": ["metadata.filename", "metadata.session_id", "metadata.created_at"],
-            "size": 1000,
-            "sort": [{"metadata.created_at": {"order": "desc"}}]
+            "size": 0,
+            "track_total_hits": True,
+            "aggs": {
+                "sessions": {
+                    "terms": {"field": "metadata.session_id.keyword", "size": 1000},
+                    "aggs": {
+                        "files": {
+                            "terms": {"field": "metadata.filename", "size": 100},
+                            "aggs": {"created_at": {"max": {"field": "metadata.created_at"}}}
+                        }
+                    }
+                }
+            }
         }
         
         response = client.client.search(index=client.index_name, body=query)
         
         files_by_session = {}
         
-        for hit in response['hits']['hits']:
-            metadata = hit['_source'].get('metadata', {})
-            filename = metadata.get('filename', 'Unknown')
-            session_id = metadata.get('session_id', 'Unknown')
-            created_at = metadata.get('created_at', 'Unknown')
-            
-            if session_id not in files_by_session:
-                files_by_session[session_id] = []
-            
-            files_by_session[session_id].append({
-                'filename': filename,
-                'created_at': created_at,
-                'document_id': hit['_id']
-            })
+        for session in response['aggregations']['sessions']['buckets']:
+            files_by_session[session['key']] = [
+                {
+                    'filename': file['key'],
+                    'created_at': file['created_at'].get('value_as_string', file['created_at']['value']),
+                    'chunks': file['doc_count']
+                }
+                for file in session['files']['buckets']
+            ]
         
         return {
             'total_sessions': len(files_by_session),
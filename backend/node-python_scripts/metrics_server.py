@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Metrics sidecar serving Prometheus text format on /metrics
+Aggregates what every chat/upload process merged into METRICS_STATE_FILE
+
+Usage: METRICS_STATE_FILE=/tmp/career-metrics.json python metrics_server.py [port]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the db directory to the path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent / 'db'))
+
+try:
+    from metrics import serve_metrics, METRICS_STATE_FILE
+except ImportError as e:
+    print(f"Import error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv('METRICS_PORT', '9464'))
+
+    if not METRICS_STATE_FILE:
+        print("METRICS_STATE_FILE is not set; worker processes will not report metrics", file=sys.stderr)
+        sys.exit(1)
+
+    serve_metrics(port, METRICS_STATE_FILE)
+    print(f"Serving metrics on :{port}/metrics from {METRICS_STATE_FILE}", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script to bootstrap the OpenSearch index
+Run once per deployment, before the first upload, instead of checking the
+index on every client construction
+"""
+
+import sys
+import json
+from pathlib import Path
+
+# Add the db directory to the path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent / 'db'))
+
+try:
+    from aws_opensearch import get_opensearch_client
+except ImportError as e:
+    print(f"Import error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    try:
+        client = get_opensearch_client()
+        created = client.create_index_if_not_exists()
+
+        result = {
+            "index": client.index_name,
+            "created": created
+        }
+
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
+    except Exception as e:
+        print(f"Error migrating index: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,21 @@ Called from Node.js upload route
 import sys
 import os
 import json
+import time
 from datetime import datetime
 from pathlib import Path
 
 # Add the db directory to the path so we can import our modules
 sys.path.append(str(Path(__file__).parent.parent / 'db'))
 
+_import_start_ns = time.time_ns()
 try:
     from chunking import process_resume_pipeline
+    from tracing import record_span
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
     sys.exit(1)
+record_span("import", _import_start_ns, module="chunking")
 
 def main():
     if len(sys.argv) < 3:
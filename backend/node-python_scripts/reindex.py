@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the resume index without downtime
+Creates the next versioned index (new embedding dimension and/or HNSW
+parameters), fills it in parallel batches, then atomically swaps the alias
+
+Modes:
+  copy     reuse the stored vectors (dimension must not change, and the
+           source index must keep vectors in _source)
+  reembed  re-embed every chunk's content with the configured model
+
+Writes keep flowing to the old index during the fill. Chunks written since
+the start (metadata.indexed_at, UTC) are copied again before and after the
+alias swap, and sessions deleted since the start (tombstones written by
+delete_session_data) are then removed from the new index, except chunks
+re-uploaded after the deletion. Chunks written before metadata.chunk_index
+existed get it from their id on the way over.
+"""
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the db directory to the path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent / 'db'))
+
+try:
+    from opensearchpy import helpers
+    from aws_opensearch import (
+        get_opensearch_client,
+        build_index_body,
+        bulk_ndjson,
+        vectors_in_source,
+        chunk_position,
+        utc_now,
+        OPENSEARCH_EXCLUDE_VECTORS,
+        EMBEDDING_DIMENSION,
+        OPENSEARCH_SHARDS,
+        HNSW_ENGINE,
+        HNSW_SPACE_TYPE,
+        HNSW_M,
+        HNSW_EF_CONSTRUCTION,
+        HNSW_EF_SEARCH
+    )
+except ImportError as e:
+    print(f"Import error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def scan_source(client, source_index: str, batch_size: int, mode: str, since: str = None):
+    """Yield lists of source documents from the old index"""
+    query = {"query": {"match_all": {}}}
+    if since:
+        query = {"query": {"range": {"metadata.indexed_at": {"gte": since}}}}
+    if mode == "reembed":
+        # Old vectors are discarded; don't transfer them
+        query["_source"] = {"excludes": ["embedding"]}
+
+    batch = []
+    for hit in helpers.scan(client.client, index=source_index, query=query, size=batch_size):
+        batch.append(hit)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_batch(client, target_index: str, hits, mode: str, model: str, dimension: int) -> int:
+    """Copy or re-embed one batch of documents into the target index"""
+    if mode == "reembed":
+        from chunking import embed_chunks
+        embeddings = embed_chunks([hit["_source"]["content"] for hit in hits], model, dimension)
+    else:
+        embeddings = [hit["_source"]["embedding"] for hit in hits]
+
+    actions = []
+    for hit, embedding in zip(hits, embeddings):
+        # Keep (or, for chunks written before routing, add) the session routing
+        routing = hit.get("_routing") or hit["_source"].get("metadata", {}).get("session_id")
+        action = {"_index": target_index, "_id": hit["_id"]}
+        if routing:
+            action["routing"] = routing
+        metadata = hit["_source"].get("metadata", {})
+        if "chunk_index" not in metadata:
+            metadata = {**metadata, "chunk_index": chunk_position({"id": hit["_id"], "metadata": metadata})}
+        actions.append(({"index": action}, {**hit["_source"], "metadata": metadata, "embedding": embedding}))
+
+    response = client.client.bulk(body=bulk_ndjson(actions), filter_path=["errors", "items.*.error", "items.*._id"])
+    if response.get("errors"):
+        failed = [item for item in response["items"] if item["index"].get("error")]
+        raise RuntimeError(f"{len(failed)} documents failed to index, first error: {failed[0]['index']['error']}")
+    return len(hits)
+
+
+def replay_deletions(client, target_index: str, since: str) -> int:
+    """Remove chunks of sessions deleted since `since` that were written before their deletion"""
+    removed = 0
+    for tombstone in client.deletions_since(since):
+        session_id = tombstone["session_id"]
+        query = {"query": {"bool": {
+            "filter": [{"term": {"metadata.session_id.keyword": session_id}}],
+            "should": [
+                {"range": {"metadata.indexed_at": {"lt": tombstone["deleted_at"]}}},
+                {"bool": {"must_not": [{"exists": {"field": "metadata.indexed_at"}}]}}
+            ],
+            "minimum_should_match": 1
+        }}}
+        response = client.client.delete_by_query(index=target_index, body=query, routing=session_id)
+        removed += response.get("deleted", 0)
+    return removed
+
+
+def fill_index(client, source_index: str, target_index: str, args, since: str = None) -> int:
+    """Fill the target index from the source in parallel batches"""
+    copied = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        pending = []
+        for hits in scan_source(client, source_index, args.batch_size, args.mode, since):
+            pending.append(pool.submit(write_batch, client, target_index, hits, args.mode, args.model, args.dimension))
+            # Keep a bounded number of batches in flight
+            if len(pending) >= args.workers * 2:
+                copied += pending.pop(0).result()
+        for future in pending:
+            copied += future.result()
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reindex resume vectors behind the alias")
+    parser.add_argument("--mode", choices=["copy", "reembed"], default="copy")
+    parser.add_argument("--model", default=None, help="Embedding model for reembed mode (default: EMBEDDING_MODEL)")
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument("--engine", default=HNSW_ENGINE)
+    parser.add_argument("--space-type", default=HNSW_SPACE_TYPE)
+    parser.add_argument("--m", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
+    parser.add_argument("--shards", type=int, default=OPENSEARCH_SHARDS)
+    parser.add_argument("--exclude-vectors", action=argparse.BooleanOptionalAction, default=OPENSEARCH_EXCLUDE_VECTORS,
+                        help="Keep vectors out of the new index's _source")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--delete-old", action="store_true", help="Delete the previous index after the swap")
+    args = parser.parse_args()
+
+    result = {"success": True, "mode": args.mode}
+
+    try:
+        client = get_opensearch_client()
+
+        # Source is the index behind the alias, or a legacy concrete index
+        old_indices = client.get_alias_indices()
+        if len(old_indices) > 1:
+            raise RuntimeError(f"Alias {client.index_name} points at several indices: {old_indices}")
+        source_index = old_indices[0] if old_indices else client.index_name
+        if not client.client.indices.exists(index=source_index):
+            raise RuntimeError(f"Nothing to reindex: {client.index_name} does not exist (run migrate_index.py)")
+
+        if args.mode == "copy":
+            mapping = client.client.indices.get_mapping(index=source_index)[source_index]["mappings"]
+            if not vectors_in_source(mapping):
+                raise RuntimeError(f"{source_index} does not keep vectors in _source; use --mode reembed")
+            source_dimension = mapping["properties"]["embedding"]["dimension"]
+            if source_dimension != args.dimension:
+                raise RuntimeError(
+                    f"copy mode cannot change dimension {source_dimension} -> {args.dimension}; use --mode reembed"
+                )
+
+        target_index = client.versioned_index_name(client.next_index_version())
+        client.create_versioned_index(target_index, build_index_body(
+            dimension=args.dimension,
+            engine=args.engine,
+            space_type=args.space_type,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            ef_search=args.ef_search,
+            shards=args.shards,
+            exclude_vectors=args.exclude_vectors
+        ))
+        print(f"Created {target_index}, filling from {source_index}...", file=sys.stderr)
+
+        started_at = utc_now()
+        start = time.perf_counter()
+        copied = fill_index(client, source_index, target_index, args)
+
+        # Catch up on chunks uploaded while the main pass was running
+        catch_up_at = utc_now()
+        client.client.indices.refresh(index=source_index)
+        caught_up = fill_index(client, source_index, target_index, args, since=started_at)
+        client.client.indices.refresh(index=target_index)
+
+        previous = client.swap_alias(target_index)
+
+        # New writes now go to the target; copy what reached the source in
+        # the meantime, then drop sessions deleted at any point since the start
+        client.client.indices.refresh(index=source_index)
+        caught_up += fill_index(client, source_index, target_index, args, since=catch_up_at)
+        deletions_replayed = replay_deletions(client, target_index, started_at)
+        client.client.indices.refresh(index=target_index)
+        if args.delete_old:
+            for index in previous:
+                client.client.indices.delete(index=index)
+
+        result.update({
+            "source_index": source_index,
+            "target_index": target_index,
+            "documents": copied,
+            "caught_up": caught_up,
+            "deletions_replayed": deletions_replayed,
+            "deleted_old": args.delete_old and bool(previous),
+            "seconds": round(time.perf_counter() - start, 2)
+        })
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
+    except Exception as e:
+        result["success"] = False
+        result["error"] = str(e)
+        print(f"Error reindexing: {str(e)}", file=sys.stderr)
+        print(json.dumps(result, indent=2))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
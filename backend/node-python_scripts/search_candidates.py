@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script to search candidates across all uploaded resumes
+Called from Node.js upload route
+"""
+
+import sys
+import json
+from pathlib import Path
+
+# Add the db directory to the path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent / 'db'))
+
+try:
+    from chunking import search_candidates
+except ImportError as e:
+    print(f"Import error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python search_candidates.py <query> [page] [page_size] [max|sum] [sections]", file=sys.stderr)
+        sys.exit(1)
+    
+    query = sys.argv[1]
+    page = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    ranking = sys.argv[4] if len(sys.argv) > 4 and sys.argv[4] else "max"
+    # Comma-separated section names, e.g. "Skills,Experience"
+    sections = [s.strip() for s in sys.argv[5].split(",") if s.strip()] if len(sys.argv) > 5 else None
+    
+    try:
+        results = search_candidates(query, page, page_size, ranking=ranking, sections=sections)
+        print(json.dumps(results, indent=2, default=str))
+        sys.exit(0)
+        
+    except Exception as e:
+        print(f"Error searching candidates: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
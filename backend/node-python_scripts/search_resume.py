@@ -20,15 +20,17 @@ except ImportError as e:
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python search_resume.py <query> [k] [session_id]", file=sys.stderr)
+        print("Usage: python search_resume.py <query> [k] [session_id] [sections]", file=sys.stderr)
         sys.exit(1)
     
     query = sys.argv[1]
     k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
-    session_id = sys.argv[3] if len(sys.argv) > 3 else None
+    session_id = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] else None
+    # Comma-separated section names, e.g. "Skills,Experience"
+    sections = [s.strip() for s in sys.argv[4].split(",") if s.strip()] if len(sys.argv) > 4 else None
     
     try:
-        results = search_resume_content(query, session_id, k)
+        results = search_resume_content(query, session_id, k, sections=sections)
         print(json.dumps(results, indent=2))
         sys.exit(0)
         
@@ -5,24 +5,45 @@ import { spawn } from 'child_process';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
+import * as store from '../db/conversationStore.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
 const router = express.Router();
 
-// In-memory storage (replace with database later)
-let conversations = [];
-let messages = [];
+// Identical messages sent to the same conversation while the first is still
+// being answered (double-submits) share one Python chat process
+const inflightResponses = new Map();
+export const coalescingStats = { leader: 0, shared: 0 };
 
-// GET /api/conversations - Get all conversations
+// Backpressure: at most MAX_CHAT_PROCESSES Python chat processes run at once,
+// up to MAX_CHAT_QUEUE more wait for a slot, and anything beyond that (or
+// waiting longer than CHAT_QUEUE_TIMEOUT_MS) is turned away with 503
+const MAX_CHAT_PROCESSES = parseInt(process.env.MAX_CHAT_PROCESSES || '8', 10);
+const MAX_CHAT_QUEUE = parseInt(process.env.MAX_CHAT_QUEUE || '32', 10);
+const CHAT_QUEUE_TIMEOUT_MS = parseInt(process.env.CHAT_QUEUE_TIMEOUT_MS || '15000', 10);
+const chatQueue = [];
+export const chatQueueStats = { running: 0, queued: 0, rejected: 0, throttled: 0 };
+
+class OverloadedError extends Error {
+  constructor(message, status, retryAfter) {
+    super(message);
+    this.status = status;
+    this.retryAfter = retryAfter;
+  }
+}
+
+// Optional ?limit=N&before=<cursor> paging parameters
+const pageParams = (query) => ({
+  limit: query.limit ? Math.max(1, parseInt(query.limit, 10) || 1) : undefined,
+  before: query.before || undefined,
+});
+
+// GET /api/conversations - Get all conversations (most recent first; ?limit & ?before=<createdAt> to page)
 router.get('/', (req, res) => {
   try {
-    // Sort by most recent first
-    const sortedConversations = [...conversations].sort(
-      (a, b) => new Date(b.createdAt) - new Date(a.createdAt)
-    );
-    res.json(sortedConversations);
+    res.json(store.listConversations(pageParams(req.query)));
   } catch (error) {
     res.status(500).json({ error: error.message });
   }
@@ -31,14 +52,13 @@ router.get('/', (req, res) => {
 // POST /api/conversations - Create a new conversation
 router.post('/', (req, res) => {
   try {
-    const newConversation = {
+    const newConversation = store.createConversation({
       id: uuidv4(),
       title: 'New Conversation',
       createdAt: new Date().toISOString(),
       updatedAt: new Date().toISOString(),
-    };
+    });
     
-    conversations.push(newConversation);
     res.status(201).json(newConversation);
   } catch (error) {
     res.status(500).json({ error: error.message });
@@ -51,17 +71,12 @@ router.post('/', (req, res) => {
 router.delete('/:conversationId', async (req, res) => {
   try {
     const { conversationId } = req.params;
-    const index = conversations.findIndex(c => c.id === conversationId);
     
-    if (index === -1) {
+    // Its messages are deleted with it
+    if (!store.deleteConversation(conversationId)) {
       return res.status(404).json({ error: 'Conversation not found' });
     }
     
-    conversations.splice(index, 1);
-    
-    // Also delete all messages in this conversation
-    messages = messages.filter(m => m.conversationId !== conversationId);
-    
     // Clean up associated session data (uploads and OpenSearch data)
     try {
       const cleanupResponse = await axios.delete(`http://localhost:5000/api/upload/session/${conversationId}`);
@@ -78,20 +93,21 @@ router.delete('/:conversationId', async (req, res) => {
 });
 
 // GET /api/conversations/:conversationId/messages - Get messages for a conversation
+// (chronological; with ?limit=N the newest N, and X-Next-Cursor for ?before= to fetch older ones)
 router.get('/:conversationId/messages', (req, res) => {
   try {
     const { conversationId } = req.params;
-    const conversation = conversations.find(c => c.id === conversationId);
     
-    if (!conversation) {
+    if (!store.getConversation(conversationId)) {
       return res.status(404).json({ error: 'Conversation not found' });
     }
     
-    const conversationMessages = messages
-      .filter(m => m.conversationId === conversationId)
-      .sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+    const { messages, nextCursor } = store.listMessages(conversationId, pageParams(req.query));
+    if (nextCursor) {
+      res.set('X-Next-Cursor', nextCursor);
+    }
     
-    res.json(conversationMessages);
+    res.json(messages);
   } catch (error) {
     res.status(500).json({ error: error.message });
   }
@@ -99,50 +115,48 @@ router.get('/:conversationId/messages', (req, res) => {
 
 // POST /api/conversations/:conversationId/messages - Send a message
 router.post('/:conversationId/messages', async (req, res) => {
+  let userMessage;
   try {
     const { conversationId } = req.params;
     const { content, attachments = [] } = req.body;
     
-    const conversation = conversations.find(c => c.id === conversationId);
-    
-    if (!conversation) {
+    if (!store.getConversation(conversationId)) {
       return res.status(404).json({ error: 'Conversation not found' });
     }
     
-    // Create user message
-    const userMessage = {
+    // Create user message (the conversation's first message also sets its title)
+    userMessage = store.addMessage({
       id: uuidv4(),
       conversationId,
       role: 'user',
       content,
       attachments,
       timestamp: new Date().toISOString(),
-    };
-    
-    messages.push(userMessage);
-    
-    // Update conversation title if it's the first message
-    if (messages.filter(m => m.conversationId === conversationId).length === 1) {
-      conversation.title = content.substring(0, 50) + (content.length > 50 ? '...' : '');
-    }
-    
-    conversation.updatedAt = new Date().toISOString();
+    });
     
     // Generate AI response using AI Refinery + AWS OpenSearch
-    const aiResponse = await generateAIResponse(content, conversationId, attachments);
+    const aiResponse = await coalescedAIResponse(content, conversationId, attachments);
     
-    const aiMessage = {
+    const aiMessage = store.addMessage({
       id: uuidv4(),
       conversationId,
       role: 'assistant',
       content: aiResponse,
       timestamp: new Date().toISOString(),
-    };
+    });
     
-    messages.push(aiMessage);
+    if (!aiMessage) {
+      return res.status(404).json({ error: 'Conversation was deleted' });
+    }
     
     res.status(201).json(aiMessage);
   } catch (error) {
+    if (error instanceof OverloadedError) {
+      // The message was not answered; drop it so a retry does not duplicate it
+      if (userMessage) store.removeMessage(userMessage.id);
+      res.set('Retry-After', String(Math.ceil(error.retryAfter)));
+      return res.status(error.status).json({ error: error.message, retryAfter: error.retryAfter });
+    }
     res.status(500).json({ error: error.message });
   }
 });
@@ -153,24 +167,19 @@ router.post('/:conversationId/system-message', (req, res) => {
     const { conversationId } = req.params;
     const { content, type = 'info' } = req.body;
     
-    const conversation = conversations.find(c => c.id === conversationId);
-    
-    if (!conversation) {
-      return res.status(404).json({ error: 'Conversation not found' });
-    }
-    
     // Create system message
-    const systemMessage = {
+    const systemMessage = store.addMessage({
       id: uuidv4(),
       conversationId,
       role: 'system',
       content,
       type, // 'info', 'success', 'error'
       timestamp: new Date().toISOString(),
-    };
+    });
     
-    messages.push(systemMessage);
-    conversation.updatedAt = new Date().toISOString();
+    if (!systemMessage) {
+      return res.status(404).json({ error: 'Conversation not found' });
+    }
     
     res.status(201).json(systemMessage);
   } catch (error) {
@@ -178,6 +187,58 @@ router.post('/:conversationId/system-message', (req, res) => {
   }
 });
 
+// Share one in-flight generateAIResponse between identical concurrent requests
+function coalescedAIResponse(userMessage, conversationId, attachments) {
+  const key = `${conversationId}\u0000${userMessage}`;
+  const inflight = inflightResponses.get(key);
+  if (inflight) {
+    coalescingStats.shared++;
+    return inflight;
+  }
+
+  coalescingStats.leader++;
+  const promise = acquireChatSlot()
+    .then(() => generateAIResponse(userMessage, conversationId, attachments).finally(releaseChatSlot))
+    .finally(() => inflightResponses.delete(key));
+  inflightResponses.set(key, promise);
+  return promise;
+}
+
+// Wait for a free chat process slot, or reject with 503 when the queue is full or too slow
+function acquireChatSlot() {
+  if (chatQueueStats.running < MAX_CHAT_PROCESSES) {
+    chatQueueStats.running++;
+    return Promise.resolve();
+  }
+  if (chatQueue.length >= MAX_CHAT_QUEUE) {
+    chatQueueStats.rejected++;
+    return Promise.reject(new OverloadedError('Server is busy, please retry shortly', 503, CHAT_QUEUE_TIMEOUT_MS / 1000));
+  }
+  return new Promise((resolve, reject) => {
+    const waiter = { resolve };
+    waiter.timer = setTimeout(() => {
+      chatQueue.splice(chatQueue.indexOf(waiter), 1);
+      chatQueueStats.queued = chatQueue.length;
+      chatQueueStats.rejected++;
+      reject(new OverloadedError('Server is busy, please retry shortly', 503, CHAT_QUEUE_TIMEOUT_MS / 1000));
+    }, CHAT_QUEUE_TIMEOUT_MS);
+    chatQueue.push(waiter);
+    chatQueueStats.queued = chatQueue.length;
+  });
+}
+
+// Hand the slot straight to the next waiter, or free it
+function releaseChatSlot() {
+  const next = chatQueue.shift();
+  chatQueueStats.queued = chatQueue.length;
+  if (next) {
+    clearTimeout(next.timer);
+    next.resolve();
+  } else {
+    chatQueueStats.running--;
+  }
+}
+
 // Generate AI response using AI Refinery + AWS OpenSearch pipeline
 async function generateAIResponse(userMessage, conversationId, attachments) {
   return new Promise((resolve, reject) => {
@@ -201,6 +262,19 @@ async function generateAIResponse(userMessage, conversationId, attachments) {
     });
     
     pythonProcess.on('close', (code) => {
+      if (code !== 0) {
+        // A rejected (over capacity) chat exits nonzero but still prints its JSON
+        try {
+          const lines = stdoutData.trim().split('\n');
+          const result = JSON.parse(lines[lines.length - 1]);
+          if (result.rejected) {
+            chatQueueStats.throttled++;
+            return reject(new OverloadedError('AI service is at capacity, please retry shortly', 429, result.retry_after || 1));
+          }
+        } catch (parseError) {
+          // Not JSON; handled as a failure below
+        }
+      }
       if (code === 0) {
         try {
           // Extract JSON from output (it's the last line after all the notices)
@@ -144,19 +144,19 @@ router.post('/', upload.single('file'), async (req, res) => {
 // POST /api/upload/search - Search resume content using KNN
 router.post('/search', async (req, res) => {
   try {
-    const { query, sessionId, k = 5 } = req.body;
+    const { query, sessionId, k = 5, sections = [] } = req.body;
     
     if (!query) {
       return res.status(400).json({ error: 'Search query is required' });
     }
     
-    const args = [query, k.toString()];
-    if (sessionId) args.push(sessionId);
+    const args = [query, k.toString(), sessionId || ''];
+    if (sections.length) args.push(sections.join(','));
     
     const result = await runPythonScript('search_resume.py', args);
     const results = JSON.parse(result.output);
     
-    res.json({ results, query, sessionId });
+    res.json({ results, query, sessionId, sections });
     
   } catch (error) {
     console.error('Search endpoint error:', error.message);
@@ -166,6 +166,37 @@ router.post('/search', async (req, res) => {
   }
 });
 
+// POST /api/upload/candidates - Rank candidates (sessions) across all resumes
+router.post('/candidates', async (req, res) => {
+  try {
+    const { query, page = 1, pageSize = 20, ranking = 'max', sections = [] } = req.body;
+
+    if (!query) {
+      return res.status(400).json({ error: 'Search query is required' });
+    }
+    if (!['max', 'sum'].includes(ranking)) {
+      return res.status(400).json({ error: "ranking must be 'max' or 'sum'" });
+    }
+    const pageNumber = parseInt(page, 10);
+    const size = parseInt(pageSize, 10);
+    if (!(pageNumber >= 1) || !(size >= 1 && size <= 100)) {
+      return res.status(400).json({ error: 'page must be >= 1 and pageSize between 1 and 100' });
+    }
+
+    const args = [query, pageNumber.toString(), size.toString(), ranking];
+    if (sections.length) args.push(sections.join(','));
+
+    const result = await runPythonScript('search_candidates.py', args);
+    res.json({ query, sections, ...JSON.parse(result.output) });
+
+  } catch (error) {
+    console.error('Candidate search error:', error.message);
+    res.status(500).json({
+      error: error.message.includes('JSON') ? 'Failed to parse candidate results' : 'Candidate search failed'
+    });
+  }
+});
+
 
 
 // DELETE /api/upload/session/:sessionId - Clean up session data
@@ -1,7 +1,7 @@
 import express from 'express';
 import cors from 'cors';
 import dotenv from 'dotenv';
-import conversationRoutes from './routes/conversations.js';
+import conversationRoutes, { coalescingStats, chatQueueStats } from './routes/conversations.js';
 import uploadRoutes from './routes/upload.js';
 
 dotenv.config();
@@ -23,7 +23,7 @@ app.use('/api/upload', uploadRoutes);
 
 // Health check
 app.get('/api/health', (req, res) => {
-  res.json({ status: 'ok', message: 'Server is running' });
+  res.json({ status: 'ok', message: 'Server is running', chatCoalescing: coalescingStats, chatQueue: chatQueueStats });
 });
 
 // Error handling middleware
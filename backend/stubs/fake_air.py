@@ -0,0 +1,152 @@
+"""
+Recording wrapper and replaying fake for the AI Refinery DistillerClient
+
+Recording captures which agents the orchestrator routed each query to and
+how long routing took. Replay routes the same query to the same agents (or,
+for unseen queries, by keyword) and runs the local executor functions, so
+the agents' own embedding, OpenSearch and LLM calls are exercised too.
+"""
+
+import time
+from typing import Dict, Any, List
+
+from fixtures import FixtureStore, inject_latency_async
+
+# Keyword routing for queries that were never recorded
+ROUTING_KEYWORDS = [
+    ("Resume Assessment Agent", ("assess", "review", "feedback", "improve my resume", "strength", "weakness")),
+    ("Interview Prep Agent", ("interview", "question", "prepare")),
+    ("Job Search Agent", ("job", "role", "position", "opening", "apply", "hiring")),
+]
+DEFAULT_AGENT = "General Career Agent"
+
+
+def keyword_route(query: str, available: List[str]) -> List[str]:
+    lowered = query.lower()
+    for agent, keywords in ROUTING_KEYWORDS:
+        if agent in available and any(keyword in lowered for keyword in keywords):
+            return [agent]
+    return [DEFAULT_AGENT] if DEFAULT_AGENT in available else available[:1]
+
+
+def _load_agent_configs(config_path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        import yaml
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+    except (ImportError, OSError):
+        return {}
+    return {
+        agent["agent_name"]: agent.get("config", {})
+        for agent in config.get("utility_agents", [])
+    }
+
+
+class _FakeSession:
+    def __init__(self, client: "FakeDistillerClient", project: str, executor_dict: Dict[str, Any]):
+        self._client = client
+        self._project = project
+        self._executor_dict = executor_dict
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def query(self, query: str, **kwargs):
+        request = {"project": self._project, "query": query}
+        entry = self._client.store.lookup("distiller", request)
+        if entry is not None:
+            agents = [a for a in entry["response"]["agents"] if a in self._executor_dict]
+            await inject_latency_async("distiller", entry["response"].get("routing_ms"))
+        else:
+            agents = keyword_route(query, list(self._executor_dict))
+            await inject_latency_async("distiller")
+
+        async def stream():
+            for agent in agents:
+                config = self._client.agent_configs.get(agent, {})
+                content = await self._executor_dict[agent](query, config=config)
+                yield {"role": agent, "content": content}
+        return stream()
+
+
+class FakeDistillerClient:
+    """Stands in for air.DistillerClient"""
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+        self.agent_configs: Dict[str, Dict[str, Any]] = {}
+
+    def create_project(self, config_path: str, project: str, **kwargs):
+        self.agent_configs = _load_agent_configs(config_path)
+        return True
+
+    def __call__(self, project: str, uuid: str = None, executor_dict: Dict[str, Any] = None, **kwargs):
+        return _FakeSession(self, project, executor_dict or {})
+
+
+class _RecordingSession:
+    def __init__(self, session, store: FixtureStore, project: str, invoked: List[str], timing: Dict[str, float]):
+        self._session = session
+        self._store = store
+        self._project = project
+        self._invoked = invoked
+        self._timing = timing
+
+    async def __aenter__(self):
+        self._inner = await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._session.__aexit__(exc_type, exc, tb)
+
+    async def query(self, query: str, **kwargs):
+        self._invoked.clear()
+        self._timing.clear()
+        self._timing["start"] = time.perf_counter()
+        responses = await self._inner.query(query=query, **kwargs)
+
+        async def stream():
+            contents = []
+            async for response in responses:
+                contents.append(response.get("content", ""))
+                yield response
+            start = self._timing["start"]
+            routing_ms = (self._timing.get("first_agent", time.perf_counter()) - start) * 1000
+            self._store.record("distiller", {"project": self._project, "query": query}, {
+                "agents": list(self._invoked),
+                "contents": contents,
+                "routing_ms": round(routing_ms, 3)
+            }, (time.perf_counter() - start) * 1000)
+        return stream()
+
+
+class RecordingDistillerClient:
+    """Proxies a real DistillerClient and records routing decisions per query"""
+
+    def __init__(self, client, store: FixtureStore):
+        self._client = client
+        self._store = store
+
+    def create_project(self, *args, **kwargs):
+        return self._client.create_project(*args, **kwargs)
+
+    def __call__(self, project: str, uuid: str = None, executor_dict: Dict[str, Any] = None, **kwargs):
+        invoked: List[str] = []
+        timing: Dict[str, float] = {}
+
+        def wrap(name, fn):
+            async def executor(*args, **kw):
+                timing.setdefault("first_agent", time.perf_counter())
+                invoked.append(name)
+                return await fn(*args, **kw)
+            return executor
+
+        wrapped = {name: wrap(name, fn) for name, fn in (executor_dict or {}).items()}
+        session = self._client(project=project, uuid=uuid, executor_dict=wrapped, **kwargs)
+        return _RecordingSession(session, self._store, project, invoked, timing)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,190 @@
+"""
+Recording wrappers and replaying fakes for OpenAI and AI Refinery completions
+
+The fakes mirror the attribute shape our code reads from the SDK responses
+(`.data[i].embedding`, `.choices[0].message.content`, `.usage`). Requests
+that were never recorded get a deterministic synthetic response, unless
+STUB_STRICT=true.
+"""
+
+import os
+import time
+import base64
+import hashlib
+import numpy as np
+from types import SimpleNamespace
+from typing import Dict, Any
+
+from fixtures import FixtureStore, inject_latency, inject_latency_async
+
+EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', '3072'))
+
+
+def _to_namespace(value: Any) -> Any:
+    """Recorded JSON -> attribute access like the SDK's pydantic models"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+def _to_json(response: Any) -> Any:
+    if hasattr(response, "model_dump"):
+        return response.model_dump()
+    if hasattr(response, "to_dict"):
+        return response.to_dict()
+    return response
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def synthetic_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> np.ndarray:
+    """Deterministic float32 unit vector seeded from the text"""
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode()).digest(), "big"))
+    vector = rng.standard_normal(dimension).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _encode_embedding(vector: np.ndarray, encoding_format: str = None):
+    """Embedding as the API returns it: base64 little-endian float32 on request, else a float list"""
+    if encoding_format == "base64":
+        return base64.b64encode(vector.astype("<f4").tobytes()).decode()
+    return vector.tolist()
+
+
+def synthetic_embeddings_response(request: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+    dimension = request.get("dimensions") or EMBEDDING_DIMENSION
+    tokens = sum(_estimate_tokens(text) for text in inputs)
+    return {
+        "object": "list",
+        "model": request.get("model"),
+        "data": [
+            {"object": "embedding", "index": i,
+             "embedding": _encode_embedding(synthetic_embedding(text, dimension), request.get("encoding_format"))}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
+
+
+def synthetic_chat_response(request: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+    content = f"[stub {request.get('model')} {digest}] Synthetic response for a {len(prompt)}-character prompt."
+    prompt_tokens, completion_tokens = _estimate_tokens(prompt), _estimate_tokens(content)
+    return {
+        "id": f"stub-{digest}",
+        "object": "chat.completion",
+        "model": request.get("model"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+def _replay(store: FixtureStore, service: str, request: Dict[str, Any], synthesize):
+    entry = store.lookup(service, request)
+    if entry is None:
+        return synthesize(request), None
+    return entry["response"], entry["latency_ms"]
+
+
+# === Replaying fakes ===
+
+class _FakeEmbeddings:
+    def __init__(self, store: FixtureStore):
+        self._store = store
+
+    def create(self, **request):
+        response, recorded_ms = _replay(self._store, "embeddings", request, synthetic_embeddings_response)
+        inject_latency("embeddings", recorded_ms)
+        return _to_namespace(response)
+
+
+class _FakeCompletions:
+    def __init__(self, store: FixtureStore):
+        self._store = store
+
+    def create(self, **request):
+        response, recorded_ms = _replay(self._store, "chat", request, synthetic_chat_response)
+        inject_latency("chat", recorded_ms)
+        return _to_namespace(response)
+
+
+class _FakeAsyncCompletions:
+    def __init__(self, store: FixtureStore):
+        self._store = store
+
+    async def create(self, **request):
+        response, recorded_ms = _replay(self._store, "chat", request, synthetic_chat_response)
+        await inject_latency_async("chat", recorded_ms)
+        return _to_namespace(response)
+
+
+class FakeOpenAI:
+    """Stands in for openai.OpenAI"""
+
+    def __init__(self, store: FixtureStore):
+        self.embeddings = _FakeEmbeddings(store)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(store))
+
+
+class FakeAsyncAIRefinery:
+    """Stands in for air.AsyncAIRefinery"""
+
+    def __init__(self, store: FixtureStore):
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(store))
+
+
+# === Recording wrappers ===
+
+class _RecordingCall:
+    def __init__(self, create, store: FixtureStore, service: str):
+        self._create = create
+        self._store = store
+        self._service = service
+
+    def create(self, **request):
+        start = time.perf_counter()
+        response = self._create(**request)
+        self._store.record(self._service, request, _to_json(response), (time.perf_counter() - start) * 1000)
+        return response
+
+
+class _RecordingAsyncCall(_RecordingCall):
+    async def create(self, **request):
+        start = time.perf_counter()
+        response = await self._create(**request)
+        self._store.record(self._service, request, _to_json(response), (time.perf_counter() - start) * 1000)
+        return response
+
+
+class RecordingOpenAI:
+    """Proxies a real OpenAI client and records embeddings and chat completions"""
+
+    def __init__(self, client, store: FixtureStore):
+        self._client = client
+        self.embeddings = _RecordingCall(client.embeddings.create, store, "embeddings")
+        self.chat = SimpleNamespace(completions=_RecordingCall(client.chat.completions.create, store, "chat"))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class RecordingAsyncAIRefinery:
+    """Proxies a real AsyncAIRefinery client and records chat completions"""
+
+    def __init__(self, client, store: FixtureStore):
+        self._client = client
+        self.chat = SimpleNamespace(completions=_RecordingAsyncCall(client.chat.completions.create, store, "chat"))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
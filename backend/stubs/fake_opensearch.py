@@ -0,0 +1,573 @@
+"""
+In-process stand-in for the subset of the opensearch-py client we use
+
+Implements indices/aliases, bulk, search (knn inside bool, term/terms/range
+filters, match_all, points in time), delete_by_query and count. k-NN is exact brute force
+with OpenSearch's score formulas, so it is useful for exercising code paths
+and measuring client-side overhead, not for judging HNSW recall.
+"""
+
+import copy
+import json
+import fnmatch
+import uuid
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any
+
+import numpy as np
+
+from fixtures import inject_latency
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+
+class NotFoundError(Exception):
+    """Raised for unknown indices, mirroring opensearchpy.NotFoundError"""
+
+
+def _strip_keyword(field: str) -> str:
+    return field[:-len(".keyword")] if field.endswith(".keyword") else field
+
+
+def get_field(doc: Dict[str, Any], field: str):
+    """Read a dotted field path from a document"""
+    value = doc
+    for part in _strip_keyword(field).split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _sort_value(value):
+    """Sort key for one sort value: numbers numerically, the rest as strings, missing last"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (False, 0, value, "")
+    return (value is None, 1, 0, "" if value is None else str(value))
+
+
+def _score(space_type: str, query: List[float], vector: List[float]) -> float:
+    """OpenSearch k-NN score for a space type"""
+    query = np.asarray(query, dtype=np.float32)
+    vector = np.asarray(vector, dtype=np.float32)
+    if space_type == "l2":
+        diff = query - vector
+        return float(1.0 / (1.0 + diff @ diff))
+    dot = float(query @ vector)
+    if space_type == "innerproduct":
+        return 1.0 / (1.0 - dot) if dot < 0 else dot + 1.0
+    norm = float(np.linalg.norm(query) * np.linalg.norm(vector))
+    cosine = dot / norm if norm else 0.0
+    return (1.0 + cosine) / 2.0
+
+
+class _Index:
+    def __init__(self, name: str, body: Dict[str, Any]):
+        self.name = name
+        self.body = body or {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.body.setdefault("settings", {}).setdefault("index", {})
+
+    @property
+    def mappings(self) -> Dict[str, Any]:
+        return self.body.setdefault("mappings", {"properties": {}})
+
+    def space_type(self, field: str) -> str:
+        props = self.mappings.get("properties", {}).get(field, {})
+        return props.get("method", {}).get("space_type", "cosinesimil")
+
+
+class _Indices:
+    def __init__(self, store: "FakeOpenSearch"):
+        self._store = store
+
+    def exists(self, index: str, **kwargs) -> bool:
+        with self._store.reading():
+            return bool(self._store.resolve(index, missing_ok=True))
+
+    def create(self, index: str, body: Dict[str, Any] = None, **kwargs):
+        with self._store.mutation():
+            if index in self._store.index_data or index in self._store.aliases:
+                raise ValueError(f"resource_already_exists_exception: {index}")
+            self._store.index_data[index] = _Index(index, body)
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index: str, **kwargs):
+        with self._store.mutation():
+            for name in self._store.resolve(index):
+                del self._store.index_data[name]
+                for members in self._store.aliases.values():
+                    members.discard(name)
+        return {"acknowledged": True}
+
+    def exists_alias(self, name: str, **kwargs) -> bool:
+        with self._store.reading():
+            return bool(self._store.aliases.get(name))
+
+    def get_alias(self, name: str, **kwargs):
+        with self._store.reading():
+            members = set(self._store.aliases.get(name) or ())
+        if not members:
+            raise NotFoundError(f"alias [{name}] missing")
+        return {index: {"aliases": {name: {}}} for index in members}
+
+    def get(self, index: str, ignore_unavailable: bool = False, allow_no_indices: bool = False, **kwargs):
+        with self._store.reading():
+            names = [n for n in self._store.index_data if fnmatch.fnmatch(n, index)]
+        if not names and not (ignore_unavailable or allow_no_indices):
+            raise NotFoundError(f"no such index [{index}]")
+        return {n: {"settings": {"index": self._store.index_data[n].settings}, "mappings": self._store.index_data[n].mappings} for n in names}
+
+    def get_mapping(self, index: str, **kwargs):
+        with self._store.reading():
+            return {n: {"mappings": self._store.index_data[n].mappings} for n in self._store.resolve(index)}
+
+    def put_settings(self, body: Dict[str, Any], index: str = None, **kwargs):
+        settings = body.get("index", body)
+        with self._store.mutation():
+            for name in self._store.resolve(index):
+                self._store.index_data[name].settings.update(settings)
+        return {"acknowledged": True}
+
+    def update_aliases(self, body: Dict[str, Any], **kwargs):
+        with self._store.mutation():
+            for action in body.get("actions", []):
+                if "add" in action:
+                    self._store.aliases.setdefault(action["add"]["alias"], set()).add(action["add"]["index"])
+                elif "remove" in action:
+                    self._store.aliases.get(action["remove"]["alias"], set()).discard(action["remove"]["index"])
+                elif "remove_index" in action:
+                    self._store.index_data.pop(action["remove_index"]["index"], None)
+        return {"acknowledged": True}
+
+    def refresh(self, index: str = None, **kwargs):
+        return {"_shards": {"failed": 0}}
+
+
+class FakeOpenSearch:
+    """Drop-in replacement for opensearchpy.OpenSearch in tests and benchmarks"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.index_data: Dict[str, _Index] = {}
+        self.aliases: Dict[str, set] = {}
+        self.pits: Dict[str, Dict[str, _Index]] = {}
+        self.indices = _Indices(self)
+
+    @contextmanager
+    def mutation(self):
+        """Guards every write; persistent subclasses sync with disk here"""
+        with self.lock:
+            yield
+
+    @contextmanager
+    def reading(self):
+        """Guards every read"""
+        with self.lock:
+            yield
+
+    # --- name resolution ---
+
+    def resolve(self, index: str, missing_ok: bool = False) -> List[str]:
+        """Expand an index, alias, pattern or comma list into concrete index names"""
+        names = []
+        for part in (index or "*").split(","):
+            if part in self.aliases:
+                names.extend(sorted(self.aliases[part]))
+            elif part in self.index_data:
+                names.append(part)
+            elif any(ch in part for ch in "*?"):
+                names.extend(n for n in self.index_data if fnmatch.fnmatch(n, part))
+            elif not missing_ok:
+                raise NotFoundError(f"no such index [{part}]")
+        return names
+
+    def _write_index(self, index: str) -> _Index:
+        names = self.resolve(index, missing_ok=True)
+        if not names:
+            # Auto-create like OpenSearch does for unknown index names
+            self.index_data[index] = _Index(index, {})
+            names = [index]
+        if len(names) > 1:
+            raise ValueError(f"alias [{index}] has more than one index and no write index")
+        return self.index_data[names[0]]
+
+    # --- document APIs ---
+
+    def bulk(self, body, index: str = None, **kwargs):
+        if isinstance(body, (str, bytes)):
+            text = body.decode() if isinstance(body, bytes) else body
+            body = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        items = []
+        with self.mutation():
+            for i in range(0, len(body), 2):
+                action, doc = body[i], body[i + 1]
+                op, meta = next(iter(action.items()))
+                target = self._write_index(meta.get("_index", index))
+                target.docs[str(meta["_id"])] = {"_source": doc, "_routing": meta.get("routing")}
+                items.append({op: {"_index": target.name, "_id": meta["_id"], "status": 201}})
+        return {"errors": False, "items": items}
+
+    def index(self, index: str, body: Dict[str, Any], id: str = None, routing: str = None, **kwargs):
+        with self.mutation():
+            target = self._write_index(index)
+            doc_id = str(id) if id is not None else f"auto_{len(target.docs)}"
+            target.docs[doc_id] = {"_source": body, "_routing": routing}
+        return {"_index": target.name, "_id": doc_id, "result": "created"}
+
+    def _matches(self, query: Dict[str, Any], source: Dict[str, Any]) -> bool:
+        if not query or "match_all" in query or "knn" in query:
+            return True
+        if "term" in query:
+            field, value = next(iter(query["term"].items()))
+            value = value["value"] if isinstance(value, dict) else value
+            return value in _as_list(get_field(source, field))
+        if "terms" in query:
+            field, values = next(iter(query["terms"].items()))
+            return any(v in values for v in _as_list(get_field(source, field)))
+        if "range" in query:
+            field, bounds = next(iter(query["range"].items()))
+            value = get_field(source, field)
+            if value is None:
+                return False
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            return all([
+                "gte" not in bounds or value >= bounds["gte"],
+                "gt" not in bounds or value > bounds["gt"],
+                "lte" not in bounds or value <= bounds["lte"],
+                "lt" not in bounds or value < bounds["lt"],
+            ])
+        if "exists" in query:
+            return get_field(source, query["exists"]["field"]) is not None
+        if "bool" in query:
+            b = query["bool"]
+            clauses = [c for c in _as_list(b.get("must")) + _as_list(b.get("filter")) if "knn" not in c]
+            if not all(self._matches(c, source) for c in clauses):
+                return False
+            if any(self._matches(c, source) for c in _as_list(b.get("must_not"))):
+                return False
+            should = _as_list(b.get("should"))
+            return not should or any(self._matches(c, source) for c in should)
+        raise NotImplementedError(f"Unsupported query: {list(query)}")
+
+    def _knn_clause(self, query: Dict[str, Any]):
+        if "knn" in query:
+            return query["knn"]
+        if "bool" in query:
+            for clause in _as_list(query["bool"].get("must")):
+                if "knn" in clause:
+                    return clause["knn"]
+        return None
+
+    # --- points in time ---
+
+    def create_pit(self, index: str, keep_alive: str = None, **kwargs):
+        """Snapshot the matching indices; searches with {"pit": {"id": ...}} read the snapshot"""
+        with self.reading():
+            pit_id = uuid.uuid4().hex
+            self.pits[pit_id] = {name: copy.deepcopy(self.index_data[name]) for name in self.resolve(index)}
+        return {"pit_id": pit_id, "creation_time": int(time.time() * 1000)}
+
+    def delete_pit(self, body: Dict[str, Any] = None, **kwargs):
+        pit_ids = _as_list((body or {}).get("pit_id"))
+        return {"pits": [{"pit_id": p, "successful": self.pits.pop(p, None) is not None} for p in pit_ids]}
+
+    def _hits(self, index: str, body: Dict[str, Any]):
+        query = body.get("query", {"match_all": {}})
+        knn = self._knn_clause(query)
+        if body.get("pit"):
+            pit_id = body["pit"]["id"]
+            if pit_id not in self.pits:
+                raise NotFoundError(f"no such point in time [{pit_id}]")
+            indices = self.pits[pit_id]
+        else:
+            indices = {name: self.index_data[name] for name in self.resolve(index)}
+        hits = []
+        for name, idx in indices.items():
+            for doc_id, stored in idx.docs.items():
+                source = stored["_source"]
+                if not self._matches(query, source):
+                    continue
+                score = 1.0
+                if knn:
+                    field, params = next(iter(knn.items()))
+                    if "filter" in params and not self._matches(params["filter"], source):
+                        continue
+                    vector = source.get(field)
+                    if vector is None:
+                        continue
+                    score = _score(idx.space_type(field), params["vector"], vector)
+                hit = {"_index": name, "_id": doc_id, "_score": score, "_source": source}
+                if stored.get("_routing"):
+                    hit["_routing"] = stored["_routing"]
+                hits.append(hit)
+
+        if knn:
+            field, params = next(iter(knn.items()))
+            hits.sort(key=lambda h: h["_score"], reverse=True)
+            hits = hits[:params.get("k", 10)]
+        if body.get("min_score") is not None:
+            hits = [h for h in hits if h["_score"] >= body["min_score"]]
+        sorts = []
+        for sort in _as_list(body.get("sort")):
+            field, order = next(iter(sort.items())) if isinstance(sort, dict) else (sort, "asc")
+            sorts.append((field, order.get("order", "asc") if isinstance(order, dict) else order))
+        if sorts:
+            for hit in hits:
+                hit["sort"] = [hit["_id"] if field == "_id" else get_field(hit["_source"], field) for field, _ in sorts]
+            # Stable sorts from the last key to the first
+            for position in reversed(range(len(sorts))):
+                hits.sort(key=lambda h: _sort_value(h["sort"][position]),
+                          reverse=(sorts[position][1] == "desc"))
+            if body.get("search_after"):
+                # Ascending sorts only
+                after = [_sort_value(value) for value in body["search_after"]]
+                hits = [h for h in hits if [_sort_value(value) for value in h["sort"]] > after]
+        return hits
+
+    def search(self, body: Dict[str, Any] = None, index: str = None, **kwargs):
+        body = body or {}
+        with self.reading():
+            hits = self._hits(index, body)
+            indices = self.pits[body["pit"]["id"]] if body.get("pit") else self.index_data
+            total = len(hits)
+            start = body.get("from", 0)
+            page = [
+                dict(h, _source=_filter_source(
+                    _filter_source(h["_source"], indices[h["_index"]].mappings.get("_source")),
+                    body.get("_source")))
+                for h in hits[start:start + body.get("size", 10)]
+            ]
+        response = {
+            "took": 0,
+            "timed_out": False,
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": max((h["_score"] for h in page), default=None),
+                "hits": page
+            }
+        }
+        if body.get("pit"):
+            response["pit_id"] = body["pit"]["id"]
+        if body.get("aggs"):
+            response["aggregations"] = _aggregate(hits, body["aggs"])
+        return response
+
+    def count(self, body: Dict[str, Any] = None, index: str = None, **kwargs):
+        with self.reading():
+            return {"count": len(self._hits(index, body or {}))}
+
+    def delete_by_query(self, body: Dict[str, Any], index: str = None, **kwargs):
+        deleted = 0
+        with self.mutation():
+            for name in self.resolve(index):
+                idx = self.index_data[name]
+                for doc_id in [d for d, s in idx.docs.items() if self._matches(body.get("query"), s["_source"])]:
+                    del idx.docs[doc_id]
+                    deleted += 1
+        return {"deleted": deleted}
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _metric_values(hits: List[Dict[str, Any]], spec: Dict[str, Any]) -> list:
+    """Field values, or hit scores for a `_score` script"""
+    if "script" in spec:
+        return [hit["_score"] for hit in hits]
+    return [v for hit in hits for v in _as_list(get_field(hit["_source"], spec["field"]))]
+
+
+def _bucket_value(bucket: Dict[str, Any], name: str):
+    if name == "_count":
+        return bucket["doc_count"]
+    if name == "_key":
+        return bucket["key"]
+    return bucket[name]["value"]
+
+
+def _aggregate(hits: List[Dict[str, Any]], aggs: Dict[str, Any]) -> Dict[str, Any]:
+    """terms, max, sum, cardinality and top_hits aggregations (with bucket_sort) over matching hits"""
+    result = {}
+    for name, spec in aggs.items():
+        if "terms" in spec:
+            groups: Dict[Any, list] = {}
+            for hit in hits:
+                for value in _as_list(get_field(hit["_source"], spec["terms"]["field"])):
+                    groups.setdefault(value, []).append(hit)
+            sub_aggs = {n: s for n, s in spec.get("aggs", {}).items() if "bucket_sort" not in s}
+            buckets = [
+                {"key": key, "doc_count": len(group), **_aggregate(group, sub_aggs)}
+                for key, group in sorted(groups.items(), key=lambda item: (-len(item[1]), str(item[0])))
+            ]
+            for field, order in reversed(list(spec["terms"].get("order", {}).items())):
+                buckets.sort(key=lambda b: _bucket_value(b, field), reverse=(order == "desc"))
+            buckets = buckets[:spec["terms"].get("size", 10)]
+            for pipeline in spec.get("aggs", {}).values():
+                if "bucket_sort" in pipeline:
+                    start = pipeline["bucket_sort"].get("from", 0)
+                    size = pipeline["bucket_sort"].get("size")
+                    buckets = buckets[start:None if size is None else start + size]
+            result[name] = {"buckets": buckets}
+        elif "max" in spec:
+            values = _metric_values(hits, spec["max"])
+            if "script" in spec["max"]:
+                result[name] = {"value": max(values, default=None)}
+                continue
+            top = max(values, key=str, default=None)
+            result[name] = {"value": top} if top is None else {"value": top, "value_as_string": str(top)}
+        elif "sum" in spec:
+            result[name] = {"value": float(sum(_metric_values(hits, spec["sum"])))}
+        elif "cardinality" in spec:
+            result[name] = {"value": len({str(v) for v in _metric_values(hits, spec["cardinality"])})}
+        elif "top_hits" in spec:
+            top = sorted(hits, key=lambda h: h["_score"], reverse=True)[:spec["top_hits"].get("size", 3)]
+            result[name] = {"hits": {
+                "total": {"value": len(hits), "relation": "eq"},
+                "hits": [dict(h, _source=_filter_source(h["_source"], spec["top_hits"].get("_source"))) for h in top]
+            }}
+    return result
+
+
+def _filter_source(source: Dict[str, Any], spec):
+    """Apply a _source includes/excludes spec"""
+    if spec is None or spec is True:
+        return source
+    if spec is False:
+        return {}
+    includes = spec if isinstance(spec, list) else _as_list(spec.get("includes"))
+    excludes = [] if isinstance(spec, list) else _as_list(spec.get("excludes"))
+
+    result = {}
+    if includes:
+        for field in includes:
+            value = get_field(source, field)
+            if value is None:
+                continue
+            target = result
+            parts = field.split(".")
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    else:
+        result = dict(source)
+    for field in excludes:
+        result.pop(field, None)
+    return result
+
+
+class PersistentFakeOpenSearch(FakeOpenSearch):
+    """
+    Stand-in whose state lives in a JSON file, so the upload process and the
+    chat processes spawned by Node see the same documents
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._mtime = None
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path) as f:
+            content = f.read()
+        state = json.loads(content) if content.strip() else {}
+        self.index_data = {}
+        for name, data in state.get("indices", {}).items():
+            index = _Index(name, data["body"])
+            index.docs = data["docs"]
+            self.index_data[name] = index
+        self.aliases = {alias: set(members) for alias, members in state.get("aliases", {}).items()}
+        self._mtime = mtime
+
+    def _save(self):
+        state = {
+            "indices": {name: {"body": idx.body, "docs": idx.docs} for name, idx in self.index_data.items()},
+            "aliases": {alias: sorted(members) for alias, members in self.aliases.items()}
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def mutation(self):
+        with self.lock, self._file_lock():
+            self._reload()
+            yield
+            self._save()
+
+    @contextmanager
+    def reading(self):
+        with self.lock:
+            self._reload()
+            yield
+
+
+class RecordingOpenSearch:
+    """Proxies a real OpenSearch client and records search requests/responses"""
+
+    def __init__(self, client, store):
+        self._client = client
+        self._store = store
+
+    def search(self, body=None, index=None, **params):
+        start = time.perf_counter()
+        response = self._client.search(body=body, index=index, **params)
+        request = {"index": index, "body": body, "params": params}
+        self._store.record("opensearch", request, response, (time.perf_counter() - start) * 1000)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class ReplayOpenSearch:
+    """Serves recorded searches; everything else (and unseen searches) goes to the stand-in"""
+
+    def __init__(self, store, fallback: FakeOpenSearch):
+        self._store = store
+        self._fallback = fallback
+
+    def search(self, body=None, index=None, **params):
+        entry = self._store.lookup("opensearch", {"index": index, "body": body, "params": params})
+        if entry is None:
+            inject_latency("opensearch")
+            return self._fallback.search(body=body, index=index, **params)
+        inject_latency("opensearch", entry["latency_ms"])
+        return entry["response"]
+
+    def __getattr__(self, name):
+        return getattr(self._fallback, name)
@@ -0,0 +1,118 @@
+"""
+Fixture store and latency injection for record/replay
+
+Fixtures live in STUB_FIXTURES_DIR as one JSONL file per service
+(embeddings.jsonl, chat.jsonl, distiller.jsonl, opensearch.jsonl). Each line
+holds the request key, the request, the response and the recorded latency.
+
+Latency injection (replay only):
+  STUB_LATENCY="embeddings=80,chat=900,distiller=300,opensearch=15"  fixed ms per service
+  STUB_LATENCY_SCALE=1.0   otherwise sleep recorded latency * scale (0 disables)
+  STUB_LATENCY_JITTER=0.1  +/- fraction of random jitter
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+STUB_FIXTURES_DIR = os.getenv('STUB_FIXTURES_DIR', str(Path(__file__).parent / 'fixtures'))
+STUB_LATENCY_SCALE = float(os.getenv('STUB_LATENCY_SCALE', '1.0'))
+STUB_LATENCY_JITTER = float(os.getenv('STUB_LATENCY_JITTER', '0.1'))
+STUB_STRICT = os.getenv('STUB_STRICT', 'false').lower() == 'true'
+
+
+def _parse_latency(spec: str) -> Dict[str, float]:
+    latency = {}
+    for part in spec.split(","):
+        if "=" in part:
+            service, ms = part.split("=", 1)
+            latency[service.strip()] = float(ms)
+    return latency
+
+
+STUB_LATENCY = _parse_latency(os.getenv('STUB_LATENCY', ''))
+
+
+class MissingFixture(KeyError):
+    """Raised in strict replay when a request was never recorded"""
+
+
+def request_key(service: str, request: Dict[str, Any]) -> str:
+    """Stable hash of a request, independent of dict ordering"""
+    canonical = json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{service}:{canonical}".encode()).hexdigest()
+
+
+class FixtureStore:
+    """Append-only JSONL fixtures, loaded lazily per service"""
+
+    def __init__(self, directory: str = STUB_FIXTURES_DIR):
+        self.directory = Path(directory)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, service: str) -> Path:
+        return self.directory / f"{service}.jsonl"
+
+    def _load(self, service: str) -> Dict[str, Any]:
+        if service not in self._entries:
+            entries = {}
+            path = self._path(service)
+            if path.exists():
+                with open(path) as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[entry["key"]] = entry
+            self._entries[service] = entries
+        return self._entries[service]
+
+    def lookup(self, service: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load(service).get(request_key(service, request))
+        if entry is None and STUB_STRICT:
+            raise MissingFixture(f"No {service} fixture for request {request_key(service, request)[:12]}")
+        return entry
+
+    def record(self, service: str, request: Dict[str, Any], response: Any, latency_ms: float):
+        entry = {
+            "key": request_key(service, request),
+            "request": request,
+            "response": response,
+            "latency_ms": round(latency_ms, 3)
+        }
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path(service), "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self._load(service)[entry["key"]] = entry
+
+
+def _delay_seconds(service: str, recorded_ms: Optional[float]) -> float:
+    if service in STUB_LATENCY:
+        ms = STUB_LATENCY[service]
+    elif recorded_ms is not None:
+        ms = recorded_ms * STUB_LATENCY_SCALE
+    else:
+        return 0.0
+    if STUB_LATENCY_JITTER:
+        ms *= 1 + random.uniform(-STUB_LATENCY_JITTER, STUB_LATENCY_JITTER)
+    return max(ms, 0.0) / 1000
+
+
+def inject_latency(service: str, recorded_ms: Optional[float] = None):
+    delay = _delay_seconds(service, recorded_ms)
+    if delay:
+        time.sleep(delay)
+
+
+async def inject_latency_async(service: str, recorded_ms: Optional[float] = None):
+    delay = _delay_seconds(service, recorded_ms)
+    if delay:
+        await asyncio.sleep(delay)
@@ -0,0 +1,71 @@
+"""
+STUB_MODE switch for the external services
+
+  STUB_MODE=off     real clients (default)
+  STUB_MODE=record  real clients, every call recorded to STUB_FIXTURES_DIR
+  STUB_MODE=replay  no network: recorded responses (synthetic when unseen)
+                    with injected latency, and a file-backed fake OpenSearch
+                    at STUB_OPENSEARCH_STATE shared by all worker processes
+
+llm_auth and aws_opensearch ask this module for clients only when STUB_MODE
+is set, so production imports never touch the stubs directory.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Any
+
+from fixtures import FixtureStore, STUB_FIXTURES_DIR
+
+STUB_MODE = os.getenv('STUB_MODE', 'off').lower()
+STUB_OPENSEARCH_STATE = os.getenv(
+    'STUB_OPENSEARCH_STATE', str(Path(STUB_FIXTURES_DIR) / 'opensearch-state.json'))
+
+MODES = ("off", "record", "replay")
+if STUB_MODE not in MODES:
+    raise ValueError(f"STUB_MODE must be one of {MODES}, got {STUB_MODE!r}")
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store() -> FixtureStore:
+    global _store
+    with _lock:
+        if _store is None:
+            _store = FixtureStore()
+        return _store
+
+
+def replaying() -> bool:
+    return STUB_MODE == "replay"
+
+
+def client(kind: str, factory: Callable[[], Any]) -> Any:
+    """
+    Client for kind ('openai', 'air', 'distiller', 'opensearch') under the
+    current mode; factory builds the real client and is not called in replay
+    """
+    if STUB_MODE == "off":
+        return factory()
+
+    store = get_store()
+    if kind in ("openai", "air"):
+        from fake_openai import FakeOpenAI, FakeAsyncAIRefinery, RecordingOpenAI, RecordingAsyncAIRefinery
+        if replaying():
+            return FakeOpenAI(store) if kind == "openai" else FakeAsyncAIRefinery(store)
+        recorder = RecordingOpenAI if kind == "openai" else RecordingAsyncAIRefinery
+        return recorder(factory(), store)
+
+    if kind == "distiller":
+        from fake_air import FakeDistillerClient, RecordingDistillerClient
+        return FakeDistillerClient(store) if replaying() else RecordingDistillerClient(factory(), store)
+
+    if kind == "opensearch":
+        from fake_opensearch import PersistentFakeOpenSearch, RecordingOpenSearch, ReplayOpenSearch
+        if replaying():
+            return ReplayOpenSearch(store, PersistentFakeOpenSearch(STUB_OPENSEARCH_STATE))
+        return RecordingOpenSearch(factory(), store)
+
+    raise ValueError(f"Unknown stub client kind: {kind}")
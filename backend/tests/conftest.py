@@ -0,0 +1,14 @@
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Keep shared SQLite state (rate limits, breakers) out of the working tree
+os.environ.setdefault('RATE_LIMIT_STATE_PATH', '')
+os.environ.setdefault('LLM_HEALTH_STATE_PATH', '')
+os.environ.setdefault('SESSION_CACHE_ENABLED', 'false')
+
+sys.path.append(str(BACKEND_DIR / 'db'))
+sys.path.append(str(BACKEND_DIR / 'air_llm'))
+sys.path.append(str(BACKEND_DIR / 'stubs'))
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+import requests
+from botocore.credentials import RefreshableCredentials
+
+import aws_credentials
+
+
+def refreshable_credentials() -> RefreshableCredentials:
+    expiry = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    return RefreshableCredentials.create_from_metadata(
+        metadata={"access_key": "AKIDEXAMPLE", "secret_key": "secret", "token": "session-token",
+                  "expiry_time": expiry},
+        refresh_using=lambda: {},
+        method="assume-role",
+    )
+
+
+def test_auth_signs_requests_with_refreshable_credentials(monkeypatch):
+    monkeypatch.setattr(aws_credentials, "_credentials", refreshable_credentials())
+    monkeypatch.setattr(aws_credentials, "_auth_cache", {})
+
+    auth = aws_credentials.get_aws_auth("eu-west-1", "es")
+    request = requests.Request(
+        "GET", "https://search-resumes.eu-west-1.es.amazonaws.com/resume-vectors/_search").prepare()
+    signed = auth(request)
+
+    assert signed.headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+    assert "/eu-west-1/es/aws4_request" in signed.headers["Authorization"]
+    assert signed.headers["X-Amz-Security-Token"] == "session-token"
+    assert aws_credentials.get_aws_auth("eu-west-1", "es") is auth
@@ -0,0 +1,55 @@
+from chunking import chunk_resume_for_embed, merge_small_sections, split_sections
+
+SHORT_RESUME = """Jane Doe
+jane.doe@example.com | +1 555 0100 | Berlin
+
+Summary
+Backend engineer with six years of experience building data-heavy web
+services in Python and Go, most recently search and ranking systems.
+
+Experience
+Senior Software Engineer, Acme Search GmbH (2021 - present)
+Built the resume ingestion pipeline and the vector search API serving
+two million queries a day. Cut p95 latency from 900 ms to 180 ms.
+Software Engineer, Datacorp (2018 - 2021)
+Maintained ETL jobs and the internal analytics dashboard.
+
+Skills
+Python, Go, PostgreSQL, OpenSearch, Kubernetes, Terraform, AWS
+
+Education
+B.Sc. Computer Science, TU Berlin (2014 - 2018)
+
+Languages
+English, German
+"""
+
+
+def test_short_resume_keeps_its_sections_apart():
+    chunks = chunk_resume_for_embed(merge_small_sections(split_sections(SHORT_RESUME)))
+
+    assert all(len(chunk["sections"]) <= 2 for chunk in chunks)
+    owners = {}
+    for chunk in chunks:
+        for section in chunk["sections"]:
+            owners[section] = chunk["content"]
+    assert set(owners) == {"Contact", "Summary", "Experience", "Skills", "Education", "Languages"}
+    # A Skills-filtered search must not return the work history, and vice versa
+    assert "Acme Search" not in owners["Skills"]
+    assert "Kubernetes" not in owners["Experience"]
+    assert owners["Summary"] != owners["Education"]
+
+
+def test_only_short_neighbours_are_paired():
+    sections = [{"section": name, "content": content} for name, content in [
+        ("Experience", "x" * 300),
+        ("Awards", "Hackathon winner"),
+        ("Languages", "English"),
+        ("Volunteering", "Mentor"),
+        ("Publications", "y" * 300),
+    ]]
+
+    merged = merge_small_sections(sections, min_chars=80)
+
+    assert [entry["sections"] for entry in merged] == [
+        ["Experience"], ["Awards", "Languages"], ["Volunteering"], ["Publications"]]
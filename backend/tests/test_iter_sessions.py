@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from aws_opensearch import AWSOpenSearchClient, build_index_body
+from fake_opensearch import FakeOpenSearch
+
+sys.path.append(str(Path(__file__).parent.parent / 'node-python_scripts'))
+from batch_assess import missing_chunks  # noqa: E402
+
+DIMENSION = 4
+
+
+def make_client() -> AWSOpenSearchClient:
+    client = AWSOpenSearchClient(client=FakeOpenSearch(), index_name="resumes")
+    client.client.indices.create(index="resumes-v1", body=build_index_body(dimension=DIMENSION))
+    client.client.indices.update_aliases(body={"actions": [{"add": {"index": "resumes-v1", "alias": "resumes"}}]})
+    return client
+
+
+def upload(client: AWSOpenSearchClient, session_id: str, count: int):
+    client.store_resume_chunks([
+        {
+            "id": f"resume_chunk_{session_id}_{i}",
+            "content": f"{session_id} chunk {i}",
+            "embedding": np.ones(DIMENSION, dtype=np.float32),
+            "metadata": {"type": "resume", "section": ["Experience"], "chunk_index": i},
+        }
+        for i in range(count)
+    ], session_id=session_id)
+
+
+def test_scan_pages_by_chunk_index_in_document_order():
+    client = make_client()
+    upload(client, "a", 12)
+    upload(client, "b", 3)
+
+    sessions = dict(client.iter_sessions(page_size=5))
+
+    assert list(sessions) == ["a", "b"]
+    assert [c["metadata"]["chunk_index"] for c in sessions["a"]] == list(range(12))
+    assert [c["metadata"]["chunk_index"] for c in sessions["b"]] == [0, 1, 2]
+
+
+def test_scan_reads_a_snapshot_while_sessions_change():
+    client = make_client()
+    for session_id in ("a", "b", "c"):
+        upload(client, session_id, 4)
+
+    scan = client.iter_sessions(page_size=3)
+    first = next(scan)
+    client.delete_session_data("b")
+    upload(client, "a0", 4)  # sorts into pages already read
+    rest = list(scan)
+
+    sessions = dict([first] + rest)
+    assert list(sessions) == ["a", "b", "c"]
+    assert all(not missing_chunks(chunks) and len(chunks) == 4 for chunks in sessions.values())
+    assert client.client.pits == {}
+
+
+def test_missing_chunks_reports_gaps():
+    chunks = [{"id": f"resume_chunk_s_{i}", "metadata": {}} for i in (0, 1, 3)]
+    assert missing_chunks(chunks) == [2]
+    assert missing_chunks(chunks[:2]) == []
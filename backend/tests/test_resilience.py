@@ -0,0 +1,65 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import resilience
+import openai_call
+
+
+class SlowFirstCompletions:
+    """Chat completions whose first request hangs; every request is counted"""
+
+    def __init__(self, first_delay: float):
+        self.first_delay = first_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def create(self, **request):
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        if number == 1:
+            time.sleep(self.first_delay)
+        content = f"answer {number}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def test_hedge_sends_a_second_openai_request(monkeypatch):
+    completions = SlowFirstCompletions(first_delay=1.0)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(openai_call, "auth_manager", SimpleNamespace(get_openai_client=lambda: client))
+    # Hedge after 50ms instead of waiting for real latency samples
+    monkeypatch.setattr(resilience, "latency_percentile", lambda model, percentile: 0.05)
+
+    async def invoke(model_key, hedge=False):
+        return await openai_call.openai_complete("same prompt", model_key.split(":", 1)[1], coalesce=not hedge)
+
+    policy = {"models": ["openai:gpt-4o"], "timeout": 5, "deadline": 5, "hedge_percentile": 95}
+
+    async def timed():
+        start = time.perf_counter()
+        answer = await resilience.call_with_fallback("test", policy, invoke)
+        return answer, time.perf_counter() - start
+
+    answer, seconds = asyncio.run(timed())
+
+    assert completions.requests == 2
+    assert answer == "answer 2"
+    # Answered by the hedge, not after the hung first request
+    assert seconds < 1.0
+
+
+def test_identical_requests_are_still_coalesced(monkeypatch):
+    completions = SlowFirstCompletions(first_delay=0.2)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(openai_call, "auth_manager", SimpleNamespace(get_openai_client=lambda: client))
+
+    async def both():
+        return await asyncio.gather(
+            openai_call.openai_complete("same prompt", "gpt-4o"),
+            openai_call.openai_complete("same prompt", "gpt-4o"),
+        )
+
+    assert asyncio.run(both()) == ["answer 1", "answer 1"]
+    assert completions.requests == 1
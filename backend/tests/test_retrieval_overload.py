@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+import agents
+import chunking
+from admission import AdmissionRejected
+
+
+def reject(*args, **kwargs):
+    raise AdmissionRejected("opensearch", "over capacity", retry_after=0.5)
+
+
+def test_search_reports_overload_instead_of_no_results(monkeypatch):
+    monkeypatch.setattr(chunking, "embed_query", reject)
+
+    with pytest.raises(AdmissionRejected):
+        chunking.search_resume_content("python experience", "session-overload", k=3)
+
+
+def test_assessment_agent_does_not_answer_no_resume_when_overloaded(monkeypatch):
+    monkeypatch.setattr(chunking, "embed_query", reject)
+
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(agents.resume_assessment_agent("Assess my resume session_id:session-overload"))
@@ -0,0 +1,26 @@
+import json
+
+import numpy as np
+
+from aws_opensearch import bulk_ndjson, encode_vector
+
+
+def test_encoded_vectors_round_trip_float32_exactly():
+    rng = np.random.default_rng(7)
+    vector = np.concatenate([
+        rng.standard_normal(3072).astype(np.float32),
+        np.array([1e-38, -3.4028235e38, 0.1, 1 / 3], dtype=np.float32),
+    ])
+
+    decoded = np.asarray(json.loads(encode_vector(vector)), dtype=np.float32)
+
+    assert np.array_equal(decoded, vector)
+
+
+def test_bulk_body_carries_the_exact_vector():
+    vector = np.float32([0.12345678, -0.98765432, 3.1415927])
+    body = bulk_ndjson([({"index": {"_id": "a"}}, {"content": "x", "embedding": vector})])
+
+    doc = json.loads(body.splitlines()[1])
+
+    assert np.array_equal(np.asarray(doc["embedding"], dtype=np.float32), vector)